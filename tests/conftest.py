@@ -0,0 +1,40 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+MODULE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'threat-mapping-pro.py')
+SYNTHETIC_SCALE = 0.1
+SYNTHETIC_SEED = 3
+
+def _load_module():
+    # The script name is not importable, so load it by path and register it so snapshots and worker pools can pickle it.
+    if 'threat_mapping_pro' not in sys.modules:
+        spec = importlib.util.spec_from_file_location('threat_mapping_pro', MODULE_PATH)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules['threat_mapping_pro'] = module
+        spec.loader.exec_module(module)
+    return sys.modules['threat_mapping_pro']
+
+@pytest.fixture(scope='session')
+def tm():
+    return _load_module()
+
+@pytest.fixture(scope='session')
+def synthetic_bundle(tm, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('bundle') / 'synthetic.json')
+    tm.generate_synthetic_bundle(path, scale=SYNTHETIC_SCALE, seed=SYNTHETIC_SEED)
+    return path
+
+@pytest.fixture
+def load_analyzer(tm, tmp_path):
+    def load(bundle_path, use_snapshot=False, **options):
+        analyzer = tm.MITREAnalyzer(bundle_path=bundle_path, cache_dir=str(tmp_path / 'cache'), use_snapshot=use_snapshot, **options)
+        analyzer.load_mitre_data()
+        return analyzer
+    return load
+
+@pytest.fixture
+def analyzer(load_analyzer, synthetic_bundle):
+    return load_analyzer(synthetic_bundle)
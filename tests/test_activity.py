@@ -0,0 +1,54 @@
+import math
+from datetime import datetime
+
+import pytest
+
+def _dated_rows(analyzer, group_id):
+    return [row for row in analyzer.group_techniques[group_id] if not math.isnan(analyzer.relationships.created[row])]
+
+def test_timeline_ranges_match_a_scan(analyzer):
+    timeline, rels = analyzer.timeline, analyzer.relationships
+    group_id = max(analyzer.group_techniques, key=lambda g: len(analyzer.group_techniques[g]))
+    times = sorted(rels.created[row] for row in _dated_rows(analyzer, group_id))
+    start, end = times[len(times) // 4], times[3 * len(times) // 4]
+    expected = sorted(row for row in _dated_rows(analyzer, group_id) if start <= rels.created[row] <= end)
+    assert sorted(timeline.rows('group', group_id, start, end)) == expected
+    assert timeline.count('group', group_id, start, end) == len(expected)
+    assert timeline.count('group', group_id) == len(times)
+    assert timeline.count('group', 'intrusion-set--missing') == 0
+
+def test_first_seen_is_the_earliest_attribution(analyzer):
+    timeline, rels = analyzer.timeline, analyzer.relationships
+    firsts = {}
+    for group_id in analyzer.group_techniques:
+        for row in _dated_rows(analyzer, group_id):
+            technique_id = rels.target_ref(row)
+            firsts[technique_id] = min(firsts.get(technique_id, math.inf), rels.created[row])
+    assert dict((key, first) for first, key in timeline.first_seen('technique')) == firsts
+    cutoff = sorted(firsts.values())[len(firsts) // 2]
+    assert {key for first, key in timeline.first_seen('technique', cutoff)} == {t for t, first in firsts.items() if first >= cutoff}
+
+def test_group_activity_counts_every_dated_use(analyzer, tmp_path):
+    group_id = max(analyzer.group_techniques, key=lambda g: len(analyzer.group_techniques[g]))
+    group = analyzer.groups[group_id]
+    report = analyzer.query_activity(value=group['attack_id'], since=datetime(1990, 1, 1), until=datetime(2100, 1, 1),
+                                     output_file=str(tmp_path / 'activity.json'))
+    assert report['subject_type'] == 'group'
+    assert report['uses_in_window'] == len(_dated_rows(analyzer, group_id))
+    assert sum(entry['uses'] for entry in report['techniques']) == report['uses_in_window']
+    uses = [entry['uses'] for entry in report['techniques']]
+    assert uses == sorted(uses, reverse=True)
+    assert (tmp_path / 'activity.json').exists()
+
+@pytest.mark.parametrize('value,kind', [('Persistence', 'tactic'), ('T1001', 'technique')])
+def test_activity_subjects_are_resolved(analyzer, value, kind):
+    report = analyzer.query_activity(value=value, since=datetime(1990, 1, 1), until=datetime(2100, 1, 1))
+    assert report['subject_type'] == kind
+    assert sum(entry['uses'] for entry in report['groups']) == report['uses_in_window']
+
+def test_new_techniques_without_a_subject(analyzer):
+    report = analyzer.query_activity(since=datetime(1990, 1, 1), until=datetime(2100, 1, 1), limit=5)
+    assert len(report['new_techniques']) == 5
+    dates = [entry['first_attributed'] for entry in report['new_techniques']]
+    assert dates == sorted(dates, reverse=True)
+    assert analyzer.query_activity(value='zzqx unknown') is None
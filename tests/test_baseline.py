@@ -0,0 +1,47 @@
+import json
+import os
+
+import openpyxl
+import pytest
+
+# Outputs of the original interactive script on the same synthetic bundle (scale 0.1, seed 3), with dates stripped.
+with open(os.path.join(os.path.dirname(__file__), 'data', 'baseline_outputs.json'), encoding='utf-8') as f:
+    BASELINE = json.load(f)
+
+def _strip(value):
+    if isinstance(value, dict):
+        return {k: _strip(v) for k, v in value.items() if k != 'analysis_date'}
+    if isinstance(value, list):
+        return [_strip(v) for v in value if not (isinstance(v, dict) and v.get('name') == 'Generated')]
+    return value
+
+@pytest.mark.parametrize('group_input,filename', [('SG3', 'sg3_navigator_layer.json'),
+                                                   ('Synthetic Group 7', 'synthetic_group_7_navigator_layer.json'),
+                                                   ('G00011', 'g00011_navigator_layer.json')])
+def test_map_group_matches_baseline(analyzer, tmp_path, group_input, filename):
+    output_file = analyzer.map_group(group_input, str(tmp_path))
+    assert os.path.basename(output_file) == filename
+    with open(output_file, encoding='utf-8') as f:
+        assert _strip(json.load(f)) == BASELINE['map_group'][filename]
+
+@pytest.mark.parametrize('tactic', sorted(BASELINE['prevalence']))
+def test_prevalence_matches_baseline(analyzer, tactic):
+    ranking = analyzer.tactic_prevalence(tactic.replace('-', ' ').title())
+    counts = {tech_id: data['count'] for tech_id, data in ranking}
+    expected = BASELINE['prevalence'][tactic]
+    # Ties keep insertion order, which differs between the relationship scan and the tactic index.
+    assert [data['count'] for _, data in ranking[:10]] == [count for _, count in expected]
+    assert all(counts[tech_id] == count for tech_id, count in expected)
+
+@pytest.mark.parametrize('technique', sorted(BASELINE['technique']))
+def test_technique_workbook_matches_baseline(analyzer, tmp_path, technique):
+    filename = analyzer.assess_technique(technique, 'all', str(tmp_path))
+    sheet = openpyxl.load_workbook(filename).worksheets[0]
+    rows = [[None if v is None else str(v) for v in row] for row in sheet.iter_rows(min_row=5, values_only=True)]
+    assert rows == BASELINE['technique'][technique]
+
+@pytest.mark.parametrize('country', sorted(BASELINE['country']))
+def test_country_matches_baseline(analyzer, tmp_path, country):
+    filename = analyzer.analyze_country(country, str(tmp_path), record_query=False)
+    with open(filename, encoding='utf-8') as f:
+        assert _strip(json.load(f)) == BASELINE['country'][country]
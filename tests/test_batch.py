@@ -0,0 +1,65 @@
+import json
+import os
+
+import openpyxl
+import pytest
+
+QUERIES = [
+    {'type': 'map-group', 'query': 'SG3'},
+    {'type': 'prevalence', 'query': 'Persistence'},
+    {'type': 'technique', 'query': 'T1001'},
+    {'type': 'technique', 'query': 'T1001', 'include_subtechniques': True},
+    {'type': 'country', 'query': 'China'},
+    {'type': 'map-group', 'query': 'No Such Group'},
+]
+
+def _write_jsonl(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(row) + '\n' for row in rows)
+    return str(path)
+
+def _run(tm, synthetic_bundle, tmp_path, queries_file, output_dir, workers):
+    return tm.main(['--bundle', synthetic_bundle, '--cache-dir', str(tmp_path / 'cache'), 'batch', queries_file,
+                     '--output-dir', str(output_dir), '--workers', str(workers)])
+
+def _read_output(path):
+    if path.endswith('.xlsx'):
+        return [list(row) for row in openpyxl.load_workbook(path).worksheets[0].iter_rows(min_row=5, values_only=True)]
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    data.pop('analysis_date', None)
+    if 'metadata' in data:
+        data['metadata'] = [item for item in data['metadata'] if item['name'] != 'Generated']
+    return data
+
+def _outputs(output_dir):
+    with open(os.path.join(output_dir, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    return manifest, {output: _read_output(os.path.join(output_dir, output)) for query in manifest['queries'] for output in query['outputs']}
+
+def test_serial_and_pool_runs_match(tm, synthetic_bundle, tmp_path):
+    queries_file = _write_jsonl(tmp_path / 'queries.jsonl', QUERIES)
+    assert _run(tm, synthetic_bundle, tmp_path, queries_file, tmp_path / 'serial', 1) == 1
+    assert _run(tm, synthetic_bundle, tmp_path, queries_file, tmp_path / 'pool', 3) == 1
+    serial, serial_outputs = _outputs(tmp_path / 'serial')
+    pool, pool_outputs = _outputs(tmp_path / 'pool')
+    assert (serial['total'], serial['succeeded'], serial['failed']) == (6, 5, 1)
+    assert (pool['total'], pool['succeeded'], pool['failed']) == (6, 5, 1)
+    assert [q['status'] for q in serial['queries']] == [q['status'] for q in pool['queries']] == ['ok'] * 5 + ['not_found']
+    assert serial_outputs == pool_outputs
+    direct, with_subtechniques = [serial_outputs[q['outputs'][0]] for q in serial['queries'][2:4]]
+    assert len(with_subtechniques) > len(direct)
+
+def test_include_subtechniques_field(tm, tmp_path):
+    csv_file = tmp_path / 'queries.csv'
+    csv_file.write_text("type,query,scope,include_subtechniques\ntechnique,T1001,all,yes\ntechnique,T1002,,\n", encoding='utf-8')
+    assert [q['include_subtechniques'] for q in tm.load_batch_queries(str(csv_file))] == [True, False]
+    jsonl_file = _write_jsonl(tmp_path / 'queries.jsonl', [{'type': 'technique', 'query': 'T1001', 'include_subtechniques': 'maybe'}])
+    with pytest.raises(ValueError, match='include_subtechniques'):
+        tm.load_batch_queries(jsonl_file)
+
+def test_malformed_row_fails_the_batch(tm, synthetic_bundle, tmp_path, capsys):
+    queries_file = _write_jsonl(tmp_path / 'queries.jsonl', QUERIES[:1] + [{'type': 'bogus', 'query': 'SG3'}])
+    assert _run(tm, synthetic_bundle, tmp_path, queries_file, tmp_path / 'out', 1) == 1
+    assert "entry 2 needs a 'type'" in capsys.readouterr().out
+    assert not (tmp_path / 'out' / 'manifest.json').exists()
@@ -0,0 +1,87 @@
+import os
+import stat
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ETAG = '"synthetic-v1"'
+
+@pytest.fixture
+def bundle_server(synthetic_bundle):
+    with open(synthetic_bundle, 'rb') as f:
+        body = f.read()
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append(dict(self.headers))
+            if self.headers.get('If-None-Match') == ETAG:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', ETAG)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/enterprise-attack/enterprise-attack.json"
+    yield url, body, requests_seen, server
+    server.shutdown()
+    server.server_close()
+
+def _umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+def test_download_writes_bundle_and_meta(tm, tmp_path, bundle_server):
+    url, body, requests_seen, server = bundle_server
+    cache = tm.BundleCache(str(tmp_path), ttl=0)
+    path = cache.fetch(url)
+    with open(path, 'rb') as f:
+        assert f.read() == body
+    meta = cache._read_meta(path + '.meta.json')
+    assert meta['url'] == url and meta['etag'] == ETAG and meta['size'] == len(body)
+    assert 'If-None-Match' not in requests_seen[0]
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~_umask()
+
+def test_revalidation_uses_etag(tm, tmp_path, bundle_server):
+    url, body, requests_seen, server = bundle_server
+    cache = tm.BundleCache(str(tmp_path), ttl=0)
+    path = cache.fetch(url)
+    mtime = os.stat(path).st_mtime_ns
+    assert cache.fetch(url) == path
+    assert requests_seen[-1]['If-None-Match'] == ETAG
+    assert os.stat(path).st_mtime_ns == mtime
+    cache.ttl = 3600
+    cache.fetch(url)
+    assert len(requests_seen) == 2
+
+def test_offline_fallback(tm, tmp_path, bundle_server, capsys):
+    url, body, requests_seen, server = bundle_server
+    cache = tm.BundleCache(str(tmp_path), ttl=0)
+    path = cache.fetch(url)
+    server.shutdown()
+    server.server_close()
+    assert cache.fetch(url, timeout=2) == path
+    assert 'using cached copy' in capsys.readouterr().out
+    assert tm.BundleCache(str(tmp_path), offline=True).fetch(url) == path
+    with pytest.raises(FileNotFoundError):
+        tm.BundleCache(str(tmp_path / 'empty'), offline=True).fetch(url)
+
+def test_analyzer_loads_from_bundle_url(tm, tmp_path, bundle_server, monkeypatch):
+    url, body, requests_seen, server = bundle_server
+    monkeypatch.setitem(tm.DOMAIN_URLS, 'enterprise', url)
+    analyzer = tm.MITREAnalyzer(cache_dir=str(tmp_path), cache_ttl=0, use_snapshot=False)
+    analyzer.load_mitre_data()
+    assert analyzer.loaded_bundle_paths == {'enterprise': analyzer.cache.fetch(url)}
+    assert len(analyzer.groups) == 15
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+@pytest.fixture
+def inventory(analyzer, tmp_path):
+    subtechnique = next(t for t in analyzer.techniques.values() if t['is_subtechnique'])
+    used = sorted({t for closure in analyzer.group_closure.values() for t in closure if not analyzer.techniques[t]['is_subtechnique']})
+    covered = [analyzer.techniques[t]['attack_id'] for t in used[::3]]
+    covered.append(subtechnique['attack_id'].split('.')[0])
+    path = tmp_path / 'covered.txt'
+    path.write_text('# SIEM rules\n' + '\n'.join(f"{attack_id}  # rule" for attack_id in covered) + '\n\nT9999\n', encoding='utf-8')
+    return str(path), covered
+
+def _expected(analyzer, covered_ids, rollup):
+    parent_of = analyzer.technique_resolver.parent_of
+    lift = (lambda t: parent_of.get(t, t)) if rollup else (lambda t: t)
+    covered = {lift(analyzer.technique_resolver.resolve(attack_id)[0]) for attack_id in covered_ids}
+    expected = {}
+    for group_id, closure in analyzer.group_closure.items():
+        used = {lift(t) for t in closure}
+        if used:
+            expected[analyzer.groups[group_id]['attack_id']] = (len(used), len(used & covered))
+    return expected
+
+@pytest.mark.parametrize('rollup', [True, False])
+def test_group_coverage_matches_set_arithmetic(analyzer, inventory, tmp_path, rollup):
+    path, covered_ids = inventory
+    report = analyzer.analyze_coverage(path, str(tmp_path / 'out'), rollup=rollup)
+    assert report['unresolved'] == ['T9999']
+    assert {entry['attack_id']: (entry['techniques'], entry['covered']) for entry in report['groups']} == \
+        _expected(analyzer, covered_ids, rollup)
+    percents = [entry['coverage_percent'] for entry in report['groups']]
+    assert percents == sorted(percents)
+    gap_counts = [gap['group_count'] for gap in report['gaps']]
+    assert gap_counts == sorted(gap_counts, reverse=True)
+    with open(tmp_path / 'out' / 'coverage_gaps_navigator_layer.json', encoding='utf-8') as f:
+        layer = json.load(f)
+    assert {t['techniqueID'] for t in layer['techniques'] if t.get('score')} == {gap['attack_id'] for gap in report['gaps']}
+
+def test_rollup_covers_sub_techniques_through_their_parent(analyzer, inventory, tmp_path):
+    path, covered_ids = inventory
+    rolled = analyzer.analyze_coverage(path, str(tmp_path / 'rolled'), rollup=True)
+    exact = analyzer.analyze_coverage(path, str(tmp_path / 'exact'), rollup=False)
+    assert not any('.' in gap['attack_id'] for gap in rolled['gaps'])
+    assert rolled['weighted_coverage_percent'] >= exact['weighted_coverage_percent']
+
+def test_fail_under_sets_the_exit_code(tm, synthetic_bundle, inventory, tmp_path):
+    path, covered_ids = inventory
+    common = ['--bundle', synthetic_bundle, '--cache-dir', str(tmp_path / 'cache'), 'coverage', path, '--output-dir', str(tmp_path / 'out')]
+    assert tm.main(common + ['--fail-under', '0']) == 0
+    assert tm.main(common + ['--fail-under', '100']) == 1
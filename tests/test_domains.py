@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+def test_bundle_domains_must_match_domains_option(tm, synthetic_bundle, tmp_path, capsys):
+    with pytest.raises(SystemExit) as exited:
+        tm.main(['--bundle', synthetic_bundle, '--domains', 'enterprise,ics', '--cache-dir', str(tmp_path / 'cache'),
+                 'map-group', 'SG3'])
+    assert exited.value.code == 2
+    assert '--bundle gives enterprise data but --domains is enterprise, ics' in capsys.readouterr().err
+    analyzer = tm.MITREAnalyzer(bundle_path=synthetic_bundle, cache_dir=str(tmp_path / 'cache'), domains=['enterprise', 'ics'])
+    with pytest.raises(ValueError, match='selected domains are Enterprise, ICS'):
+        analyzer.load_mitre_data()
+
+def test_domains_default_to_the_bundles_given(tm, synthetic_bundle, tmp_path, capsys):
+    output_dir = tmp_path / 'out'
+    assert tm.main(['--bundle', f"ics={synthetic_bundle}", '--cache-dir', str(tmp_path / 'cache'),
+                    'map-group', 'SG3', '--output-dir', str(output_dir)]) == 0
+    assert 'Loading MITRE ATT&CK ICS data' in capsys.readouterr().out
+    with open(output_dir / 'sg3_navigator_layer.json', encoding='utf-8') as f:
+        assert json.load(f)['domain'] == 'ics-attack'
+    assert tm.MITREAnalyzer(bundle_path=[f"ics={synthetic_bundle}"]).domains == ['ics']
+
+def test_worker_results_are_trimmed_to_ingested_fields(tm, load_analyzer, synthetic_bundle, tmp_path):
+    with open(synthetic_bundle, encoding='utf-8') as f:
+        bundle = json.load(f)
+    for obj in bundle['objects']:
+        obj['x_mitre_version'] = '1.0'
+        obj.setdefault('external_references', []).append({'source_name': 'Vendor Report', 'url': 'https://example.com/report',
+                                                          'description': 'A long citation. ' * 20})
+    ics_bundle = str(tmp_path / 'synthetic-ics.json')
+    with open(ics_bundle, 'w', encoding='utf-8') as f:
+        json.dump(bundle, f)
+    objects = tm._read_bundle_objects(ics_bundle)
+    assert len(objects) == len(bundle['objects'])
+    assert all(set(obj) <= set(tm.INGEST_FIELDS) | {'external_references'} for obj in objects)
+    assert all(ref['source_name'] in tm.ATTACK_SOURCES for obj in objects for ref in obj.get('external_references', []))
+    loaded = load_analyzer([synthetic_bundle, f"ics={ics_bundle}"])
+    expected = tm.MITREAnalyzer(bundle_path=synthetic_bundle, cache_dir=str(tmp_path / 'expected'))
+    seen = set()
+    for domain, path in (('enterprise', synthetic_bundle), ('ics', ics_bundle)):
+        with open(path, encoding='utf-8') as f:
+            for obj in tm.iter_bundle_objects(f):
+                if obj['type'] == 'relationship' and obj['id'] in seen:
+                    continue
+                seen.add(obj['id'])
+                expected._ingest_object(obj, tm.DOMAIN_NAMES[domain])
+    for name in ('groups', 'techniques', 'tactics', 'mitigations'):
+        records = getattr(expected, name)
+        assert {k: v.as_dict() for k, v in getattr(loaded, name).items()} == {k: v.as_dict() for k, v in records.items()}, name
+    assert len(loaded.relationships) == len(expected.relationships)
+    assert all(technique.domains == ('enterprise-attack', 'ics-attack') for technique in loaded.techniques.values())
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+SOFTWARE_ID = 'malware--ffffffff-0000-4000-8000-000000000001'
+
+@pytest.fixture
+def software_bundle(synthetic_bundle, tmp_path):
+    with open(synthetic_bundle, encoding='utf-8') as f:
+        bundle = json.load(f)
+    objects = bundle['objects']
+    group = next(obj for obj in objects if obj['type'] == 'intrusion-set')
+    direct = {obj['target_ref'] for obj in objects if obj.get('source_ref') == group['id'] and obj.get('relationship_type') == 'uses'}
+    technique = next(obj for obj in objects if obj['type'] == 'attack-pattern' and obj['id'] not in direct)
+    objects.append({'type': 'malware', 'id': SOFTWARE_ID, 'name': 'Synthetic RAT', 'x_mitre_aliases': ['Synthetic RAT'],
+                    'modified': '2024-01-01T00:00:00.000Z', 'external_references': [{'source_name': 'mitre-attack', 'external_id': 'S9001'}]})
+    for n, (source_ref, target_ref) in enumerate([(group['id'], SOFTWARE_ID), (SOFTWARE_ID, technique['id'])]):
+        objects.append({'type': 'relationship', 'id': f"relationship--ffffffff-0000-4000-8000-{n:012x}", 'relationship_type': 'uses',
+                        'source_ref': source_ref, 'target_ref': target_ref, 'created': '2024-01-01T00:00:00.000Z',
+                        'modified': '2024-01-01T00:00:00.000Z'})
+    path = str(tmp_path / 'synthetic-software.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(bundle, f)
+    return path, group['id'], technique['external_references'][0]['external_id']
+
+def _scores(layer):
+    return {entry['techniqueID']: entry['score'] for entry in layer['techniques']}
+
+def test_aggregate_layers_count_software_techniques(load_analyzer, software_bundle):
+    path, group_id, attack_id = software_bundle
+    analyzer = load_analyzer(path)
+    other_id = next(g for g in analyzer.groups if g != group_id and attack_id not in
+                    {analyzer.techniques[t]['attack_id'] for t in analyzer.group_closure.get(g, {})})
+    group_layer = analyzer._generate_navigator_layer(analyzer._map_group_techniques_enhanced(analyzer.groups[group_id], verbose=False))
+    assert attack_id in _scores(group_layer)
+    assert _scores(analyzer._frequency_layer([group_id, other_id]))[attack_id] == 1
+    assert _scores(analyzer._combined_layer([group_id, other_id], 'union'))[attack_id] == 1
+    assert set(_scores(analyzer._frequency_layer([group_id]))) == set(_scores(group_layer))
+
+def test_aggregate_layers_are_written_per_domain(load_analyzer, synthetic_bundle, tmp_path):
+    with open(synthetic_bundle, encoding='utf-8') as f:
+        bundle = json.load(f)
+    ics = set()
+    for obj in bundle['objects']:
+        if obj['type'] == 'attack-pattern' and len(ics) < 10:
+            obj['x_mitre_domains'] = ['ics-attack']
+            ics.add(obj['external_references'][0]['external_id'])
+    path = str(tmp_path / 'synthetic-ics.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(bundle, f)
+    analyzer = load_analyzer(path)
+    output_dir = tmp_path / 'layers'
+    analyzer.generate_layers(output_dir=str(output_dir), group_layers=False, frequency=True, union=True, intersection=True)
+    layers = {}
+    for name in ('technique_frequency', 'group_union', 'group_intersection'):
+        for suffix, domain in (('', 'enterprise-attack'), ('_ics', 'ics-attack')):
+            with open(output_dir / f"{name}{suffix}_navigator_layer.json", encoding='utf-8') as f:
+                layers[name, domain] = json.load(f)
+            assert layers[name, domain]['domain'] == domain
+    enterprise, ics_layer = _scores(layers['technique_frequency', 'enterprise-attack']), _scores(layers['technique_frequency', 'ics-attack'])
+    assert set(ics_layer) <= ics and not set(enterprise) & ics
+    assert ics_layer and set(_scores(layers['group_union', 'ics-attack'])) == set(ics_layer)
+    assert {'name': 'Data Source', 'value': 'MITRE ATT&CK ICS'} in layers['technique_frequency', 'ics-attack']['metadata']
+
+def test_layer_writes_are_atomic(analyzer, tmp_path):
+    output_dir = tmp_path / 'layers'
+    output_dir.mkdir()
+    path = str(output_dir / 'layer.json')
+    analyzer._write_layer_file({'name': 'Original'}, path)
+    with pytest.raises(TypeError):
+        analyzer._write_layer_file({'name': 'Broken', 'techniques': [{'score': object()}]}, path)
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f) == {'name': 'Original'}
+    assert [p.name for p in output_dir.iterdir()] == ['layer.json']
+    analyzer._write_layer_file({'name': 'Überwachung'}, path, compact=True)
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == '{"name":"Überwachung"}'
@@ -0,0 +1,129 @@
+import json
+import os
+
+import pytest
+
+def _mapping(analyzer):
+    mapping = {}
+    for group_id, group in analyzer.groups.items():
+        mapped = analyzer._map_group_techniques_enhanced(group, verbose=False)
+        # A diff appends changed relationships, so row order (and technique order) can differ from a fresh load.
+        mapping[group_id] = dict(mapped, techniques=sorted(mapped['techniques'], key=lambda t: (t['attack_id'], t['relationship_created'])))
+    return mapping
+
+def _relationship_index(analyzer, index):
+    rels = analyzer.relationships
+    return {key: sorted((rels.source_ref(row), rels.target_ref(row), rels.created[row], rels.description_text(row)) for row in rows)
+            for key, rows in index.items() if rows}
+
+def _country_ranking(analyzer, country):
+    return [(entry['group_data']['id'], entry['score']) for entry in analyzer.rank_groups_by_country(country)[1]]
+
+@pytest.fixture
+def updated_bundle(synthetic_bundle, tmp_path):
+    with open(synthetic_bundle, encoding='utf-8') as f:
+        bundle = json.load(f)
+    objects = bundle['objects']
+    groups = [obj for obj in objects if obj['type'] == 'intrusion-set']
+    techniques = [obj for obj in objects if obj['type'] == 'attack-pattern']
+    removed_group = groups[0]['id']
+    uses = [obj for obj in objects if obj.get('relationship_type') == 'uses']
+    kept = []
+    for i, obj in enumerate(objects):
+        if obj['id'] == removed_group or obj.get('source_ref') == removed_group or (obj['type'] == 'relationship' and i % 7 == 0):
+            continue
+        kept.append(obj)
+    groups[1].update(description='Synthetic Group 1 has targeted Japan and Germany.', modified='2026-01-01T00:00:00.000Z')
+    techniques[4].update(name='Renamed Synthetic Technique', modified='2026-01-01T00:00:00.000Z')
+    uses[10].update(description='Synthetic Group has used this technique again.', modified='2026-01-01T00:00:00.000Z')
+    kept.append({'type': 'intrusion-set', 'id': 'intrusion-set--ffffffff-0000-4000-8000-000000000001', 'name': 'New Group',
+                 'description': 'New Group has targeted China.', 'aliases': ['New Group'], 'created': '2025-05-01T00:00:00.000Z',
+                 'modified': '2025-05-01T00:00:00.000Z',
+                 'external_references': [{'source_name': 'mitre-attack', 'external_id': 'G99999'}]})
+    for n, technique in enumerate(techniques[:5]):
+        kept.append({'type': 'relationship', 'id': f"relationship--ffffffff-0000-4000-8000-{n:012x}", 'relationship_type': 'uses',
+                     'source_ref': 'intrusion-set--ffffffff-0000-4000-8000-000000000001', 'target_ref': technique['id'],
+                     'description': 'New Group has used this technique.', 'created': '2025-06-01T00:00:00.000Z',
+                     'modified': '2025-06-01T00:00:00.000Z'})
+    bundle['objects'] = kept
+    path = str(tmp_path / 'synthetic-updated.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(bundle, f)
+    return path
+
+def test_snapshot_round_trip(load_analyzer, synthetic_bundle, capsys):
+    built = load_analyzer(synthetic_bundle, use_snapshot=True)
+    assert 'from bundle' in capsys.readouterr().out
+    restored = load_analyzer(synthetic_bundle, use_snapshot=True)
+    assert 'from snapshot' in capsys.readouterr().out
+    assert restored.bundle_version == built.bundle_version
+    assert _mapping(restored) == _mapping(built)
+    for name in ('group_techniques', 'technique_groups', 'technique_uses'):
+        assert _relationship_index(restored, getattr(restored, name)) == _relationship_index(built, getattr(built, name))
+    assert restored.tactic_prevalence_matrix(5) == built.tactic_prevalence_matrix(5)
+    assert _country_ranking(restored, 'China') == _country_ranking(built, 'China')
+
+def test_bundle_diff_matches_full_reload(load_analyzer, synthetic_bundle, updated_bundle):
+    updated = load_analyzer(synthetic_bundle)
+    report = updated.update_bundle(updated_bundle)
+    reloaded = load_analyzer(updated_bundle)
+    assert report['affected_groups']
+    assert updated.loaded_bundle_paths == reloaded.loaded_bundle_paths == {'enterprise': updated_bundle}
+    assert updated.bundle_version == reloaded.bundle_version
+    assert set(updated.groups) == set(reloaded.groups)
+    assert set(updated.techniques) == set(reloaded.techniques)
+    assert len(updated.relationships) == len(reloaded.relationships)
+    assert all(updated.groups[k].as_dict() == reloaded.groups[k].as_dict() for k in updated.groups)
+    assert all(updated.techniques[k].as_dict() == reloaded.techniques[k].as_dict() for k in updated.techniques)
+    for name in ('group_techniques', 'technique_groups', 'technique_uses'):
+        assert _relationship_index(updated, getattr(updated, name)) == _relationship_index(reloaded, getattr(reloaded, name)), name
+    for name in ('technique_first_seen', 'technique_last_seen', 'group_first_seen', 'group_last_seen', 'technique_tactics'):
+        assert getattr(updated, name) == getattr(reloaded, name), name
+    assert {k: set(v) for k, v in updated.tactic_techniques.items()} == {k: set(v) for k, v in reloaded.tactic_techniques.items()}
+    assert _mapping(updated) == _mapping(reloaded)
+    assert updated.tactic_prevalence_matrix(5) == reloaded.tactic_prevalence_matrix(5)
+    for country in ('China', 'Japan', 'Germany'):
+        assert _country_ranking(updated, country) == _country_ranking(reloaded, country)
+
+def _without_generated(layer):
+    return dict(layer, metadata=[item for item in layer['metadata'] if item['name'] != 'Generated'])
+
+def _layer(path):
+    with open(path, encoding='utf-8') as f:
+        return _without_generated(json.load(f))
+
+def test_bundle_diff_refreshes_every_layer_kind(load_analyzer, synthetic_bundle, tmp_path):
+    analyzer = load_analyzer(synthetic_bundle)
+    group_ids = list(analyzer.groups)[:2]
+    unused = next(t for t in analyzer.techniques if not any(t in analyzer.group_closure.get(g, {}) for g in group_ids))
+    output_dir = tmp_path / 'reports'
+    analyzer.generate_layers([analyzer.groups[g]['attack_id'] for g in group_ids], str(output_dir),
+                             frequency=True, union=True, intersection=True)
+    covered_file = tmp_path / 'covered.txt'
+    covered_file.write_text('\n'.join(analyzer.techniques[t]['attack_id'] for t in list(analyzer.techniques)[:10]), encoding='utf-8')
+    analyzer.analyze_coverage(str(covered_file), str(output_dir))
+    (output_dir / 'technique_frequency_old_navigator_layer.json').write_text('{"name": "old", "metadata": []}', encoding='utf-8')
+    with open(synthetic_bundle, encoding='utf-8') as f:
+        bundle = json.load(f)
+    bundle['objects'].append({'type': 'relationship', 'id': 'relationship--ffffffff-0000-4000-8000-00000000000a',
+                              'relationship_type': 'uses', 'source_ref': group_ids[0], 'target_ref': unused,
+                              'description': 'Newly reported use.', 'created': '2026-01-01T00:00:00.000Z',
+                              'modified': '2026-01-01T00:00:00.000Z'})
+    updated_bundle = str(tmp_path / 'synthetic-updated.json')
+    with open(updated_bundle, 'w', encoding='utf-8') as f:
+        json.dump(bundle, f)
+    report = analyzer.update_bundle(updated_bundle, output_dir=str(output_dir))
+    refreshed = {os.path.basename(path) for path in report['refreshed_outputs']}
+    for name in ('technique_frequency', 'group_union', 'coverage_gaps'):
+        assert f"{name}_navigator_layer.json" in refreshed
+    assert 'group_intersection_navigator_layer.json' not in refreshed
+    assert [os.path.basename(path) for path in report['stale_outputs']] == ['technique_frequency_old_navigator_layer.json']
+    reloaded = load_analyzer(updated_bundle)
+    attack_id = analyzer.techniques[unused]['attack_id']
+    frequency = _layer(output_dir / 'technique_frequency_navigator_layer.json')
+    assert frequency == _without_generated(reloaded._frequency_layer(group_ids))
+    assert attack_id in {entry['techniqueID'] for entry in frequency['techniques']}
+    gaps = _layer(output_dir / 'coverage_gaps_navigator_layer.json')
+    assert attack_id in {entry['techniqueID'] for entry in gaps['techniques']}
+    again = analyzer.update_bundle(updated_bundle, output_dir=str(output_dir))
+    assert again['refreshed_outputs'] == []
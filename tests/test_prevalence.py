@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+@pytest.fixture
+def duplicate_phase_bundle(synthetic_bundle, tmp_path):
+    with open(synthetic_bundle, encoding='utf-8') as f:
+        bundle = json.load(f)
+    for obj in bundle['objects']:
+        if obj['type'] == 'attack-pattern':
+            obj['kill_chain_phases'] = obj['kill_chain_phases'] * 2
+    path = str(tmp_path / 'synthetic-duplicates.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(bundle, f)
+    return path
+
+def _engine_state(engine):
+    return (engine.group_counts, engine.group_tactic_counts, engine.tactic_usage, engine.tactic_group_counts)
+
+def test_numpy_and_python_paths_agree(tm, load_analyzer, duplicate_phase_bundle, monkeypatch):
+    if tm.np is None:
+        pytest.skip("NumPy is not installed")
+    analyzer = load_analyzer(duplicate_phase_bundle)
+    assert all(len(set(t['tactics'])) == len(t['tactics']) for t in analyzer.techniques.values())
+    vectorised = tm.PrevalenceEngine(analyzer)
+    monkeypatch.setattr(tm, 'np', None)
+    python = tm.PrevalenceEngine(analyzer)
+    assert _engine_state(python) == _engine_state(vectorised)
+    summary = python.tactic_summary(analyzer)
+    assert summary == vectorised.tactic_summary(analyzer)
+    for tactic, entry in summary.items():
+        ids = [technique['attack_id'] for technique in entry['techniques']]
+        assert len(ids) == len(set(ids))
+        assert entry['technique_count'] == len(set(analyzer.tactic_techniques[tactic]))
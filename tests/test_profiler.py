@@ -0,0 +1,51 @@
+import json
+import pstats
+import re
+import time
+
+import pytest
+
+def test_nested_phases_report_self_time(tm, capsys):
+    profiler = tm.Profiler()
+    profiler.enable()
+    with profiler.phase('outer'):
+        time.sleep(0.01)
+        for _ in range(2):
+            with profiler.phase('inner'):
+                time.sleep(0.01)
+    profiler.count('rows', 3)
+    profiler.count('rows', 4)
+    summary = profiler.report()
+    phases = {entry['phase']: entry for entry in summary['phases']}
+    assert set(phases) == {'outer', 'outer/inner'}
+    assert (phases['outer']['calls'], phases['outer/inner']['calls']) == (1, 2)
+    assert phases['outer']['self_ms'] == pytest.approx(phases['outer']['total_ms'] - phases['outer/inner']['total_ms'], abs=0.01)
+    assert summary['counters'] == {'rows': 7}
+    lines = [re.sub(r'\x1b\[[0-9;]*m', '', line) for line in capsys.readouterr().out.splitlines()]
+    assert any(line.startswith('  outer ') for line in lines)
+    assert any(line.startswith('    inner ') for line in lines)
+    assert any(line.split() == ['rows', '7'] for line in lines)
+
+def test_disabled_profiler_records_nothing(tm):
+    profiler = tm.Profiler()
+    with profiler.phase('ignored'):
+        profiler.count('ignored')
+    assert profiler.summary()['phases'] == [] and profiler.summary()['counters'] == {}
+
+def test_profile_output_json_trace(tm, synthetic_bundle, tmp_path, capsys):
+    trace_file = tmp_path / 'trace.json'
+    assert tm.main(['--bundle', synthetic_bundle, '--cache-dir', str(tmp_path / 'cache'), '--profile-output', str(trace_file),
+                    'map-group', 'SG3', '--output-dir', str(tmp_path / 'out')]) == 0
+    assert 'Profile (wall time' in capsys.readouterr().out
+    with open(trace_file, encoding='utf-8') as f:
+        trace = json.load(f)
+    assert trace['traceEvents'] and all(event['ph'] == 'X' for event in trace['traceEvents'])
+    phases = [entry['phase'] for entry in trace['summary']['phases']]
+    assert any(phase.endswith('group mapping') for phase in phases)
+    assert not tm.PROFILER.enabled
+
+def test_profile_output_cprofile_stats(tm, synthetic_bundle, tmp_path):
+    stats_file = tmp_path / 'run.prof'
+    assert tm.main(['--bundle', synthetic_bundle, '--cache-dir', str(tmp_path / 'cache'), '--profile-output', str(stats_file),
+                    'map-group', 'SG3', '--output-dir', str(tmp_path / 'out')]) == 0
+    assert pstats.Stats(str(stats_file)).total_calls > 0
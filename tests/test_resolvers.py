@@ -0,0 +1,71 @@
+import pytest
+
+GROUPS = {
+    'intrusion-set--1': {'name': 'APT28', 'attack_id': 'G0007', 'aliases': ['APT28', 'Fancy Bear', 'Sofacy']},
+    'intrusion-set--2': {'name': 'Lazarus Group', 'attack_id': 'G0032', 'aliases': ['Lazarus Group', 'HIDDEN COBRA']},
+    'intrusion-set--3': {'name': 'Sofacy', 'attack_id': 'G9999', 'aliases': []}
+}
+
+TECHNIQUES = {
+    'attack-pattern--1': {'name': 'Phishing', 'attack_id': 'T1566'},
+    'attack-pattern--2': {'name': 'Spearphishing Link', 'attack_id': 'T1566.002'},
+    'attack-pattern--3': {'name': 'Spearphishing Attachment', 'attack_id': 'T1566.001'},
+    'attack-pattern--4': {'name': 'Command and Scripting Interpreter', 'attack_id': 'T1059'}
+}
+
+@pytest.fixture
+def group_resolver(tm):
+    return tm.GroupResolver(GROUPS)
+
+@pytest.fixture
+def technique_resolver(tm):
+    return tm.TechniqueResolver(TECHNIQUES)
+
+@pytest.mark.parametrize('text,expected', [
+    ('g0007', ('intrusion-set--1', 'MITRE ID', 'G0007')),
+    ('apt 28', ('intrusion-set--1', 'name', 'APT28')),
+    ('fancy-bear', ('intrusion-set--1', 'alias', 'Fancy Bear')),
+    ('Hidden Cobra', ('intrusion-set--2', 'alias', 'HIDDEN COBRA')),
+    ('Sofacy', ('intrusion-set--3', 'name', 'Sofacy')),
+    ('', None),
+    ('Cozy Bear', None)
+])
+def test_group_resolve(group_resolver, text, expected):
+    assert group_resolver.resolve(text) == expected
+
+def test_group_suggestions_are_ranked_and_distinct(group_resolver):
+    suggestions = group_resolver.suggest('lazarus')
+    assert suggestions[0][1:] == ('intrusion-set--2', None)
+    assert group_resolver.suggest('fancy bar')[0][1:] == ('intrusion-set--1', 'Fancy Bear')
+    assert len({group_id for score, group_id, alias in group_resolver.suggest('a', 10)}) == len(group_resolver.suggest('a', 10))
+    assert group_resolver.suggest('') == []
+
+@pytest.mark.parametrize('text,expected', [
+    ('t1566', ('attack-pattern--1', 'MITRE ID')),
+    (' T1566/001 ', ('attack-pattern--3', 'MITRE ID')),
+    ('spearphishing link', ('attack-pattern--2', 'name')),
+    ('T1567', None)
+])
+def test_technique_resolve(technique_resolver, text, expected):
+    assert technique_resolver.resolve(text) == expected
+
+def test_technique_hierarchy(technique_resolver):
+    assert technique_resolver.subtechniques == {'attack-pattern--1': ['attack-pattern--3', 'attack-pattern--2']}
+    assert technique_resolver.parent_of == {'attack-pattern--2': 'attack-pattern--1', 'attack-pattern--3': 'attack-pattern--1'}
+
+def test_technique_suggestions(technique_resolver):
+    assert technique_resolver.suggest('spearfishing atachment')[0][1] == 'attack-pattern--3'
+    assert technique_resolver.suggest('scripting')[0][1] == 'attack-pattern--4'
+
+def test_analyzer_resolves_groups(analyzer):
+    group = next(iter(analyzer.groups.values()))
+    group_entry, missing = analyzer.resolve_groups([group['attack_id'].lower(), 'zzqx unknown'])
+    assert group_entry['match'] == {'mitre_id': group['attack_id'], 'name': group['name']}
+    assert missing['match'] is None
+
+def test_analyzer_resolves_techniques(analyzer):
+    technique = next(t for t in analyzer.techniques.values() if t['is_subtechnique'])
+    entry, missing = analyzer.resolve_techniques([technique['attack_id'], 'zzqx unknown'])
+    assert entry['match'] == {'attack_id': technique['attack_id'], 'name': technique['name']}
+    assert entry['parent'] == technique['attack_id'].split('.')[0]
+    assert missing['match'] is None
@@ -0,0 +1,51 @@
+import os
+
+def _computed(log, value):
+    def compute():
+        log.append(value)
+        return value
+    return compute
+
+def test_entry_bound_evicts_least_recently_used(tm):
+    cache, log = tm.ResultCache(max_entries=2), []
+    for key in 'abc':
+        cache.get_or_compute('v1', 'kind', (key,), _computed(log, key))
+    assert list(cache.entries) == [('kind', 'b'), ('kind', 'c')]
+    cache.get_or_compute('v1', 'kind', ('b',), _computed(log, 'b'))
+    cache.get_or_compute('v1', 'kind', ('d',), _computed(log, 'd'))
+    assert list(cache.entries) == [('kind', 'b'), ('kind', 'd')]
+    assert log == ['a', 'b', 'c', 'd']
+    assert cache.stats == {'hits': 1, 'disk_hits': 0, 'misses': 4, 'evictions': 2}
+
+def test_byte_bound_evicts_large_results(tm):
+    cache, log = tm.ResultCache(max_entries=10, max_bytes=3000), []
+    for key in 'abc':
+        cache.get_or_compute('v1', 'kind', (key,), _computed(log, key * 1000))
+    assert list(cache.entries) == [('kind', 'b'), ('kind', 'c')]
+    assert cache.size <= 3000
+
+def test_new_version_drops_old_results(tm):
+    cache, log = tm.ResultCache(), []
+    cache.get_or_compute('v1', 'kind', ('a',), _computed(log, 1))
+    assert cache.get_or_compute('v2', 'kind', ('a',), _computed(log, 2)) == 2
+    assert log == [1, 2]
+
+def test_disk_tier_survives_a_restart(tm, tmp_path):
+    log = []
+    first = tm.ResultCache(cache_dir=str(tmp_path))
+    first.get_or_compute('a' * 40, 'kind', ('a',), _computed(log, {'answer': 42}))
+    second = tm.ResultCache(cache_dir=str(tmp_path))
+    assert second.get_or_compute('a' * 40, 'kind', ('a',), _computed(log, None)) == {'answer': 42}
+    assert log == [{'answer': 42}]
+    assert second.stats['disk_hits'] == 1
+    third = tm.ResultCache(cache_dir=str(tmp_path))
+    assert third.get_or_compute('b' * 40, 'kind', ('a',), _computed(log, 'fresh')) == 'fresh'
+    assert os.listdir(third.results_dir) == ['b' * 32]
+
+def test_persisted_results_are_reused_by_a_new_analyzer(load_analyzer, synthetic_bundle):
+    first = load_analyzer(synthetic_bundle, persist_results=True)
+    technique = next(t for t in first.techniques.values() if first.technique_groups.get(t['id']))
+    expected = first._technique_users(technique)
+    second = load_analyzer(synthetic_bundle, persist_results=True)
+    assert second._technique_users(technique) == expected
+    assert second.results.stats['disk_hits'] == 1
@@ -0,0 +1,73 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+@pytest.fixture
+def query_server(tm, analyzer):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), tm.QueryRequestHandler)
+    server.daemon_threads = True
+    server.service = tm.QueryService(analyzer, cache_size=2, reload_interval=0)
+    server.quiet = True
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+
+    def get(path):
+        url = f"http://127.0.0.1:{server.server_address[1]}{path}"
+        try:
+            with urllib.request.urlopen(url, timeout=10) as response:
+                return response.status, response.headers['X-Cache'], json.load(response)
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers['X-Cache'], json.load(e)
+
+    yield get, server.service
+    server.shutdown()
+    server.server_close()
+
+def test_group_route_is_cached(analyzer, query_server):
+    get, service = query_server
+    group = next(iter(analyzer.groups.values()))
+    status, cache, body = get(f"/groups/{group['attack_id']}")
+    assert (status, cache) == (200, 'miss')
+    assert (body['name'], body['attack_id']) == (group['name'], group['attack_id'])
+    assert get(f"/groups/{group['attack_id']}") == (200, 'hit', body)
+    assert get(f"/groups/{group['attack_id'].lower()}")[1] == 'hit'
+    health = get('/health')[2]
+    assert (health['requests'], health['cache_hits'], health['cached_responses']) == (3, 2, 1)
+
+def test_response_cache_is_bounded(analyzer, query_server):
+    get, service = query_server
+    for group in list(analyzer.groups.values())[:3]:
+        assert get(f"/layers/{group['attack_id']}")[0] == 200
+    assert len(service.responses) == 2
+
+def test_technique_route(analyzer, query_server):
+    get, service = query_server
+    technique = next(t for t in analyzer.techniques.values() if analyzer.technique_groups.get(t['id']))
+    status, cache, body = get(f"/techniques/{technique['attack_id']}?scope=top20")
+    assert status == 200
+    assert body['attack_id'] == technique['attack_id']
+    assert len(body['groups']) == min(len(analyzer.technique_groups[technique['id']]), 20)
+
+@pytest.mark.parametrize('path,status,field', [
+    ('/groups/zzqx-unknown', 404, 'suggestions'),
+    ('/techniques/T9999', 404, 'suggestions'),
+    ('/nowhere/x', 404, 'endpoints'),
+    ('/techniques/T1001?scope=some', 400, None),
+    ('/countries/china?limit=many', 400, None)
+])
+def test_errors_are_json(query_server, path, status, field):
+    get, service = query_server
+    code, cache, body = get(path)
+    assert code == status
+    assert 'error' in body
+    if field:
+        assert field in body
+
+def test_reload_is_a_no_op_for_an_unchanged_bundle(query_server):
+    get, service = query_server
+    assert service.reload_if_changed() is False
+    assert get('/health')[2]['reloads'] == 0
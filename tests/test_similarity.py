@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+import pytest
+
+def test_approximate_top_k_falls_back_to_exact(tm, analyzer):
+    engine = tm.SimilarityEngine(analyzer, bands=1)
+    group_id = max(engine.group_ids, key=lambda g: len(engine.top_k(g, 5, approximate=False)))
+    exact = engine.top_k(group_id, 5, approximate=False)
+    assert exact
+    assert len(engine.candidates(engine.index[group_id])) < 5
+    assert engine.top_k(group_id, 5, approximate=True) == exact
+
+@pytest.fixture
+def engine(tm, analyzer):
+    return tm.SimilarityEngine(analyzer)
+
+def _exact(engine, i, j, weights=None):
+    a, b = set(engine.members[i]), set(engine.members[j])
+    weight = (lambda ts: sum(weights[t] for t in ts)) if weights else len
+    return weight(a & b) / weight(a | b)
+
+@pytest.mark.parametrize('method', ['jaccard', 'weighted'])
+def test_scores_match_set_arithmetic(engine, method):
+    weights = engine.weights if method == 'weighted' else None
+    count = len(engine.group_ids)
+    for i in range(count):
+        for j in range(count):
+            assert engine.similarity(i, j, method) == pytest.approx(_exact(engine, i, j, weights))
+            assert engine.shared_count(i, j) == len(set(engine.members[i]) & set(engine.members[j]))
+
+@pytest.mark.parametrize('method', ['jaccard', 'weighted'])
+def test_numpy_and_python_matrices_agree(tm, analyzer, monkeypatch, method):
+    fast = tm.SimilarityEngine(analyzer)
+    expected = fast.pairs(0.0, method, approximate=False)
+    monkeypatch.setattr(tm, 'np', None)
+    slow = tm.SimilarityEngine(analyzer)
+    pairs = slow.pairs(0.0, method, approximate=False)
+    assert [pair[:2] for pair in pairs] == [pair[:2] for pair in expected]
+    assert [pair[2] for pair in pairs] == pytest.approx([pair[2] for pair in expected], abs=1e-6)
+
+def test_lsh_buckets_identical_groups_together(tm):
+    techniques = {f"t{n}": {} for n in range(40)}
+    closure = {'a': {f"t{n}": True for n in range(10)}, 'b': {f"t{n}": True for n in range(10)},
+               'c': {f"t{n}": True for n in range(20, 30)}}
+    engine = tm.SimilarityEngine(SimpleNamespace(groups=dict.fromkeys(closure), techniques=techniques, group_closure=closure))
+    assert engine.candidates(engine.index['a']) == {engine.index['b']}
+    assert engine.candidates(engine.index['c']) == set()
+    assert engine.top_k('a', 1, approximate=True) == [('b', 1.0)]
+
+def test_approximate_pairs_are_exact_scores_of_lsh_candidates(engine):
+    exact = {(i, j): score for i, j, score in engine.pairs(0.0, approximate=False)}
+    approximate = engine.pairs(0.0, approximate=True)
+    assert approximate
+    for i, j, score in approximate:
+        assert j in engine.candidates(i)
+        assert score == pytest.approx(exact[(i, j)])
+
+def test_clusters_join_pairs_above_threshold(engine):
+    pairs = engine.pairs(0.0, approximate=False)
+    threshold = pairs[len(pairs) // 4][2]
+    clusters = engine.clusters(threshold, approximate=False)
+    clustered = {i for members, score in clusters for i in members}
+    assert {i for i, j, score in pairs if score >= threshold} <= clustered
+    assert all(len(members) >= 2 for members, score in clusters)
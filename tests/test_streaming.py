@@ -0,0 +1,32 @@
+import io
+import json
+
+import pytest
+
+BUNDLE = {
+    'type': 'bundle',
+    'id': 'bundle--1',
+    'spec_version': '2.1',
+    'objects': [
+        {'type': 'intrusion-set', 'id': 'intrusion-set--1', 'name': 'Quote "Bear"', 'aliases': ['a\\b', 'café ☃']},
+        {'type': 'x-custom', 'nested': {'list': [1, 2.5, -3e-4, None, True, False], 'text': '{"not": "an object"}'}},
+        {'type': 'attack-pattern', 'id': 'attack-pattern--1', 'x_mitre_version': 12345678901234567890},
+        {'type': 'relationship', 'description': 'line\nbreak\ttab \\u0041 ]}', 'confidence': 100}
+    ],
+    'trailing': {'objects': 'ignored'}
+}
+
+@pytest.mark.parametrize('indent', [None, 2])
+def test_chunk_boundaries_do_not_change_objects(tm, indent):
+    text = json.dumps(BUNDLE, indent=indent, ensure_ascii=indent is None)
+    for chunk_size in range(1, 40):
+        assert list(tm.iter_bundle_objects(io.StringIO(text), chunk_size)) == BUNDLE['objects'], chunk_size
+
+def test_empty_objects_array(tm):
+    assert list(tm.iter_bundle_objects(io.StringIO('{"type": "bundle", "objects": []}'), 3)) == []
+    assert list(tm.iter_bundle_objects(io.StringIO(' { } '), 3)) == []
+
+@pytest.mark.parametrize('text', ['{"objects": [{"a": 1}', '{"objects": [{"a": 1} {"b": 2}]}', '["objects"]'])
+def test_malformed_bundles_raise(tm, text):
+    with pytest.raises(ValueError):
+        list(tm.iter_bundle_objects(io.StringIO(text), 4))
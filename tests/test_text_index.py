@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+@pytest.fixture
+def targeting_bundle(synthetic_bundle, tmp_path):
+    with open(synthetic_bundle, encoding='utf-8') as f:
+        bundle = json.load(f)
+    groups = [obj for obj in bundle['objects'] if obj['type'] == 'intrusion-set']
+    groups[0]['description'] = ' '.join(['filler'] * 70000) + ' It later targeted the Zanzibar ministry.'
+    groups[1]['description'] = 'Synthetic Group 1 has targeted Germany.'
+    groups[2]['description'] = 'Synthetic Group 2 is a Russian speaking actor.'
+    path = str(tmp_path / 'synthetic-targeting.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(bundle, f)
+    return path, [group['name'] for group in groups[:3]]
+
+def _names(results):
+    return [group['name'] for group in results['groups']]
+
+def test_long_descriptions_are_fully_indexed(load_analyzer, targeting_bundle):
+    path, names = targeting_bundle
+    analyzer = load_analyzer(path)
+    results = analyzer.targeting_search(['zanzibar ministry'], expand=False)
+    assert _names(results) == [names[0]]
+    assert 'Zanzibar ministry' in results['groups'][0]['snippet']
+
+def test_terms_match_whole_words(load_analyzer, targeting_bundle):
+    path, names = targeting_bundle
+    analyzer = load_analyzer(path)
+    assert names[1] not in _names(analyzer.targeting_search(['german'], expand=False))
+    assert names[1] in _names(analyzer.targeting_search(['germany'], expand=False))
+    assert names[1] in _names(analyzer.targeting_search(['german*'], expand=False))
+    assert names[2] not in _names(analyzer.targeting_search(['us'], expand=False))
+    assert names[2] in _names(analyzer.targeting_search(['russian'], expand=False))
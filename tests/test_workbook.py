@@ -0,0 +1,36 @@
+import openpyxl
+
+def test_workbook_cleans_each_text_once(tm, analyzer, tmp_path, monkeypatch):
+    profiler = tm.Profiler()
+    profiler.enable()
+    monkeypatch.setattr(tm, 'PROFILER', profiler)
+    rels = analyzer.relationships
+    refs = {rels.description[row] for rows in analyzer.technique_groups.values() for row in rows}
+    refs |= {group._description for group in analyzer.groups.values()}
+    analyzer.export_technique_workbook([], str(tmp_path / 'first.xlsx'), include_subtechniques=True)
+    cleaned = profiler.counters.get('texts cleaned', 0)
+    assert 0 < cleaned <= len(refs)
+    analyzer.results = tm.ResultCache()
+    analyzer.export_technique_workbook([], str(tmp_path / 'second.xlsx'), include_subtechniques=True)
+    assert profiler.counters['texts cleaned'] == cleaned
+
+def test_workbook_has_a_sheet_per_technique_and_a_summary(tm, analyzer, tmp_path):
+    techniques = sorted((t for t in analyzer.techniques.values() if analyzer.technique_groups.get(t['id'])),
+                        key=lambda t: -len(analyzer.technique_groups[t['id']]))[:3]
+    filename = str(tmp_path / 'techniques.xlsx')
+    assert analyzer.export_technique_workbook([t['attack_id'] for t in techniques], filename, scope='top20') == filename
+    workbook = openpyxl.load_workbook(filename)
+    assert workbook.sheetnames == ['Summary'] + [t['attack_id'] for t in techniques]
+    summary = list(workbook['Summary'].iter_rows(values_only=True))
+    assert summary[0] == ('Technique ID', 'Technique', 'Tactics', 'Groups', 'Sheet')
+    for technique, row in zip(techniques, summary[1:]):
+        users = len(analyzer.technique_groups[technique['id']])
+        assert row == (technique['attack_id'], technique['name'], ', '.join(technique['tactics']), min(users, 20), technique['attack_id'])
+        rows = list(workbook[technique['attack_id']].iter_rows(min_row=6, values_only=True))
+        assert rows[0] == tuple(tm.TechniqueWorkbookWriter.HEADERS)
+        assert len(rows) - 1 == min(users, 20)
+
+def test_sheet_titles_are_sanitized_and_unique(tm):
+    writer = tm.TechniqueWorkbookWriter()
+    titles = [writer._sheet_title(title) for title in ['T1059/001', 'T1059_001', 'Summary', 'x' * 40, 'x' * 40]]
+    assert titles == ['T1059_001', 'T1059_001_2', 'Summary', 'x' * 31, 'x' * 29 + '_2']
@@ -1,13 +1,43 @@
 #!/usr/bin/env python3
+import argparse
+import bisect
+import contextlib
+import cProfile
+import csv
+import functools
+import hashlib
+import heapq
 import json
+import multiprocessing
 import requests
 from datetime import datetime, timedelta
 from difflib import SequenceMatcher
 import html
+import math
 import os
+import pickle
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment, PatternFill
 from openpyxl.utils import get_column_letter
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 RED = '\033[91m'
 GREEN = '\033[92m'
@@ -19,6 +49,66 @@ WHITE = '\033[97m'
 ENDC = '\033[0m'
 BOLD = '\033[1m'
 
+ENTERPRISE_URL = "https://raw.githubusercontent.com/mitre/cti/master/enterprise-attack/enterprise-attack.json"
+DOMAIN_URLS = {
+    'enterprise': ENTERPRISE_URL,
+    'mobile': "https://raw.githubusercontent.com/mitre/cti/master/mobile-attack/mobile-attack.json",
+    'ics': "https://raw.githubusercontent.com/mitre/cti/master/ics-attack/ics-attack.json"
+}
+DOMAIN_NAMES = {'enterprise': 'enterprise-attack', 'mobile': 'mobile-attack', 'ics': 'ics-attack'}
+DOMAIN_LABELS = {'enterprise': 'Enterprise', 'mobile': 'Mobile', 'ics': 'ICS'}
+CACHE_FORMAT_VERSION = 1
+SNAPSHOT_FORMAT_VERSION = 5
+SNAPSHOTS_KEPT = 3
+RESULT_CACHE_ENTRIES = 256
+RESULT_CACHE_BYTES = 64 * 1024 * 1024
+PROFILE_EVENTS_KEPT = 100000
+SIMILARITY_METHODS = ('jaccard', 'weighted')
+SIMILARITY_EXACT_LIMIT = 4000
+MINHASH_PERMUTATIONS = 128
+MINHASH_BANDS = 32
+MINHASH_PRIME = (1 << 31) - 1
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'threat-mapping-pro')
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+
+COUNTRY_KEYWORDS = {
+    'united states': ['us', 'usa', 'american', 'washington'],
+    'china': ['chinese', 'beijing', 'prc'],
+    'russia': ['russian', 'moscow', 'kremlin'],
+    'iran': ['iranian', 'tehran', 'persian'],
+    'north korea': ['dprk', 'pyongyang', 'korean'],
+    'south korea': ['rok', 'seoul', 'korean'],
+    'israel': ['israeli', 'tel aviv', 'jerusalem'],
+    'india': ['indian', 'delhi', 'mumbai'],
+    'japan': ['japanese', 'tokyo'],
+    'germany': ['german', 'berlin'],
+    'france': ['french', 'paris'],
+    'united kingdom': ['uk', 'british', 'london', 'england'],
+    'ukraine': ['ukrainian', 'kiev', 'kyiv'],
+    'taiwan': ['taiwanese', 'taipei']
+}
+GOV_KEYWORDS = ['government', 'military', 'defense', 'ministry', 'embassy', 'diplomatic']
+SECTOR_KEYWORDS = {
+    'energy': ['oil', 'gas', 'electric*', 'power grid', 'utilit*', 'nuclear', 'petrochemical*'],
+    'healthcare': ['health*', 'hospital*', 'medical', 'pharmaceutical*'],
+    'financial': ['financ*', 'bank*', 'cryptocurrenc*', 'payment*', 'insurance'],
+    'government': GOV_KEYWORDS,
+    'defense': ['defense', 'military', 'aerospace', 'armed forces'],
+    'telecommunications': ['telecom*', 'mobile operator*', 'internet service provider*'],
+    'education': ['universit*', 'education*', 'academic', 'research institute*'],
+    'technology': ['technology', 'software', 'it services', 'managed service provider*'],
+    'manufacturing': ['manufactur*', 'industrial', 'automotive'],
+    'media': ['media', 'journalist*', 'news'],
+    'retail': ['retail*', 'hospitality', 'point of sale']
+}
+TEXT_POSITION_BITS = 32
+AGGREGATE_LAYER_PREFIXES = ('technique_frequency', 'group_union', 'group_intersection', 'coverage_gaps')
+QUERY_TYPES = ('map-group', 'prevalence', 'technique', 'country')
+DIFF_CATEGORIES = {'intrusion-set': 'groups', 'attack-pattern': 'techniques',
+                   'x-mitre-tactic': 'tactics', 'malware': 'software', 'tool': 'software', 'campaign': 'campaigns',
+                   'course-of-action': 'mitigations', 'x-mitre-data-component': 'data components',
+                   'relationship': 'relationships'}
+
 def display_banner():
     print(f"{BEBEBLUE}" + "="*80 + f"{ENDC}")
     print(f"{VIOLET}{BOLD}████████╗██╗  ██╗██████╗ ███████╗ █████╗ ████████╗{ENDC}")
@@ -48,85 +138,2033 @@ def display_banner():
     print(f"{GREEN}{BOLD}Created by Muhap Yahia{ENDC}")
     print(f"{BEBEBLUE}" + "="*80 + f"{ENDC}")
 
-class MITREAnalyzer:
+_UMASK_LOCK = threading.Lock()
+
+def _bundle_entries(bundle_path):
+    entries = []
+    for entry in [bundle_path] if isinstance(bundle_path, str) else bundle_path or []:
+        domain, sep, path = entry.partition('=')
+        if not sep or domain not in DOMAIN_URLS:
+            domain, path = 'enterprise', entry
+        entries.append((domain, path))
+    return entries
+
+def _atomic_write(path, write_func, mode='wb'):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, mode, encoding=None if 'b' in mode else 'utf-8') as f:
+            write_func(f)
+        with _UMASK_LOCK:
+            umask = os.umask(0)
+            os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        self.phases = {}
+        self.counters = {}
+        self.events = []
+        self.started = time.perf_counter()
+
+    def enable(self):
+        self.reset()
+        self.enabled = True
+
+    def phase(self, name):
+        if not self.enabled:
+            return _NULL_PHASE
+        return self._timed(name)
+
+    @contextlib.contextmanager
+    def _timed(self, name):
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        stack.append(name)
+        path = '/'.join(stack)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            stack.pop()
+            with self.lock:
+                entry = self.phases.setdefault(path, [0, 0.0])
+                entry[0] += 1
+                entry[1] += elapsed
+                if len(self.events) < PROFILE_EVENTS_KEPT:
+                    self.events.append((path, started - self.started, elapsed, threading.get_ident()))
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        with self.lock:
+            phases = dict(self.phases)
+            counters = dict(self.counters)
+        children = {}
+        for path, (calls, total) in phases.items():
+            parent = path.rpartition('/')[0]
+            if parent:
+                children[parent] = children.get(parent, 0.0) + total
+        return {
+            'wall_ms': round((time.perf_counter() - self.started) * 1000, 3),
+            'phases': [{'phase': path, 'calls': calls, 'total_ms': round(total * 1000, 3),
+                        'self_ms': round(max(0.0, total - children.get(path, 0.0)) * 1000, 3)}
+                       for path, (calls, total) in sorted(phases.items())],
+            'counters': dict(sorted(counters.items()))
+        }
+
+    def report(self):
+        summary = self.summary()
+        print(f"\n{BEBEBLUE}[*] Profile (wall time {summary['wall_ms']:.1f} ms){ENDC}")
+        print(f"{YELLOW}  {'Phase':48s} {'Calls':>7s} {'Total ms':>11s} {'Self ms':>11s}{ENDC}")
+        for entry in summary['phases']:
+            depth = entry['phase'].count('/')
+            label = '  ' * depth + entry['phase'].rpartition('/')[2]
+            print(f"  {CYAN}{label:48s}{ENDC} {entry['calls']:7d} {entry['total_ms']:11.2f} {entry['self_ms']:11.2f}")
+        if summary['counters']:
+            print(f"{YELLOW}  Counters:{ENDC}")
+            for name, value in summary['counters'].items():
+                print(f"  {CYAN}{name:48s}{ENDC} {value:>11,}")
+        return summary
+
+    def dump(self, path):
+        with self.lock:
+            events = list(self.events)
+        trace = {
+            'traceEvents': [{'name': name.rpartition('/')[2], 'cat': name, 'ph': 'X', 'pid': os.getpid(), 'tid': tid,
+                             'ts': round(start * 1e6, 1), 'dur': round(elapsed * 1e6, 1)}
+                            for name, start, elapsed, tid in events],
+            'displayTimeUnit': 'ms',
+            'summary': self.summary()
+        }
+        _atomic_write(path, lambda f: json.dump(trace, f), mode='w')
+
+_NULL_PHASE = contextlib.nullcontext()
+PROFILER = Profiler()
+
+def profiled(name):
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+            with PROFILER.phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+EPOCH = datetime(1970, 1, 1)
+MISSING_EPOCH = float('nan')
+
+def _parse_timestamp(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return None
+
+def _to_epoch(dt):
+    return (dt - EPOCH).total_seconds()
+
+def _from_epoch(epoch):
+    return EPOCH + timedelta(seconds=epoch)
+
+def _parse_epoch(value):
+    parsed = _parse_timestamp(value)
+    return MISSING_EPOCH if parsed is None else _to_epoch(parsed)
+
+def _format_epoch(epoch, fmt='%Y-%m-%d'):
+    if epoch is None or math.isnan(epoch):
+        return 'Unknown'
+    return _from_epoch(epoch).strftime(fmt)
+
+class IdTable:
+    def __init__(self):
+        self.ids = []
+        self.index = {}
+
+    def intern(self, stix_id):
+        idx = self.index.get(stix_id)
+        if idx is None:
+            idx = self.index[stix_id] = len(self.ids)
+            self.ids.append(stix_id)
+        return idx
+
+    def __getitem__(self, idx):
+        return self.ids[idx]
+
+    def __len__(self):
+        return len(self.ids)
+
+def _normalize_text(text):
+    if not text:
+        return ""
+    PROFILER.count('texts cleaned')
+    return ' '.join(html.unescape(text).split())
+
+class TextStore:
+    def __init__(self):
+        self.blobs = [b'']
+        self.cleaned_texts = {}
+
+    def __getstate__(self):
+        return {'blobs': self.blobs}
+
+    def __setstate__(self, state):
+        self.blobs = state['blobs']
+        self.cleaned_texts = {}
+
+    def add(self, text):
+        if not text:
+            return 0
+        self.blobs.append(zlib.compress(text.encode('utf-8'), 1))
+        return len(self.blobs) - 1
+
+    def get(self, ref):
+        if not ref:
+            return ''
+        return zlib.decompress(self.blobs[ref]).decode('utf-8')
+
+    def cleaned(self, ref):
+        text = self.cleaned_texts.get(ref)
+        if text is None:
+            text = self.cleaned_texts[ref] = _normalize_text(self.get(ref))
+        return text
+
+class Record:
+    __slots__ = ()
+    fields = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.fields}
+
+class GroupRecord(Record):
+    __slots__ = ('id', 'name', 'aliases', 'created', 'modified', 'attack_id', 'domains', '_texts', '_description')
+    fields = ('id', 'name', 'description', 'aliases', 'created', 'modified', 'attack_id', 'domains')
+
+    def __init__(self, texts, id, name, description, aliases, created, modified, attack_id, domains=()):
+        self._texts = texts
+        self.id = id
+        self.name = name
+        self._description = texts.add(description)
+        self.aliases = tuple(aliases)
+        self.created = created
+        self.modified = modified
+        self.attack_id = attack_id
+        self.domains = tuple(domains)
+
+    @property
+    def description(self):
+        return self._texts.get(self._description)
+
+    @property
+    def clean_description(self):
+        return self._texts.cleaned(self._description)
+
+class TechniqueRecord(Record):
+    __slots__ = ('id', 'name', 'tactics', 'platforms', 'data_sources', 'is_subtechnique', 'attack_id', 'domains',
+                 '_texts', '_description', '_detection')
+    fields = ('id', 'name', 'description', 'tactics', 'platforms', 'data_sources', 'detection', 'is_subtechnique', 'attack_id', 'domains')
+
+    def __init__(self, texts, id, name, description, tactics, platforms, data_sources, detection, is_subtechnique, attack_id,
+                 domains=()):
+        self._texts = texts
+        self.id = id
+        self.name = name
+        self._description = texts.add(description)
+        self.tactics = tuple(tactics)
+        self.platforms = tuple(platforms)
+        self.data_sources = tuple(data_sources)
+        self._detection = texts.add(detection)
+        self.is_subtechnique = is_subtechnique
+        self.attack_id = attack_id
+        self.domains = tuple(domains)
+
+    @property
+    def description(self):
+        return self._texts.get(self._description)
+
+    @property
+    def detection(self):
+        return self._texts.get(self._detection)
+
+    @property
+    def clean_description(self):
+        return self._texts.cleaned(self._description)
+
+    @property
+    def clean_detection(self):
+        return self._texts.cleaned(self._detection)
+
+class TacticRecord(Record):
+    __slots__ = ('id', 'name', 'short_name', 'attack_id', 'domains', '_texts', '_description')
+    fields = ('id', 'name', 'description', 'short_name', 'attack_id', 'domains')
+
+    def __init__(self, texts, id, name, description, short_name, attack_id, domains=()):
+        self._texts = texts
+        self.id = id
+        self.name = name
+        self._description = texts.add(description)
+        self.short_name = short_name
+        self.attack_id = attack_id
+        self.domains = tuple(domains)
+
+    @property
+    def description(self):
+        return self._texts.get(self._description)
+
+class SoftwareRecord(Record):
+    __slots__ = ('id', 'name', 'kind', 'aliases', 'platforms', 'attack_id', 'domains', '_texts', '_description')
+    fields = ('id', 'name', 'kind', 'description', 'aliases', 'platforms', 'attack_id', 'domains')
+
+    def __init__(self, texts, id, name, kind, description, aliases, platforms, attack_id, domains=()):
+        self._texts = texts
+        self.id = id
+        self.name = name
+        self.kind = kind
+        self._description = texts.add(description)
+        self.aliases = tuple(aliases)
+        self.platforms = tuple(platforms)
+        self.attack_id = attack_id
+        self.domains = tuple(domains)
+
+    @property
+    def description(self):
+        return self._texts.get(self._description)
+
+class CampaignRecord(Record):
+    __slots__ = ('id', 'name', 'aliases', 'first_seen', 'last_seen', 'attack_id', 'domains', '_texts', '_description')
+    fields = ('id', 'name', 'description', 'aliases', 'first_seen', 'last_seen', 'attack_id', 'domains')
+
+    def __init__(self, texts, id, name, description, aliases, first_seen, last_seen, attack_id, domains=()):
+        self._texts = texts
+        self.id = id
+        self.name = name
+        self._description = texts.add(description)
+        self.aliases = tuple(aliases)
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.attack_id = attack_id
+        self.domains = tuple(domains)
+
+    @property
+    def description(self):
+        return self._texts.get(self._description)
+
+class MitigationRecord(Record):
+    __slots__ = ('id', 'name', 'attack_id', 'domains', '_texts', '_description')
+    fields = ('id', 'name', 'description', 'attack_id', 'domains')
+
+    def __init__(self, texts, id, name, description, attack_id, domains=()):
+        self._texts = texts
+        self.id = id
+        self.name = name
+        self._description = texts.add(description)
+        self.attack_id = attack_id
+        self.domains = tuple(domains)
+
+    @property
+    def description(self):
+        return self._texts.get(self._description)
+
+class DataComponentRecord(Record):
+    __slots__ = ('id', 'name', 'data_source', 'domains', '_texts', '_description')
+    fields = ('id', 'name', 'description', 'data_source', 'domains')
+
+    def __init__(self, texts, id, name, description, data_source, domains=()):
+        self._texts = texts
+        self.id = id
+        self.name = name
+        self._description = texts.add(description)
+        self.data_source = data_source
+        self.domains = tuple(domains)
+
+    @property
+    def description(self):
+        return self._texts.get(self._description)
+
+class RelationshipTable:
+    def __init__(self, ids, texts):
+        self.ids = ids
+        self.texts = texts
+        self.source = array('l')
+        self.target = array('l')
+        self.kind = array('B')
+        self.created = array('d')
+        self.description = array('l')
+        self.stix = array('l')
+        self.live = bytearray()
+        self.removed = 0
+        self.kinds = []
+        self.kind_codes = {}
+
+    def __len__(self):
+        return len(self.source) - self.removed
+
+    def rows(self):
+        live = self.live
+        return (row for row in range(len(self.source)) if live[row])
+
+    def row_index(self):
+        return {self.stix[row]: row for row in self.rows()}
+
+    def remove(self, row):
+        if self.live[row]:
+            self.live[row] = 0
+            self.removed += 1
+
+    def append(self, stix_id, source_ref, target_ref, relationship_type, description, created):
+        code = self.kind_codes.get(relationship_type)
+        if code is None:
+            code = self.kind_codes[relationship_type] = len(self.kinds)
+            self.kinds.append(relationship_type)
+        self.stix.append(self.ids.intern(stix_id))
+        self.live.append(1)
+        self.source.append(self.ids.intern(source_ref))
+        self.target.append(self.ids.intern(target_ref))
+        self.kind.append(code)
+        self.created.append(_parse_epoch(created))
+        self.description.append(self.texts.add(description))
+
+    def source_ref(self, row):
+        return self.ids[self.source[row]]
+
+    def target_ref(self, row):
+        return self.ids[self.target[row]]
+
+    def relationship_type(self, row):
+        return self.kinds[self.kind[row]]
+
+    def description_text(self, row):
+        return self.texts.get(self.description[row])
+
+    def clean_description(self, row):
+        return self.texts.cleaned(self.description[row])
+
+    def created_iso(self, row):
+        created = self.created[row]
+        if math.isnan(created):
+            return ''
+        return _from_epoch(created).strftime('%Y-%m-%dT%H:%M:%S.%f')[:23] + 'Z'
+
+def iter_bundle_objects(stream, chunk_size=1 << 18):
+    decoder = json.JSONDecoder()
+    whitespace = re.compile(r'\s*')
+    state = {'buf': '', 'pos': 0, 'eof': False}
+
+    def fill():
+        chunk = stream.read(chunk_size)
+        state['buf'] = state['buf'][state['pos']:] + chunk
+        state['pos'] = 0
+        state['eof'] = not chunk
+
+    def next_char():
+        while True:
+            state['pos'] = whitespace.match(state['buf'], state['pos']).end()
+            if state['pos'] < len(state['buf']):
+                return state['buf'][state['pos']]
+            if state['eof']:
+                raise ValueError("Unexpected end of STIX bundle")
+            fill()
+
+    def expect(chars):
+        char = next_char()
+        if char not in chars:
+            raise ValueError(f"Malformed STIX bundle: expected {chars!r} at offset {state['pos']}, got {char!r}")
+        state['pos'] += 1
+        return char
+
+    def decode_value():
+        next_char()
+        while True:
+            try:
+                value, end = decoder.raw_decode(state['buf'], state['pos'])
+                if state['eof'] or (end < len(state['buf']) and state['buf'][end] not in '.eE+-'):
+                    state['pos'] = end
+                    return value
+            except json.JSONDecodeError:
+                if state['eof']:
+                    raise
+            fill()
+
+    expect('{')
+    if next_char() == '}':
+        return
+    while True:
+        key = decode_value()
+        expect(':')
+        if key == 'objects':
+            expect('[')
+            if next_char() == ']':
+                state['pos'] += 1
+            else:
+                while True:
+                    yield decode_value()
+                    if expect(',]') == ']':
+                        break
+        else:
+            decode_value()
+        if expect(',}') == '}':
+            return
+
+INGEST_FIELDS = ('type', 'id', 'name', 'description', 'created', 'modified', 'x_mitre_domains', 'aliases',
+                 'source_ref', 'target_ref', 'relationship_type', 'kill_chain_phases', 'x_mitre_platforms',
+                 'x_mitre_data_sources', 'x_mitre_detection', 'x_mitre_is_subtechnique', 'x_mitre_shortname',
+                 'x_mitre_aliases', 'first_seen', 'last_seen', 'x_mitre_data_source_ref')
+ATTACK_SOURCES = ('mitre-attack', 'mitre-mobile-attack', 'mitre-ics-attack')
+
+def _read_bundle_objects(bundle_path):
+    # Runs in a worker process: keep only what _ingest_object reads so the pickled result stays small.
+    objects = []
+    with open(bundle_path, 'r', encoding='utf-8') as f:
+        for obj in iter_bundle_objects(f):
+            if obj.get('type') not in DIFF_CATEGORIES:
+                continue
+            trimmed = {field: obj[field] for field in INGEST_FIELDS if field in obj}
+            references = [{'source_name': ref['source_name'], 'external_id': ref.get('external_id')}
+                          for ref in obj.get('external_references', []) if ref.get('source_name') in ATTACK_SOURCES]
+            if references:
+                trimmed['external_references'] = references
+            objects.append(trimmed)
+    return objects
+
+def _object_signature(obj):
+    inactive = bool(obj.get('revoked') or obj.get('x_mitre_deprecated'))
+    if obj.get('modified'):
+        return obj['modified'], inactive
+    return hashlib.sha1(json.dumps(obj, sort_keys=True).encode('utf-8')).hexdigest(), inactive
+
+def bundle_signatures(bundle_path):
+    with open(bundle_path, 'r', encoding='utf-8') as f:
+        return {obj['id']: (obj['type'],) + _object_signature(obj)
+                for obj in iter_bundle_objects(f) if obj.get('type') in DIFF_CATEGORIES}
+
+class BundleDiff:
+    def __init__(self):
+        self.added = {}
+        self.modified = {}
+        self.removed = {}
+        self.revoked = set()
+
+    @classmethod
+    def compare(cls, old_signatures, new_bundle_path):
+        diff = cls()
+        seen = set()
+        with open(new_bundle_path, 'r', encoding='utf-8') as f:
+            for obj in iter_bundle_objects(f):
+                if obj.get('type') not in DIFF_CATEGORIES:
+                    continue
+                seen.add(obj['id'])
+                old = old_signatures.get(obj['id'])
+                signature, inactive = _object_signature(obj)
+                if old is None:
+                    diff.added[obj['id']] = obj
+                elif old[1] != signature:
+                    diff.modified[obj['id']] = obj
+                    if inactive and not old[2]:
+                        diff.revoked.add(obj['id'])
+        diff.removed = {stix_id: old[0] for stix_id, old in old_signatures.items() if stix_id not in seen}
+        return diff
+
+    def __bool__(self):
+        return bool(self.added or self.modified or self.removed)
+
+    def changes(self):
+        for stix_id, obj in self.added.items():
+            yield 'added', stix_id, obj['type'], obj
+        for stix_id, obj in self.modified.items():
+            yield ('revoked' if stix_id in self.revoked else 'modified'), stix_id, obj['type'], obj
+        for stix_id, kind in self.removed.items():
+            yield 'removed', stix_id, kind, None
+
+    def summary(self):
+        counts = {category: {'added': 0, 'removed': 0, 'modified': 0, 'revoked': 0} for category in DIFF_CATEGORIES.values()}
+        for change, stix_id, kind, obj in self.changes():
+            counts[DIFF_CATEGORIES[kind]][change] += 1
+        return counts
+
+class TextIndex:
+    TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+    @profiled('text index')
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self.docs = []
+        self.doc_ids = {}
+        postings = {}
+        for group_id, group_data in analyzer.groups.items():
+            self._add(postings, 'group', group_id, group_data.get('description', ''))
+            self._add(postings, 'alias', group_id, '\n'.join(group_data.get('aliases', [])))
+        for technique_id, technique in analyzer.techniques.items():
+            self._add(postings, 'technique', technique_id, technique.get('description', ''))
+        rels = analyzer.relationships
+        for row in rels.rows():
+            if rels.description[row]:
+                self._add(postings, 'relationship', row, rels.description_text(row))
+        self.postings = {token: array('q', entries) for token, entries in postings.items()}
+        self.vocabulary = sorted(self.postings)
+        PROFILER.count('postings indexed', sum(len(entries) for entries in self.postings.values()))
+
+    def _add(self, postings, kind, ref, text):
+        tokens = self.TOKEN_PATTERN.findall(text.lower())
+        if not tokens:
+            return
+        if len(tokens) >= 1 << TEXT_POSITION_BITS:
+            raise ValueError(f"{kind} {ref} has {len(tokens)} tokens, more than the text index can position")
+        doc = len(self.docs)
+        self.docs.append((kind, ref))
+        self.doc_ids[kind, ref] = doc
+        base = doc << TEXT_POSITION_BITS
+        for entry, token in enumerate(tokens, base):
+            entries = postings.get(token)
+            if entries is None:
+                postings[token] = [entry]
+            else:
+                entries.append(entry)
+
+    def text(self, doc):
+        kind, ref = self.docs[doc]
+        if kind == 'relationship':
+            return self.analyzer.relationships.description_text(ref)
+        if kind == 'alias':
+            return '\n'.join(self.analyzer.groups[ref].get('aliases', []))
+        records = self.analyzer.groups if kind == 'group' else self.analyzer.techniques
+        return records[ref].get('description', '')
+
+    def _prefix_postings(self, prefix):
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        matched = []
+        for token in self.vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            matched.extend(self.postings[token])
+        return matched
+
+    def match(self, term):
+        tokens = self.TOKEN_PATTERN.findall(term.lower())
+        if not tokens:
+            return [], 0
+        prefix = term.rstrip().endswith('*')
+        lists = [self._prefix_postings(token) if prefix and k == len(tokens) - 1 else self.postings.get(token, ())
+                 for k, token in enumerate(tokens)]
+        if len(lists) == 1:
+            return lists[0], 1
+        following = [set(entries) for entries in lists[1:]]
+        return [entry for entry in lists[0] if all(entry + k in entries for k, entries in enumerate(following, 1))], len(tokens)
+
+    def search(self, terms, kinds=None):
+        found = {}
+        mask = (1 << TEXT_POSITION_BITS) - 1
+        for term in terms:
+            entries, length = self.match(term)
+            for entry in entries:
+                doc = entry >> TEXT_POSITION_BITS
+                if kinds is None or self.docs[doc][0] in kinds:
+                    found.setdefault(doc, []).append((entry & mask, length, term))
+        for matches in found.values():
+            matches.sort()
+        return found
+
+    def snippet(self, doc, position, length, context=5, width=100):
+        spans = [match.span() for match in self.TOKEN_PATTERN.finditer(self.text(doc).lower())]
+        if position >= len(spans):
+            return None
+        start = spans[max(0, position - context)][0]
+        end = spans[min(len(spans) - 1, position + length - 1 + context)][1]
+        snippet_text = ' '.join(self.text(doc)[start:end].split())
+        if len(snippet_text) > width:
+            snippet_text = snippet_text[:width] + "..."
+        return snippet_text
+
+class TimelineIndex:
+    @profiled('timeline index')
+    def __init__(self, analyzer):
+        rels = analyzer.relationships
+        events = {}
+        for group_id, rows in analyzer.group_techniques.items():
+            for row in rows:
+                created = rels.created[row]
+                if math.isnan(created):
+                    continue
+                technique_id = rels.target_ref(row)
+                keys = [('group', group_id), ('technique', technique_id), ('group technique', (group_id, technique_id))]
+                for tactic in analyzer.technique_tactics.get(technique_id, []):
+                    keys += [('tactic', tactic), ('group tactic', (group_id, tactic))]
+                for key in keys:
+                    events.setdefault(key, []).append((created, row))
+        self.timelines = {}
+        firsts = {}
+        for key, entries in events.items():
+            entries.sort()
+            self.timelines[key] = (array('d', [created for created, row in entries]), array('l', [row for created, row in entries]))
+            firsts.setdefault(key[0], []).append((entries[0][0], key[1]))
+        self.firsts = {}
+        for kind, entries in firsts.items():
+            entries.sort()
+            self.firsts[kind] = (array('d', [created for created, key in entries]), [key for created, key in entries])
+        PROFILER.count('timeline events', sum(len(times) for times, rows in self.timelines.values()))
+
+    def _range(self, times, start, end):
+        return bisect.bisect_left(times, start), bisect.bisect_right(times, end)
+
+    def rows(self, kind, key, start=-math.inf, end=math.inf):
+        timeline = self.timelines.get((kind, key))
+        if timeline is None:
+            return []
+        times, rows = timeline
+        lo, hi = self._range(times, start, end)
+        return rows[lo:hi]
+
+    def count(self, kind, key, start=-math.inf, end=math.inf):
+        timeline = self.timelines.get((kind, key))
+        if timeline is None:
+            return 0
+        lo, hi = self._range(timeline[0], start, end)
+        return hi - lo
+
+    def first_seen(self, kind, start=-math.inf, end=math.inf):
+        if kind not in self.firsts:
+            return []
+        times, keys = self.firsts[kind]
+        lo, hi = self._range(times, start, end)
+        return list(zip(times[lo:hi], keys[lo:hi]))
+
+class CountryTargetingEngine:
+    @profiled('country index')
+    def __init__(self, analyzer):
+        self.index = analyzer.text_index
+        self.timeline = analyzer.timeline
+        self.profiles = []
+        self.positions = {}
+        for group_id, group_data in analyzer.groups.items():
+            self.positions[group_id] = len(self.profiles)
+            self.profiles.append({
+                'group_id': group_id,
+                'group_data': group_data,
+                'technique_count': len(analyzer.group_techniques.get(group_id, [])),
+                'last_seen': analyzer._get_group_last_activity(group_id)
+            })
+        self._matches = {}
+
+    def _group_matches(self, terms, kind='group'):
+        key = (kind, tuple(terms))
+        matches = self._matches.get(key)
+        if matches is None:
+            matches = self._matches[key] = {self.positions[self.index.docs[doc][1]]: (doc, found[0])
+                                            for doc, found in self.index.search(terms, (kind,)).items()}
+        return matches
+
+    def snippet(self, match):
+        doc, (position, length, term) = match
+        return self.index.snippet(doc, position, length)
+
+    def rank(self, country_lower, since, limit=20):
+        PROFILER.count('country profiles scored', len(self.profiles))
+        keywords = COUNTRY_KEYWORDS.get(country_lower, [])
+        country_hits = self._group_matches([country_lower])
+        alias_hits = self._group_matches([country_lower], 'alias')
+        keyword_hits = self._group_matches(keywords)
+        gov_hits = self._group_matches(GOV_KEYWORDS)
+        scored = []
+        for idx, profile in enumerate(self.profiles):
+            score = 0
+            if idx in country_hits:
+                score += 10 + 15
+            if idx in alias_hits:
+                score += 5
+            if idx in keyword_hits:
+                score += 8
+            if idx in gov_hits:
+                score += 5
+            technique_count = profile['technique_count']
+            score += min(technique_count, 50)
+            recent_count = self.timeline.count('group', profile['group_id'], since)
+            if recent_count:
+                score += 2 * recent_count + 20
+            if score > 0:
+                scored.append((score, idx, recent_count > 0))
+        top = heapq.nlargest(limit, scored, key=lambda x: (x[0], -x[1]))
+        results = []
+        for score, idx, recent_activity in top:
+            profile = self.profiles[idx]
+            results.append({
+                'group_data': profile['group_data'],
+                'score': score,
+                'technique_count': profile['technique_count'],
+                'recent_activity': recent_activity,
+                'last_seen': profile['last_seen'],
+                'snippet': self.snippet(country_hits[idx]) if idx in country_hits else None
+            })
+        return len(scored), results
+
+def _normalize_key(text):
+    return re.sub(r'[^a-z0-9]', '', (text or '').lower())
+
+class TrigramIndex:
     def __init__(self):
-        self.enterprise_url = "https://raw.githubusercontent.com/mitre/cti/master/enterprise-attack/enterprise-attack.json"
+        self.keys = []
+        self.payloads = []
+        self.postings = {}
+
+    @staticmethod
+    def _trigrams(key):
+        padded = f"  {key} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def add(self, key, payload):
+        if not key:
+            return
+        idx = len(self.keys)
+        self.keys.append(key)
+        self.payloads.append(payload)
+        for gram in self._trigrams(key):
+            self.postings.setdefault(gram, []).append(idx)
+
+    def search(self, query, limit=5, min_score=0.35):
+        if not query:
+            return []
+        query_grams = self._trigrams(query)
+        shared = {}
+        for gram in query_grams:
+            for idx in self.postings.get(gram, ()):
+                shared[idx] = shared.get(idx, 0) + 1
+        overlaps = {idx: count / (len(query_grams) + len(self.keys[idx]) + 1 - count) for idx, count in shared.items()}
+        candidates = heapq.nlargest(limit * 4, overlaps, key=lambda idx: (overlaps[idx], -idx))
+        ranked = []
+        for idx in candidates:
+            key = self.keys[idx]
+            score = 0.5 * overlaps[idx] + 0.5 * SequenceMatcher(None, query, key).ratio()
+            if query in key:
+                score = max(score, 0.8 + 0.2 * len(query) / len(key))
+            if score >= min_score:
+                ranked.append((score, idx))
+        ranked.sort(key=lambda item: (-item[0], item[1]))
+        return [(round(score, 3), self.keys[idx], self.payloads[idx]) for score, idx in ranked[:limit]]
+
+class GroupResolver:
+    def __init__(self, groups):
+        self.exact = {}
+        self.fuzzy = TrigramIndex()
+        for group_id, group_data in groups.items():
+            self.exact.setdefault(_normalize_key(group_data.get('attack_id')), (group_id, 'MITRE ID', group_data.get('attack_id')))
+        for group_id, group_data in groups.items():
+            self.exact.setdefault(_normalize_key(group_data['name']), (group_id, 'name', group_data['name']))
+            self.fuzzy.add(_normalize_key(group_data['name']), (group_id, None))
+        for group_id, group_data in groups.items():
+            for alias in group_data.get('aliases', []):
+                self.exact.setdefault(_normalize_key(alias), (group_id, 'alias', alias))
+                if _normalize_key(alias) != _normalize_key(group_data['name']):
+                    self.fuzzy.add(_normalize_key(alias), (group_id, alias))
+        self.exact.pop('', None)
+
+    def resolve(self, text):
+        return self.exact.get(_normalize_key(text))
+
+    def suggest(self, text, limit=5):
+        suggestions = []
+        seen = set()
+        for score, key, (group_id, alias) in self.fuzzy.search(_normalize_key(text), limit * 3):
+            if group_id in seen:
+                continue
+            seen.add(group_id)
+            suggestions.append((score, group_id, alias))
+            if len(suggestions) == limit:
+                break
+        return suggestions
+
+def _normalize_technique_id(text):
+    return (text or '').strip().upper().replace('/', '.')
+
+class TechniqueResolver:
+    def __init__(self, techniques):
+        self.by_id = {}
+        self.by_name = {}
+        self.subtechniques = {}
+        self.parent_of = {}
+        self.fuzzy = TrigramIndex()
+        for technique_id, technique in techniques.items():
+            attack_id = _normalize_technique_id(technique.get('attack_id'))
+            if attack_id:
+                self.by_id.setdefault(attack_id, technique_id)
+            self.by_name.setdefault(technique['name'].lower().strip(), technique_id)
+            self.fuzzy.add(_normalize_key(technique['name']), technique_id)
+        for attack_id, technique_id in self.by_id.items():
+            if '.' in attack_id:
+                parent_id = self.by_id.get(attack_id.split('.', 1)[0])
+                if parent_id:
+                    self.parent_of[technique_id] = parent_id
+                    self.subtechniques.setdefault(parent_id, []).append(technique_id)
+        for children in self.subtechniques.values():
+            children.sort(key=lambda technique_id: techniques[technique_id]['attack_id'])
+
+    def resolve(self, text):
+        technique_id = self.by_id.get(_normalize_technique_id(text))
+        if technique_id:
+            return technique_id, 'MITRE ID'
+        technique_id = self.by_name.get((text or '').lower().strip())
+        if technique_id:
+            return technique_id, 'name'
+        return None
+
+    def suggest(self, text, limit=5):
+        return [(score, technique_id) for score, key, technique_id in self.fuzzy.search(_normalize_key(text), limit)]
+
+class PrevalenceEngine:
+    @profiled('prevalence matrix')
+    def __init__(self, analyzer):
+        self.group_ids = list(analyzer.groups)
+        self.technique_ids = list(analyzer.techniques)
+        tactic_order = {tactic['short_name']: tactic.get('attack_id') or '' for tactic in analyzer.tactics.values()}
+        self.tactics = sorted(analyzer.tactic_techniques, key=lambda t: (tactic_order.get(t, '~'), t))
+        group_index = {group_id: i for i, group_id in enumerate(self.group_ids)}
+        technique_index = {technique_id: i for i, technique_id in enumerate(self.technique_ids)}
+        rels = analyzer.relationships
+        self.usage_counts = [len(analyzer.technique_uses.get(t, ())) for t in self.technique_ids]
+        self.technique_groups = [sorted({group_index[rels.source_ref(row)] for row in analyzer.technique_groups.get(t, ())})
+                                 for t in self.technique_ids]
+        self.tactic_members = [[technique_index[t] for t in analyzer.tactic_techniques[tactic]] for tactic in self.tactics]
+        if np is not None:
+            incidence = np.zeros((len(self.group_ids), len(self.technique_ids)), dtype=np.int32)
+            for technique, groups in enumerate(self.technique_groups):
+                incidence[groups, technique] = 1
+            membership = np.zeros((len(self.technique_ids), len(self.tactics)), dtype=np.int32)
+            for tactic, members in enumerate(self.tactic_members):
+                membership[members, tactic] = 1
+            usage = np.asarray(self.usage_counts, dtype=np.int64)
+            self.group_counts = incidence.sum(axis=0).tolist()
+            self.group_tactic_counts = (incidence @ membership).tolist()
+            self.tactic_usage = (usage @ membership).tolist()
+            self.tactic_group_counts = ((incidence @ membership) > 0).sum(axis=0).tolist()
+        else:
+            self.group_counts = [len(groups) for groups in self.technique_groups]
+            self.group_tactic_counts = [[0] * len(self.tactics) for _ in self.group_ids]
+            self.tactic_usage = []
+            self.tactic_group_counts = []
+            for tactic, members in enumerate(self.tactic_members):
+                tactic_groups = set()
+                for technique in members:
+                    tactic_groups.update(self.technique_groups[technique])
+                    for group in self.technique_groups[technique]:
+                        self.group_tactic_counts[group][tactic] += 1
+                self.tactic_usage.append(sum(self.usage_counts[t] for t in members))
+                self.tactic_group_counts.append(len(tactic_groups))
+
+    def tactic_summary(self, analyzer, top=None):
+        summary = {}
+        for tactic, members in enumerate(self.tactic_members):
+            ranked = sorted((t for t in members if self.usage_counts[t]), key=lambda t: (-self.usage_counts[t], -self.group_counts[t]))
+            summary[self.tactics[tactic]] = {
+                'technique_count': len(members),
+                'techniques_in_use': len(ranked),
+                'usage_count': self.tactic_usage[tactic],
+                'group_count': self.tactic_group_counts[tactic],
+                'techniques': [{
+                    'attack_id': analyzer.techniques[self.technique_ids[t]].get('attack_id'),
+                    'name': analyzer.techniques[self.technique_ids[t]]['name'],
+                    'count': self.usage_counts[t],
+                    'group_count': self.group_counts[t]
+                } for t in ranked[:top]]
+            }
+        return summary
+
+    def group_heatmap(self, analyzer):
+        return {analyzer.groups[group_id].get('attack_id') or group_id: dict(zip(self.tactics, counts))
+                for group_id, counts in zip(self.group_ids, self.group_tactic_counts)}
+
+def _popcount(bits):
+    return bin(bits).count('1')
+
+if hasattr(int, 'bit_count'):
+    _popcount = int.bit_count
+
+class SimilarityEngine:
+    @profiled('similarity index')
+    def __init__(self, analyzer, permutations=MINHASH_PERMUTATIONS, bands=MINHASH_BANDS, seed=1):
+        self.group_ids = [group_id for group_id in analyzer.groups if analyzer.group_closure.get(group_id)]
+        self.technique_ids = list(analyzer.techniques)
+        self.index = {group_id: i for i, group_id in enumerate(self.group_ids)}
+        technique_index = {technique_id: i for i, technique_id in enumerate(self.technique_ids)}
+        self.members = [sorted(technique_index[technique_id] for technique_id in analyzer.group_closure[group_id])
+                        for group_id in self.group_ids]
+        self.bitsets = [sum(1 << technique for technique in members) for members in self.members]
+        self.sizes = [len(members) for members in self.members]
+        group_counts = [0] * len(self.technique_ids)
+        for members in self.members:
+            for technique in members:
+                group_counts[technique] += 1
+        total = len(self.group_ids)
+        self.weights = [math.log((1 + total) / (1 + count)) + 1 for count in group_counts]
+        self.weight_totals = [sum(self.weights[technique] for technique in members) for members in self.members]
+        self.permutations = permutations
+        self.rows = max(1, permutations // bands)
+        self.seed = seed
+        self.matrices = {}
+        self._signatures = None
+        self._buckets = None
+
+    def _weight(self, bits):
+        total = 0.0
+        while bits:
+            low = bits & -bits
+            total += self.weights[low.bit_length() - 1]
+            bits ^= low
+        return total
+
+    def similarity(self, i, j, method='jaccard'):
+        common = self.bitsets[i] & self.bitsets[j]
+        if method == 'weighted':
+            shared = self._weight(common)
+            union = self.weight_totals[i] + self.weight_totals[j] - shared
+        else:
+            shared = _popcount(common)
+            union = self.sizes[i] + self.sizes[j] - shared
+        return shared / union if union else 0.0
+
+    def shared_count(self, i, j):
+        return _popcount(self.bitsets[i] & self.bitsets[j])
+
+    @profiled('similarity matrix')
+    def matrix(self, method='jaccard'):
+        scores = self.matrices.get(method)
+        if scores is not None:
+            return scores
+        count = len(self.group_ids)
+        if np is not None and count:
+            incidence = np.zeros((count, len(self.technique_ids)), dtype=np.float32)
+            for i, members in enumerate(self.members):
+                incidence[i, members] = 1
+            if method == 'weighted':
+                shared = (incidence * np.asarray(self.weights, dtype=np.float32)) @ incidence.T
+                totals = np.asarray(self.weight_totals, dtype=np.float32)
+            else:
+                shared = incidence @ incidence.T
+                totals = np.asarray(self.sizes, dtype=np.float32)
+            union = totals[:, None] + totals[None, :] - shared
+            scores = np.divide(shared, union, out=np.zeros_like(shared), where=union > 0)
+        else:
+            scores = [[1.0] * count for _ in range(count)]
+            for i in range(count):
+                for j in range(i + 1, count):
+                    scores[i][j] = scores[j][i] = self.similarity(i, j, method)
+        PROFILER.count('group pairs compared', count * (count - 1) // 2)
+        self.matrices[method] = scores
+        return scores
+
+    @profiled('minhash')
+    def signatures(self):
+        if self._signatures is not None:
+            return self._signatures
+        rng = random.Random(self.seed)
+        coefficients = [(rng.randrange(1, MINHASH_PRIME), rng.randrange(0, MINHASH_PRIME)) for _ in range(self.permutations)]
+        if np is not None:
+            a = np.asarray([c[0] for c in coefficients], dtype=np.uint64)[:, None]
+            b = np.asarray([c[1] for c in coefficients], dtype=np.uint64)[:, None]
+            signatures = [((a * np.asarray(members, dtype=np.uint64)[None, :] + b) % MINHASH_PRIME).min(axis=1).tolist()
+                          for members in self.members]
+        else:
+            signatures = [[min((a * technique + b) % MINHASH_PRIME for technique in members) for a, b in coefficients]
+                          for members in self.members]
+        buckets = {}
+        for i, signature in enumerate(signatures):
+            for band in range(0, self.permutations - self.rows + 1, self.rows):
+                buckets.setdefault((band, tuple(signature[band:band + self.rows])), []).append(i)
+        self._buckets = buckets
+        self._signatures = signatures
+        return signatures
+
+    def candidates(self, i):
+        signature = self.signatures()[i]
+        found = set()
+        for band in range(0, self.permutations - self.rows + 1, self.rows):
+            found.update(self._buckets.get((band, tuple(signature[band:band + self.rows])), ()))
+        found.discard(i)
+        return found
+
+    def _approximate(self, count):
+        return count > SIMILARITY_EXACT_LIMIT
+
+    def top_k(self, group_id, k=10, method='jaccard', approximate=None):
+        i = self.index.get(group_id)
+        if i is None:
+            return []
+        if approximate is None:
+            approximate = self._approximate(len(self.group_ids))
+        others = self.candidates(i) if approximate else None
+        if others is None or len(others) < k:
+            others = (j for j in range(len(self.group_ids)) if j != i)
+        scored = heapq.nlargest(k, ((self.similarity(i, j, method), -j) for j in others))
+        return [(self.group_ids[-j], score) for score, j in scored if score > 0]
+
+    def pairs(self, threshold=0.0, method='jaccard', approximate=None):
+        count = len(self.group_ids)
+        if approximate is None:
+            approximate = self._approximate(count)
+        if approximate:
+            self.signatures()
+            seen = set()
+            for members in self._buckets.values():
+                for x in range(len(members)):
+                    for y in range(x + 1, len(members)):
+                        seen.add((members[x], members[y]))
+            found = ((i, j, self.similarity(i, j, method)) for i, j in seen)
+        elif np is not None and count:
+            scores = self.matrix(method)
+            rows, cols = np.triu_indices(count, 1)
+            values = scores[rows, cols]
+            keep = (values > 0) & (values >= threshold)
+            rows, cols, values = rows[keep], cols[keep], values[keep]
+            order = np.lexsort((cols, rows, -values))
+            return list(zip(rows[order].tolist(), cols[order].tolist(), values[order].tolist()))
+        else:
+            scores = self.matrix(method)
+            found = ((i, j, scores[i][j]) for i in range(count) for j in range(i + 1, count))
+        return sorted(((i, j, score) for i, j, score in found if score > 0 and score >= threshold),
+                      key=lambda pair: (-pair[2], pair[0], pair[1]))
+
+    def clusters(self, threshold=0.5, method='jaccard', approximate=None, pairs=None):
+        if pairs is None:
+            pairs = self.pairs(threshold, method, approximate)
+        parent = list(range(len(self.group_ids)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j, score in pairs:
+            if score >= threshold:
+                parent[find(i)] = find(j)
+        members = {}
+        for i in range(len(self.group_ids)):
+            members.setdefault(find(i), []).append(i)
+        clusters = []
+        for group in members.values():
+            if len(group) < 2:
+                continue
+            scores = [self.similarity(i, j, method) for x, i in enumerate(group) for j in group[x + 1:]]
+            clusters.append((group, sum(scores) / len(scores)))
+        clusters.sort(key=lambda cluster: (-len(cluster[0]), -cluster[1]))
+        return clusters
+
+class CoverageEngine:
+    @profiled('coverage index')
+    def __init__(self, analyzer):
+        similarity = analyzer.similarity_engine
+        parent_of = analyzer.technique_resolver.parent_of
+        self.group_ids = similarity.group_ids
+        self.technique_ids = similarity.technique_ids
+        self.index = {technique_id: i for i, technique_id in enumerate(self.technique_ids)}
+        self.parent = [self.index.get(parent_of.get(technique_id), i) for i, technique_id in enumerate(self.technique_ids)]
+        self.bitsets = {False: similarity.bitsets,
+                        True: [sum(1 << parent for parent in {self.parent[t] for t in members}) for members in similarity.members]}
+        self.group_counts = {}
+        for rollup, bitsets in self.bitsets.items():
+            counts = [0] * len(self.technique_ids)
+            for bits in bitsets:
+                while bits:
+                    low = bits & -bits
+                    counts[low.bit_length() - 1] += 1
+                    bits ^= low
+            self.group_counts[rollup] = counts
+
+    def mask(self, technique_ids, rollup=True):
+        bits = 0
+        for technique_id in technique_ids:
+            i = self.index.get(technique_id)
+            if i is not None:
+                bits |= 1 << (self.parent[i] if rollup else i)
+        return bits
+
+    @staticmethod
+    def members(bits):
+        found = []
+        while bits:
+            low = bits & -bits
+            found.append(low.bit_length() - 1)
+            bits ^= low
+        return found
+
+    def analyze(self, covered, rollup=True):
+        counts = self.group_counts[rollup]
+        groups = []
+        for group_id, bits in zip(self.group_ids, self.bitsets[rollup]):
+            uncovered = bits & ~covered
+            gaps = self.members(uncovered)
+            used = _popcount(bits)
+            groups.append((group_id, used, used - len(gaps), gaps, sum(counts[t] for t in gaps)))
+        in_use = [t for t, count in enumerate(counts) if count]
+        gaps = sorted((t for t in in_use if not covered >> t & 1), key=lambda t: (-counts[t], self.technique_ids[t]))
+        return groups, in_use, gaps
+
+class TechniqueWorkbookWriter:
+    HEADERS = ["APT Name", "APT Group MITRE ID", "Aliases", "APT Description", "Last Seen", "First Seen", "Usage Description"]
+    SUMMARY_HEADERS = ["Technique ID", "Technique", "Tactics", "Groups", "Sheet"]
+    INVALID_TITLE_CHARS = re.compile(r'[\\/*?:\[\]]')
+
+    def __init__(self, summary=False):
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheet_titles = set()
+        self.cells_written = 0
+        self.summary = None
+        if summary:
+            self.summary = self.workbook.create_sheet(self._sheet_title("Summary"))
+            for col, width in enumerate([14, 50, 40, 8, 20], 1):
+                self.summary.column_dimensions[get_column_letter(col)].width = width
+            self.summary.append([self._cell(self.summary, header, Font(bold=True), "D9E1F2") for header in self.SUMMARY_HEADERS])
+
+    def _sheet_title(self, title):
+        base = self.INVALID_TITLE_CHARS.sub('_', title)[:31] or "Sheet"
+        candidate, suffix = base, 2
+        while candidate.lower() in self.sheet_titles:
+            candidate = f"{base[:31 - len(str(suffix)) - 1]}_{suffix}"
+            suffix += 1
+        self.sheet_titles.add(candidate.lower())
+        return candidate
+
+    @staticmethod
+    def _cell(ws, value, font=None, color=None, centered=True):
+        cell = WriteOnlyCell(ws, value=value)
+        if font:
+            cell.font = font
+        if color:
+            cell.fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
+        if centered:
+            cell.alignment = Alignment(horizontal='center')
+        return cell
+
+    def _group_row(self, group):
+        first_seen = group.get('created', '')[:10] if group.get('created') else 'Unknown'
+        last_seen = group.get('modified', '')[:10] if group.get('modified') else 'Unknown'
+        if group.get('relationship_created'):
+            first_seen = group['relationship_created'][:10]
+        aliases = ', '.join(group.get('aliases', [])) if group.get('aliases') else 'None'
+        return [group['name'], group['attack_id'], aliases, group.get('description', ''),
+                last_seen, first_seen, group.get('relationship_description', '')]
+
+    @profiled('excel sheet')
+    def add_technique(self, technique, using_groups, title=None):
+        ws = self.workbook.create_sheet(self._sheet_title(title or technique.get('attack_id') or technique['name']))
+        heading = f"Technique Analysis: {technique['name']} ({technique.get('attack_id', 'Unknown')})"
+        details = [f"Tactics: {', '.join(technique['tactics'])}",
+                   f"Platforms: {', '.join(technique.get('platforms', []))}",
+                   f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"]
+        widths = [max(len(heading), *(len(line) for line in details))] + [4] * (len(self.HEADERS) - 1)
+        rows = []
+        for group in using_groups:
+            row = self._group_row(group)
+            for col, value in enumerate(row):
+                widths[col] = max(widths[col], len(str(value)))
+            rows.append(row)
+        for col, header in enumerate(self.HEADERS):
+            widths[col] = max(widths[col], len(header))
+        for col, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(col)].width = min(width + 2, 50)
+        ws.merged_cells.add(f"A1:{get_column_letter(len(self.HEADERS))}1")
+        ws.append([self._cell(ws, heading, Font(bold=True, size=14), "4472C4")])
+        for line in details:
+            ws.append([line])
+        ws.append([])
+        ws.append([self._cell(ws, header, Font(bold=True), "D9E1F2") for header in self.HEADERS])
+        for row in rows:
+            ws.append(row)
+        self.cells_written += 4 + len(self.HEADERS) * (len(rows) + 1)
+        if self.summary is not None:
+            self.summary.append([technique.get('attack_id'), technique['name'], ', '.join(technique['tactics']), len(rows), ws.title])
+            self.cells_written += len(self.SUMMARY_HEADERS)
+        return ws.title
+
+    @profiled('excel save')
+    def save(self, filename):
+        PROFILER.count('excel cells written', self.cells_written)
+        self.workbook.save(filename)
+
+class BundleCache:
+    def __init__(self, cache_dir=None, ttl=DEFAULT_CACHE_TTL, offline=False):
+        self.cache_dir = os.path.join(cache_dir or DEFAULT_CACHE_DIR, f"v{CACHE_FORMAT_VERSION}")
+        self.ttl = ttl
+        self.offline = offline
+
+    def _paths(self, url):
+        name = os.path.basename(urlparse(url).path) or 'bundle.json'
+        data_path = os.path.join(self.cache_dir, name)
+        return data_path, data_path + '.meta.json'
+
+    def _read_meta(self, meta_path):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, meta_path, meta):
+        _atomic_write(meta_path, lambda f: json.dump(meta, f, indent=2), mode='w')
+
+    def fetch(self, url, timeout=30):
+        data_path, meta_path = self._paths(url)
+        meta = self._read_meta(meta_path)
+        cached = os.path.exists(data_path) and meta.get('url') == url
+        if self.offline:
+            if cached:
+                print(f"{BEBEBLUE}[*] Offline mode: using cached bundle {data_path}{ENDC}")
+                return data_path
+            raise FileNotFoundError(f"No cached bundle for {url} in {self.cache_dir}")
+        if cached and time.time() - meta.get('fetched_at', 0) < self.ttl:
+            print(f"{BEBEBLUE}[*] Using cached bundle (age {int(time.time() - meta.get('fetched_at', 0))}s){ENDC}")
+            return data_path
+        headers = {}
+        if cached and meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if cached and meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        try:
+            with requests.get(url, headers=headers, timeout=timeout, stream=True) as response:
+                if response.status_code == 304 and cached:
+                    print(f"{GREEN}[+] Cached bundle is up to date{ENDC}")
+                    meta['fetched_at'] = time.time()
+                    self._write_meta(meta_path, meta)
+                    return data_path
+                response.raise_for_status()
+                print(f"{BEBEBLUE}[*] Downloading {url}{ENDC}")
+                def write_body(f):
+                    for chunk in response.iter_content(chunk_size=1 << 20):
+                        f.write(chunk)
+                _atomic_write(data_path, write_body)
+                meta = {
+                    'url': url,
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'fetched_at': time.time(),
+                    'size': os.path.getsize(data_path)
+                }
+                self._write_meta(meta_path, meta)
+                return data_path
+        except requests.RequestException as e:
+            if cached:
+                print(f"{YELLOW}[!] Could not revalidate bundle ({e}), using cached copy{ENDC}")
+                return data_path
+            raise
+
+class SnapshotStore:
+    def __init__(self, cache_dir=None):
+        self.snapshot_dir = os.path.join(cache_dir or DEFAULT_CACHE_DIR, f"v{CACHE_FORMAT_VERSION}", 'snapshots')
+        self.fingerprints_path = os.path.join(self.snapshot_dir, 'fingerprints.json')
+
+    def fingerprint(self, bundle_path):
+        stat = os.stat(bundle_path)
+        key = os.path.abspath(bundle_path)
+        try:
+            with open(self.fingerprints_path, 'r', encoding='utf-8') as f:
+                fingerprints = json.load(f)
+        except (OSError, ValueError):
+            fingerprints = {}
+        known = fingerprints.get(key)
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            return known['sha256']
+        digest = hashlib.sha256()
+        with open(bundle_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        fingerprints[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+        try:
+            _atomic_write(self.fingerprints_path, lambda f: json.dump(fingerprints, f, indent=2), mode='w')
+        except OSError:
+            pass
+        return fingerprints[key]['sha256']
+
+    def _path(self, version):
+        return os.path.join(self.snapshot_dir, f"{version[:32]}.v{SNAPSHOT_FORMAT_VERSION}.snapshot")
+
+    def load(self, version):
+        try:
+            with open(self._path(version), 'rb') as f:
+                header = pickle.load(f)
+                if header.get('format') != SNAPSHOT_FORMAT_VERSION or header.get('bundle_sha256') != version:
+                    return None
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"{YELLOW}[!] Ignoring unreadable snapshot: {e}{ENDC}")
+            return None
+
+    def save(self, version, state):
+        header = {'format': SNAPSHOT_FORMAT_VERSION, 'bundle_sha256': version, 'created': time.time()}
+        def write_snapshot(f):
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        _atomic_write(self._path(version), write_snapshot)
+        snapshots = sorted((os.path.join(self.snapshot_dir, name) for name in os.listdir(self.snapshot_dir)
+                            if name.endswith('.snapshot')), key=os.path.getmtime, reverse=True)
+        for stale in snapshots[SNAPSHOTS_KEPT:]:
+            try:
+                os.unlink(stale)
+            except OSError:
+                pass
+
+class ResultCache:
+    def __init__(self, max_entries=RESULT_CACHE_ENTRIES, max_bytes=RESULT_CACHE_BYTES, cache_dir=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.results_dir = os.path.join(cache_dir, f"v{CACHE_FORMAT_VERSION}", 'results') if cache_dir else None
+        self.entries = OrderedDict()
+        self.size = 0
+        self.version = None
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _switch_version(self, version):
+        self.entries.clear()
+        self.size = 0
+        self.version = version
+        if self.results_dir and os.path.isdir(self.results_dir):
+            for name in os.listdir(self.results_dir):
+                if name != version[:32]:
+                    shutil.rmtree(os.path.join(self.results_dir, name), ignore_errors=True)
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.results_dir, self.version[:32], f"{digest}.pickle")
+
+    def _store(self, key, value, size):
+        self.entries[key] = (value, size)
+        self.size += size
+        while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+            evicted_key, (evicted, evicted_size) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+            self.stats['evictions'] += 1
+
+    def get_or_compute(self, version, kind, key, compute):
+        if version is None or (self.max_entries <= 0 and not self.results_dir):
+            return compute()
+        key = (kind,) + tuple(key)
+        with self.lock:
+            if version != self.version:
+                self._switch_version(version)
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[0]
+        if self.results_dir:
+            try:
+                with open(self._disk_path(key), 'rb') as f:
+                    data = f.read()
+                value = pickle.loads(data)
+                with self.lock:
+                    self.stats['disk_hits'] += 1
+                    self._store(key, value, len(data))
+                return value
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+        value = compute()
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.stats['misses'] += 1
+            if version == self.version:
+                self._store(key, value, len(data))
+        if self.results_dir:
+            try:
+                _atomic_write(self._disk_path(key), lambda f: f.write(data))
+            except OSError:
+                pass
+        return value
+
+    def summary(self):
+        with self.lock:
+            lookups = self.stats['hits'] + self.stats['disk_hits'] + self.stats['misses']
+            return dict(self.stats, entries=len(self.entries), bytes=self.size,
+                        hit_rate=round((self.stats['hits'] + self.stats['disk_hits']) / lookups, 3) if lookups else 0.0)
+
+class MITREAnalyzer:
+    MODEL_FIELDS = ('ids', 'texts', 'groups', 'techniques', 'relationships', 'tactics',
+                    'group_techniques', 'technique_groups', 'technique_uses', 'technique_tactics', 'tactic_techniques',
+                    'technique_first_seen', 'technique_last_seen', 'group_first_seen', 'group_last_seen',
+                    'domain_groups', 'domain_techniques', 'software', 'campaigns', 'mitigations', 'data_components',
+                    'group_closure', 'technique_mitigations', 'technique_components')
+
+    def __init__(self, bundle_path=None, offline=False, cache_dir=None, cache_ttl=DEFAULT_CACHE_TTL, use_snapshot=True,
+                 result_cache_size=RESULT_CACHE_ENTRIES, persist_results=False, domains=None):
+        self.enterprise_url = ENTERPRISE_URL
+        self.options = {'bundle_path': bundle_path, 'offline': offline, 'cache_dir': cache_dir,
+                        'cache_ttl': cache_ttl, 'use_snapshot': use_snapshot,
+                        'result_cache_size': result_cache_size, 'persist_results': persist_results, 'domains': domains}
+        self.bundle_path = bundle_path
+        self.domains = list(domains or dict.fromkeys(domain for domain, path in _bundle_entries(bundle_path)) or ['enterprise'])
+        self.bundle_version = None
+        self.loaded_bundle_path = None
+        self.loaded_bundle_paths = {}
+        self.cache = BundleCache(cache_dir, cache_ttl, offline)
+        self.snapshots = SnapshotStore(cache_dir)
+        self.results = ResultCache(result_cache_size, cache_dir=(cache_dir or DEFAULT_CACHE_DIR) if persist_results else None)
+        self.use_snapshot = use_snapshot
+        self._reset_model()
+        self.country_targets_file = "country_targets.json"
+
+    def _reset_model(self):
+        self.ids = IdTable()
+        self.texts = TextStore()
         self.groups = {}
         self.techniques = {}
-        self.relationships = []
+        self.relationships = RelationshipTable(self.ids, self.texts)
         self.tactics = {}
-        self.country_targets_file = "country_targets.json"
-        
+        self.software = {}
+        self.campaigns = {}
+        self.mitigations = {}
+        self.data_components = {}
+        self.group_techniques = {}
+        self.technique_groups = {}
+        self.technique_uses = {}
+        self.technique_tactics = {}
+        self.tactic_techniques = {}
+        self.technique_first_seen = {}
+        self.technique_last_seen = {}
+        self.group_first_seen = {}
+        self.group_last_seen = {}
+        self.domain_groups = {}
+        self.domain_techniques = {}
+        self.group_closure = {}
+        self.technique_mitigations = {}
+        self.technique_components = {}
+        self._country_engine = None
+        self._text_index = None
+        self._timeline = None
+        self._group_resolver = None
+        self._technique_resolver = None
+        self._prevalence_engine = None
+        self._similarity_engine = None
+        self._coverage_engine = None
+
+    def _resolve_bundle_paths(self):
+        if self.bundle_path:
+            paths = {}
+            for domain, path in _bundle_entries(self.bundle_path):
+                if domain in paths:
+                    raise ValueError(f"More than one bundle given for the {DOMAIN_LABELS[domain]} domain")
+                if not os.path.exists(path):
+                    raise FileNotFoundError(f"Bundle file not found: {path}")
+                paths[domain] = path
+            if set(paths) != set(self.domains):
+                raise ValueError(f"Bundles were given for {', '.join(DOMAIN_LABELS[d] for d in paths)} "
+                                 f"but the selected domains are {', '.join(DOMAIN_LABELS[d] for d in self.domains)}")
+            return paths
+        if len(self.domains) == 1:
+            return {self.domains[0]: self.cache.fetch(DOMAIN_URLS[self.domains[0]])}
+        with ThreadPoolExecutor(max_workers=len(self.domains)) as pool:
+            return dict(zip(self.domains, pool.map(lambda domain: self.cache.fetch(DOMAIN_URLS[domain]), self.domains)))
+
+    def _resolve_bundle_path(self):
+        return next(iter(self._resolve_bundle_paths().values()))
+
+    def _bundle_version(self, bundle_paths):
+        if len(bundle_paths) == 1:
+            return self.snapshots.fingerprint(next(iter(bundle_paths.values())))
+        combined = '|'.join(f"{domain}:{self.snapshots.fingerprint(path)}" for domain, path in sorted(bundle_paths.items()))
+        return hashlib.sha256(combined.encode('utf-8')).hexdigest()
+
+    def _ingest_bundles(self, bundle_paths):
+        objects = 0
+        if len(bundle_paths) == 1:
+            domain, bundle_path = next(iter(bundle_paths.items()))
+            with open(bundle_path, 'r', encoding='utf-8') as f:
+                for obj in iter_bundle_objects(f):
+                    self._ingest_object(obj, DOMAIN_NAMES[domain])
+                    objects += 1
+            return objects
+        seen_relationships = set()
+        workers = min(len(bundle_paths), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {domain: pool.submit(_read_bundle_objects, path) for domain, path in bundle_paths.items()}
+            for domain in bundle_paths:
+                # Drop each domain's objects once ingested instead of holding every domain's list at once.
+                domain_objects = futures.pop(domain).result()
+                for obj in domain_objects:
+                    if obj['type'] == 'relationship':
+                        if obj['id'] in seen_relationships:
+                            continue
+                        seen_relationships.add(obj['id'])
+                    self._ingest_object(obj, DOMAIN_NAMES[domain])
+                objects += len(domain_objects)
+                del domain_objects
+        return objects
+
+    @profiled('load')
     def load_mitre_data(self):
-        print(f"{BEBEBLUE}[*] Loading MITRE ATT&CK Enterprise data...{ENDC}")
+        print(f"{BEBEBLUE}[*] Loading MITRE ATT&CK {', '.join(DOMAIN_LABELS[d] for d in self.domains)} data...{ENDC}")
         try:
-            response = requests.get(self.enterprise_url, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            for obj in data['objects']:
-                if obj['type'] == 'intrusion-set':
-                    group_data = {
-                        'id': obj['id'],
-                        'name': obj['name'],
-                        'description': obj.get('description', ''),
-                        'aliases': obj.get('aliases', []),
-                        'created': obj.get('created', ''),
-                        'modified': obj.get('modified', ''),
-                        'attack_id': None
-                    }
-                    for ref in obj.get('external_references', []):
-                        if ref.get('source_name') == 'mitre-attack':
-                            group_data['attack_id'] = ref.get('external_id')
-                            break
-                    self.groups[obj['id']] = group_data
-                elif obj['type'] == 'attack-pattern':
-                    technique_data = {
-                        'id': obj['id'],
-                        'name': obj['name'],
-                        'description': obj.get('description', ''),
-                        'tactics': [],
-                        'platforms': obj.get('x_mitre_platforms', []),
-                        'data_sources': obj.get('x_mitre_data_sources', []),
-                        'detection': obj.get('x_mitre_detection', ''),
-                        'is_subtechnique': obj.get('x_mitre_is_subtechnique', False),
-                        'attack_id': None
-                    }
-                    for phase in obj.get('kill_chain_phases', []):
-                        if phase.get('kill_chain_name') == 'mitre-attack':
-                            technique_data['tactics'].append(phase['phase_name'])
-                    for ref in obj.get('external_references', []):
-                        if ref.get('source_name') == 'mitre-attack':
-                            technique_data['attack_id'] = ref.get('external_id')
-                            break
-                    self.techniques[obj['id']] = technique_data
-                elif obj['type'] == 'relationship':
-                    self.relationships.append({
-                        'source_ref': obj['source_ref'],
-                        'target_ref': obj['target_ref'],
-                        'relationship_type': obj['relationship_type'],
-                        'description': obj.get('description', ''),
-                        'created': obj.get('created', '')
-                    })
-                elif obj['type'] == 'x-mitre-tactic':
-                    tactic_data = {
-                        'id': obj['id'],
-                        'name': obj['name'],
-                        'description': obj.get('description', ''),
-                        'short_name': obj.get('x_mitre_shortname', ''),
-                        'attack_id': None
-                    }
-                    for ref in obj.get('external_references', []):
-                        if ref.get('source_name') == 'mitre-attack':
-                            tactic_data['attack_id'] = ref.get('external_id')
-                            break
-                    self.tactics[obj['id']] = tactic_data
-            print(f"{GREEN}[+] Loaded {len(self.groups)} groups, {len(self.techniques)} techniques, {len(self.relationships)} relationships{ENDC}")
+            started = time.perf_counter()
+            with PROFILER.phase('resolve bundle'):
+                bundle_paths = self._resolve_bundle_paths()
+            self.loaded_bundle_paths = bundle_paths
+            self.loaded_bundle_path = next(iter(bundle_paths.values()))
+            with PROFILER.phase('fingerprint'):
+                self.bundle_version = self._bundle_version(bundle_paths)
+            with PROFILER.phase('snapshot read'):
+                state = self.snapshots.load(self.bundle_version) if self.use_snapshot else None
+            if state is not None:
+                self._restore_model(state)
+                source = "snapshot"
+            else:
+                self._reset_model()
+                with PROFILER.phase('parse'):
+                    objects = self._ingest_bundles(bundle_paths)
+                PROFILER.count('bundle objects parsed', objects)
+                PROFILER.count('dates parsed', len(self.relationships))
+                self._build_indexes()
+                source = "bundle"
+                if self.use_snapshot:
+                    try:
+                        with PROFILER.phase('snapshot write'):
+                            self.snapshots.save(self.bundle_version, self._model_state())
+                    except (OSError, pickle.PicklingError) as e:
+                        print(f"{YELLOW}[!] Warning: Could not write model snapshot: {e}{ENDC}")
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"{GREEN}[+] Loaded {len(self.groups)} groups, {len(self.techniques)} techniques, {len(self.relationships)} relationships from {source} in {elapsed:.0f} ms{ENDC}")
         except requests.RequestException as e:
             print(f"{RED}[-] Error loading MITRE data: {e}{ENDC}")
             raise
-        except json.JSONDecodeError as e:
+        except ValueError as e:
             print(f"{RED}[-] Error parsing MITRE data: {e}{ENDC}")
             raise
+        except OSError as e:
+            print(f"{RED}[-] Error reading MITRE data: {e}{ENDC}")
+            raise
+
+    def _object_domains(self, obj, existing, domain):
+        domains = list(obj.get('x_mitre_domains') or [domain])
+        if existing is not None:
+            domains += [d for d in existing.domains if d not in domains]
+        return sorted(domains)
+
+    def _ingest_object(self, obj, domain='enterprise-attack'):
+        if obj['type'] == 'intrusion-set':
+            stix_id = self.ids[self.ids.intern(obj['id'])]
+            self.groups[stix_id] = GroupRecord(
+                self.texts, stix_id, obj['name'], obj.get('description', ''), obj.get('aliases', []),
+                obj.get('created', ''), obj.get('modified', ''), self._attack_id(obj),
+                self._object_domains(obj, self.groups.get(stix_id), domain))
+        elif obj['type'] == 'attack-pattern':
+            stix_id = self.ids[self.ids.intern(obj['id'])]
+            tactics = list(dict.fromkeys(phase['phase_name'] for phase in obj.get('kill_chain_phases', [])
+                                         if phase.get('kill_chain_name') in ('mitre-attack', 'mitre-mobile-attack', 'mitre-ics-attack')))
+            self.techniques[stix_id] = TechniqueRecord(
+                self.texts, stix_id, obj['name'], obj.get('description', ''), tactics,
+                obj.get('x_mitre_platforms', []), obj.get('x_mitre_data_sources', []),
+                obj.get('x_mitre_detection', ''), obj.get('x_mitre_is_subtechnique', False), self._attack_id(obj),
+                self._object_domains(obj, self.techniques.get(stix_id), domain))
+        elif obj['type'] == 'relationship':
+            self.relationships.append(obj['id'], obj['source_ref'], obj['target_ref'], obj['relationship_type'],
+                                      obj.get('description', ''), obj.get('created', ''))
+        elif obj['type'] == 'x-mitre-tactic':
+            stix_id = self.ids[self.ids.intern(obj['id'])]
+            self.tactics[stix_id] = TacticRecord(
+                self.texts, stix_id, obj['name'], obj.get('description', ''),
+                obj.get('x_mitre_shortname', ''), self._attack_id(obj),
+                self._object_domains(obj, self.tactics.get(stix_id), domain))
+        elif obj['type'] in ('malware', 'tool'):
+            stix_id = self.ids[self.ids.intern(obj['id'])]
+            self.software[stix_id] = SoftwareRecord(
+                self.texts, stix_id, obj['name'], obj['type'], obj.get('description', ''),
+                obj.get('x_mitre_aliases', []), obj.get('x_mitre_platforms', []), self._attack_id(obj),
+                self._object_domains(obj, self.software.get(stix_id), domain))
+        elif obj['type'] == 'campaign':
+            stix_id = self.ids[self.ids.intern(obj['id'])]
+            self.campaigns[stix_id] = CampaignRecord(
+                self.texts, stix_id, obj['name'], obj.get('description', ''), obj.get('aliases', []),
+                obj.get('first_seen', ''), obj.get('last_seen', ''), self._attack_id(obj),
+                self._object_domains(obj, self.campaigns.get(stix_id), domain))
+        elif obj['type'] == 'course-of-action':
+            stix_id = self.ids[self.ids.intern(obj['id'])]
+            self.mitigations[stix_id] = MitigationRecord(
+                self.texts, stix_id, obj['name'], obj.get('description', ''), self._attack_id(obj),
+                self._object_domains(obj, self.mitigations.get(stix_id), domain))
+        elif obj['type'] == 'x-mitre-data-component':
+            stix_id = self.ids[self.ids.intern(obj['id'])]
+            self.data_components[stix_id] = DataComponentRecord(
+                self.texts, stix_id, obj['name'], obj.get('description', ''), obj.get('x_mitre_data_source_ref', ''),
+                self._object_domains(obj, self.data_components.get(stix_id), domain))
+
+    def _model_state(self):
+        return {field: getattr(self, field) for field in self.MODEL_FIELDS}
+
+    def _restore_model(self, state):
+        self._reset_model()
+        for field in self.MODEL_FIELDS:
+            setattr(self, field, state[field])
+
+    @staticmethod
+    def _attack_id(obj):
+        for ref in obj.get('external_references', []):
+            if ref.get('source_name') in ATTACK_SOURCES:
+                return ref.get('external_id')
+        return None
+
+    @staticmethod
+    def _normalize_tactic(tactic):
+        return tactic.lower().replace(' ', '-')
+
+    @profiled('index')
+    def _build_indexes(self, keys=None):
+        row_indexes = (self.group_techniques, self.technique_groups, self.technique_uses, self.technique_first_seen,
+                       self.technique_last_seen, self.group_first_seen, self.group_last_seen)
+        for index in row_indexes:
+            if keys is None:
+                index.clear()
+            else:
+                for key in keys:
+                    index.pop(key, None)
+        self.technique_tactics = {}
+        self.tactic_techniques = {}
+        self.domain_groups = {}
+        self.domain_techniques = {}
+        self._country_engine = None
+        self._text_index = None
+        self._timeline = None
+        self._group_resolver = None
+        self._technique_resolver = None
+        self._prevalence_engine = None
+        self._similarity_engine = None
+        self._coverage_engine = None
+        for tech_id, technique in self.techniques.items():
+            tactics = [self._normalize_tactic(t) for t in technique['tactics']]
+            self.technique_tactics[tech_id] = tactics
+            for tactic in tactics:
+                self.tactic_techniques.setdefault(tactic, []).append(tech_id)
+            for domain in technique.domains:
+                self.domain_techniques.setdefault(domain, []).append(tech_id)
+        for group_id, group in self.groups.items():
+            for domain in group.domains:
+                self.domain_groups.setdefault(domain, []).append(group_id)
+        rels = self.relationships
+        uses_code = rels.kind_codes.get('uses')
+        codes = None if keys is None else {self.ids.index[key] for key in keys if key in self.ids.index}
+        PROFILER.count('relationships scanned', len(rels))
+        for row in rels.rows():
+            if codes is not None and rels.source[row] not in codes and rels.target[row] not in codes:
+                continue
+            source_ref = rels.source_ref(row)
+            target_ref = rels.target_ref(row)
+            index_source = keys is None or source_ref in keys
+            index_target = keys is None or target_ref in keys
+            created = rels.created[row]
+            if not math.isnan(created):
+                if index_target:
+                    self._extend_seen(self.technique_first_seen, self.technique_last_seen, target_ref, created)
+                if index_source and source_ref in self.groups:
+                    self._extend_seen(self.group_first_seen, self.group_last_seen, source_ref, created)
+            if rels.kind[row] != uses_code or target_ref not in self.techniques:
+                continue
+            if index_target:
+                self.technique_uses.setdefault(target_ref, []).append(row)
+            if source_ref in self.groups:
+                if index_source:
+                    self.group_techniques.setdefault(source_ref, []).append(row)
+                if index_target:
+                    self.technique_groups.setdefault(target_ref, []).append(row)
+        self._build_closures()
+
+    @profiled('closures')
+    def _build_closures(self):
+        rels = self.relationships
+        codes = rels.kind_codes
+        uses_code, attributed_code = codes.get('uses'), codes.get('attributed-to')
+        mitigates_code, detects_code = codes.get('mitigates'), codes.get('detects')
+        software_techniques = {}
+        campaign_techniques = {}
+        actor_software = {}
+        group_campaigns = {}
+        self.technique_mitigations = {}
+        self.technique_components = {}
+        for row in rels.rows():
+            kind = rels.kind[row]
+            source_ref = rels.source_ref(row)
+            target_ref = rels.target_ref(row)
+            if kind == uses_code:
+                if target_ref in self.techniques:
+                    if source_ref in self.software:
+                        software_techniques.setdefault(source_ref, []).append(row)
+                    elif source_ref in self.campaigns:
+                        campaign_techniques.setdefault(source_ref, []).append(row)
+                elif target_ref in self.software and (source_ref in self.groups or source_ref in self.campaigns):
+                    actor_software.setdefault(source_ref, []).append(target_ref)
+            elif kind == attributed_code and source_ref in self.campaigns and target_ref in self.groups:
+                group_campaigns.setdefault(target_ref, []).append(source_ref)
+            elif kind == mitigates_code and source_ref in self.mitigations and target_ref in self.techniques:
+                self.technique_mitigations.setdefault(target_ref, []).append(row)
+            elif kind == detects_code and source_ref in self.data_components and target_ref in self.techniques:
+                self.technique_components.setdefault(target_ref, []).append(row)
+        self.group_closure = {}
+        for group_id in self.groups:
+            paths = {}
+            for row in self.group_techniques.get(group_id, []):
+                paths.setdefault(rels.target_ref(row), []).append(((), row))
+            actors = [((), group_id)] + [((campaign_id,), campaign_id) for campaign_id in group_campaigns.get(group_id, [])]
+            for via, actor in actors:
+                for row in campaign_techniques.get(actor, []) if via else ():
+                    paths.setdefault(rels.target_ref(row), []).append((via, row))
+                for software_id in actor_software.get(actor, []):
+                    for row in software_techniques.get(software_id, []):
+                        paths.setdefault(rels.target_ref(row), []).append((via + (software_id,), row))
+            if paths:
+                self.group_closure[group_id] = paths
+        PROFILER.count('closure edges', sum(len(p) for paths in self.group_closure.values() for p in paths.values()))
+
+    def apply_bundle_diff(self, diff):
+        rels = self.relationships
+        entities = {'intrusion-set': self.groups, 'attack-pattern': self.techniques, 'x-mitre-tactic': self.tactics,
+                    'malware': self.software, 'tool': self.software, 'campaign': self.campaigns,
+                    'course-of-action': self.mitigations, 'x-mitre-data-component': self.data_components}
+        domain = DOMAIN_NAMES[next(iter(self.loaded_bundle_paths), self.domains[0])]
+        touched = set()
+        membership = set()
+        row_index = rels.row_index()
+        for change, stix_id, kind, obj in diff.changes():
+            if kind == 'relationship':
+                row = row_index.get(self.ids.index.get(stix_id))
+                if row is not None:
+                    touched.update((rels.source_ref(row), rels.target_ref(row)))
+                    rels.remove(row)
+                continue
+            touched.add(stix_id)
+            if change in ('added', 'removed'):
+                membership.add(stix_id)
+            if change == 'removed':
+                entities[kind].pop(stix_id, None)
+        for change, stix_id, kind, obj in diff.changes():
+            if obj is not None and kind != 'relationship':
+                self._ingest_object(obj, domain)
+        for change, stix_id, kind, obj in diff.changes():
+            if obj is not None and kind == 'relationship':
+                self._ingest_object(obj, domain)
+                touched.update((obj['source_ref'], obj['target_ref']))
+        if membership:
+            codes = {self.ids.index[key] for key in membership if key in self.ids.index}
+            for row in rels.rows():
+                if rels.source[row] in codes or rels.target[row] in codes:
+                    touched.update((rels.source_ref(row), rels.target_ref(row)))
+        self._build_indexes(touched)
+        return touched
+
+    def _record(self, stix_id):
+        for records in (self.groups, self.techniques, self.tactics, self.software, self.campaigns, self.mitigations, self.data_components):
+            record = records.get(stix_id)
+            if record is not None:
+                return record
+        return None
+
+    def _object_label(self, stix_id, diff=None):
+        record = self._record(stix_id)
+        if record is None and diff is not None and stix_id in diff.added:
+            obj = diff.added[stix_id]
+            return {'id': stix_id, 'attack_id': self._attack_id(obj), 'name': obj.get('name')}
+        if record is None:
+            return {'id': stix_id}
+        return {'id': stix_id, 'attack_id': record.get('attack_id'), 'name': record['name']}
+
+    def _provenance(self, via):
+        if not via:
+            return {'type': 'direct', 'via': []}
+        kinds = ['campaign' if stix_id in self.campaigns else 'software' for stix_id in via]
+        return {'type': ' '.join(kinds), 'via': [{'attack_id': self._record(stix_id).get('attack_id'), 'name': self._record(stix_id)['name']}
+                                                 for stix_id in via]}
+
+    def _describe_change(self, diff, change, stix_id, kind, obj, row_index):
+        entry = {'change': change, 'type': DIFF_CATEGORIES[kind]}
+        if kind != 'relationship':
+            if obj is None:
+                entry.update(self._object_label(stix_id))
+            else:
+                entry.update({'id': stix_id, 'attack_id': self._attack_id(obj), 'name': obj.get('name')})
+            return entry
+        rels = self.relationships
+        if obj is None:
+            row = row_index.get(self.ids.index.get(stix_id))
+            if row is None:
+                entry['id'] = stix_id
+                return entry
+            source_ref, target_ref, relationship_type = rels.source_ref(row), rels.target_ref(row), rels.relationship_type(row)
+        else:
+            source_ref, target_ref, relationship_type = obj['source_ref'], obj['target_ref'], obj['relationship_type']
+        entry.update({'id': stix_id, 'relationship_type': relationship_type,
+                      'source': self._object_label(source_ref, diff).get('name', source_ref),
+                      'target': self._object_label(target_ref, diff).get('name', target_ref)})
+        return entry
+
+    @profiled('diff')
+    def update_bundle(self, new_bundle_path, old_signatures=None, output_dir=None):
+        if len(self.loaded_bundle_paths) > 1:
+            raise ValueError("Bundle diffs apply to a single-domain model")
+        old_bundle_path = self.loaded_bundle_path
+        print(f"{BEBEBLUE}[*] Comparing {old_bundle_path} with {new_bundle_path}...{ENDC}")
+        started = time.perf_counter()
+        if old_signatures is None:
+            old_signatures = bundle_signatures(old_bundle_path)
+        diff = BundleDiff.compare(old_signatures, new_bundle_path)
+        row_index = self.relationships.row_index()
+        changes = [self._describe_change(diff, change, stix_id, kind, obj, row_index) for change, stix_id, kind, obj in diff.changes()]
+        removed_groups = {stix_id: self.groups[stix_id].get('attack_id') for stix_id in diff.removed if stix_id in self.groups}
+        technique_last_seen = dict(self.technique_last_seen)
+        group_closure = self.group_closure
+        touched = self.apply_bundle_diff(diff)
+        affected = {ref for ref in touched if ref in self.groups or ref in removed_groups}
+        for ref in touched:
+            if ref in diff.added or ref in diff.modified or technique_last_seen.get(ref) != self.technique_last_seen.get(ref):
+                affected.update(self.relationships.source_ref(row) for row in self.technique_groups.get(ref, []))
+        for closure in (group_closure, self.group_closure):
+            for group_id, paths in closure.items():
+                if group_id not in affected and any(ref in touched for entries in paths.values() for via, row in entries for ref in via):
+                    affected.add(group_id)
+        affected_ids = {self.groups[ref].get('attack_id') if ref in self.groups else removed_groups[ref] for ref in affected}
+        self.loaded_bundle_paths = {next(iter(self.loaded_bundle_paths), self.domains[0]): new_bundle_path}
+        self.loaded_bundle_path = new_bundle_path
+        self.bundle_version = self._bundle_version(self.loaded_bundle_paths)
+        if self.use_snapshot and diff:
+            try:
+                self.snapshots.save(self.bundle_version, self._model_state())
+            except (OSError, pickle.PicklingError) as e:
+                print(f"{YELLOW}[!] Warning: Could not write model snapshot: {e}{ENDC}")
+        elapsed = (time.perf_counter() - started) * 1000
+        summary = diff.summary()
+        print(f"{GREEN}[+] Applied {len(changes)} changes in {elapsed:.0f} ms, {len(affected)} groups affected{ENDC}")
+        print(f"{BEBEBLUE}{'':15s} {'Added':>8s} {'Removed':>8s} {'Modified':>9s} {'Revoked':>8s}{ENDC}")
+        for category, counts in summary.items():
+            print(f"{CYAN}{category.capitalize():15s} {counts['added']:8d} {counts['removed']:8d} {counts['modified']:9d} {counts['revoked']:8d}{ENDC}")
+        report = {
+            'old_bundle': old_bundle_path,
+            'new_bundle': new_bundle_path,
+            'bundle_version': self.bundle_version,
+            'summary': summary,
+            'changes': changes,
+            'affected_groups': sorted(attack_id for attack_id in affected_ids if attack_id)
+        }
+        if output_dir:
+            refreshed, stale, unchanged = self.refresh_outputs(output_dir, affected_ids)
+            report.update({'refreshed_outputs': refreshed, 'stale_outputs': stale, 'unchanged_outputs': unchanged})
+            print(f"{GREEN}[+] Regenerated {len(refreshed)} outputs in {output_dir}, {unchanged} unchanged{ENDC}")
+            for path in stale:
+                print(f"{YELLOW}[!] {path} could not be regenerated from the new bundle{ENDC}")
+        return report
+
+    def refresh_outputs(self, output_dir, affected_ids):
+        by_attack_id = {group['attack_id']: group for group in self.groups.values() if group.get('attack_id')}
+        refreshed, stale, unchanged = [], [], 0
+        for name in sorted(os.listdir(output_dir)):
+            path = os.path.join(output_dir, name)
+            if not name.endswith(('_navigator_layer.json', '_apt_analysis.json')):
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+                data = json.loads(text)
+            except (OSError, ValueError):
+                continue
+            parameters = {item.get('name'): item.get('value') for item in data.get('metadata', []) if isinstance(item, dict)}
+            if name.endswith('_navigator_layer.json') and 'Group' not in parameters:
+                if not parameters.get('Aggregate'):
+                    if name.startswith(AGGREGATE_LAYER_PREFIXES):
+                        stale.append(path)
+                    else:
+                        unchanged += 1
+                    continue
+                layer = self._rebuild_aggregate_layer(parameters, data.get('domain') or 'enterprise-attack')
+                if layer is None:
+                    stale.append(path)
+                elif self._layer_content(layer) == self._layer_content(data):
+                    unchanged += 1
+                else:
+                    self._write_layer_file(layer, path, compact='\n' not in text.strip())
+                    refreshed.append(path)
+            elif name.endswith('_navigator_layer.json'):
+                group_label = parameters.get('Group', '')
+                match = re.search(r'\(([^()]+)\)$', group_label)
+                if not match or match.group(1) not in affected_ids:
+                    unchanged += 1
+                    continue
+                group = by_attack_id.get(match.group(1))
+                if group is None:
+                    stale.append(path)
+                    continue
+                mapped_group = self._map_group_techniques_enhanced(group, verbose=False)
+                layers = self._domain_layers(mapped_group)
+                layer = next((layer for suffix, layer in layers if layer['domain'] == data.get('domain')), layers[0][1])
+                self._write_layer_file(layer, path, compact='\n' not in text.strip())
+                refreshed.append(path)
+            elif data.get('country'):
+                previous = {entry.get('mitre_id') for entry in data.get('top_20_groups', [])}
+                total_groups, top_groups = self.rank_groups_by_country(data['country'])
+                current = {group_info['group_data'].get('attack_id', 'Unknown') for group_info in top_groups}
+                if previous == current and not previous & affected_ids:
+                    unchanged += 1
+                    continue
+                if self._save_country_analysis_results(data['country'], top_groups, path):
+                    refreshed.append(path)
+        return refreshed, stale, unchanged
+
+    @staticmethod
+    def _layer_content(layer):
+        return dict(layer, metadata=[item for item in layer.get('metadata', []) if item.get('name') != 'Generated'])
+
+    def _rebuild_aggregate_layer(self, parameters, domain):
+        kind = parameters['Aggregate']
+        if kind == 'coverage gaps':
+            by_attack_id = {technique['attack_id']: technique_id for technique_id, technique in self.techniques.items() if technique.get('attack_id')}
+            values = [value.strip() for value in parameters.get('Covered Techniques', '').split(',') if value.strip()]
+            if not values or any(value not in by_attack_id for value in values):
+                return None
+            covered_ids = [by_attack_id[value] for value in values]
+            rollup = parameters.get('Rollup') != 'No'
+            engine = self.coverage_engine
+            covered = engine.mask(covered_ids, rollup)
+            groups, in_use, gaps = engine.analyze(covered, rollup)
+            return self._gap_layer(engine, covered_ids, covered, gaps, rollup, domain)
+        by_attack_id = {group['attack_id']: group_id for group_id, group in self.groups.items() if group.get('attack_id')}
+        group_ids = []
+        for value in parameters.get('Groups', '').split(','):
+            group_id = by_attack_id.get(value.strip(), value.strip() if value.strip() in self.groups else None)
+            if group_id is None:
+                return None
+            group_ids.append(group_id)
+        if kind == 'frequency':
+            return self._frequency_layer(group_ids, domain)
+        if kind in ('union', 'intersection') and len(group_ids) > 1:
+            return self._combined_layer(group_ids, kind, domain)
+        return None
+
+    @staticmethod
+    def _extend_seen(first_seen, last_seen, key, created):
+        if key not in first_seen or created < first_seen[key]:
+            first_seen[key] = created
+        if key not in last_seen or created > last_seen[key]:
+            last_seen[key] = created
 
     def map_apt_group(self):
         print(f"\n{YELLOW}=== APT GROUP MAPPING & ANALYSIS ==={ENDC}")
@@ -136,36 +2174,38 @@ class MITREAnalyzer:
         if not group_input:
             print(f"{RED}[-] Please enter a valid APT group name or ID{ENDC}")
             return
+        self.map_group(group_input)
+
+    @profiled('map group')
+    def map_group(self, group_input, output_dir=''):
         group_data = self._find_group_enhanced(group_input)
         if not group_data:
-            return
+            return None
         mapped_group = self._map_group_techniques_enhanced(group_data)
         self._display_enhanced_group_analysis(mapped_group)
-        navigator_layer = self._generate_navigator_layer(mapped_group)
-        safe_name = group_input.replace(' ', '_').replace('/', '_').lower()
-        safe_name = ''.join(c for c in safe_name if c.isalnum() or c in '_-')
-        output_file = f"{safe_name}_navigator_layer.json"
-        self._save_navigator_layer(navigator_layer, output_file)
+        output_file = None
+        for suffix, navigator_layer in self._domain_layers(mapped_group):
+            layer_file = os.path.join(output_dir, f"{self._safe_filename(group_input)}{suffix}_navigator_layer.json")
+            if not self._save_navigator_layer(navigator_layer, layer_file):
+                return None
+            output_file = output_file or layer_file
         print(f"\n{GREEN}[+] Analysis Complete!{ENDC}")
         print(f"{BEBEBLUE}[+] Navigator layer saved: {output_file}{ENDC}")
         print(f"{YELLOW}[+] Import into MITRE ATT&CK Navigator for visualization{ENDC}")
+        return output_file
+
+    @staticmethod
+    def _safe_filename(text):
+        safe_name = text.replace(' ', '_').replace('/', '_').lower()
+        return ''.join(c for c in safe_name if c.isalnum() or c in '_-')
 
     def _find_group_enhanced(self, group_input):
         print(f"{BEBEBLUE}[*] Searching for group: {group_input}{ENDC}")
-        group_input_lower = group_input.lower().strip()
-        for group_id, group_data in self.groups.items():
-            if group_data.get('attack_id', '').lower() == group_input_lower:
-                print(f"{GREEN}[+] Found by MITRE ID: {group_data['attack_id']}{ENDC}")
-                return group_data
-        for group_id, group_data in self.groups.items():
-            if group_data.get('name', '').lower() == group_input_lower:
-                print(f"{GREEN}[+] Found by name: {group_data['name']}{ENDC}")
-                return group_data
-        for group_id, group_data in self.groups.items():
-            for alias in group_data.get('aliases', []):
-                if alias.lower() == group_input_lower:
-                    print(f"{GREEN}[+] Found by alias: {alias}{ENDC}")
-                    return group_data
+        match = self.group_resolver.resolve(group_input)
+        if match:
+            group_id, match_kind, matched = match
+            print(f"{GREEN}[+] Found by {match_kind}: {matched}{ENDC}")
+            return self.groups[group_id]
         print(f"{RED}[-] Group not found in MITRE ATT&CK database{ENDC}")
         suggestions = self._suggest_similar_groups(group_input)
         if suggestions:
@@ -174,43 +2214,65 @@ class MITREAnalyzer:
                 print(f"    {BEBEBLUE}- {suggestion}{ENDC}")
         return None
 
-    def _map_group_techniques_enhanced(self, group_data):
-        print(f"{BEBEBLUE}[*] Mapping techniques for {group_data['name']}{ENDC}")
+    def _map_group_techniques_enhanced(self, group_data, verbose=True):
+        if verbose:
+            print(f"{BEBEBLUE}[*] Mapping techniques for {group_data['name']}{ENDC}")
+        enhanced_group = self.results.get_or_compute(self.bundle_version, 'map-group', (group_data['id'],),
+                                                     lambda: self._build_group_mapping(group_data))
+        if verbose:
+            print(f"{GREEN}[+] Mapped {len(enhanced_group['techniques'])} techniques{ENDC}")
+        return enhanced_group
+
+    @profiled('group mapping')
+    def _build_group_mapping(self, group_data):
         group_id = group_data['id']
-        technique_count = 0
-        enhanced_group = group_data.copy()
+        PROFILER.count('relationships scanned', len(self.group_techniques.get(group_id, [])))
+        enhanced_group = group_data.as_dict()
         enhanced_group['techniques'] = []
         enhanced_group['tactics'] = set()
         enhanced_group['platforms'] = set()
         enhanced_group['data_sources'] = set()
-        for relationship in self.relationships:
-            if (relationship['source_ref'] == group_id and
-                relationship['relationship_type'] == 'uses' and
-                relationship['target_ref'] in self.techniques):
-                technique_data = self.techniques[relationship['target_ref']]
-                technique_count += 1
-                last_seen = self._get_technique_last_seen(relationship['target_ref'])
-                technique_entry = {
-                    'attack_id': technique_data['attack_id'],
-                    'name': technique_data['name'],
-                    'description': self._clean_text(technique_data['description']),
-                    'tactics': technique_data['tactics'],
-                    'platforms': technique_data.get('platforms', []),
-                    'data_sources': technique_data.get('data_sources', []),
-                    'detection': self._clean_text(technique_data.get('detection', '')),
-                    'is_subtechnique': technique_data.get('is_subtechnique', False),
-                    'relationship_description': self._clean_text(relationship['description']),
-                    'relationship_created': relationship['created'],
-                    'last_seen': last_seen
-                }
-                enhanced_group['techniques'].append(technique_entry)
-                enhanced_group['tactics'].update(technique_data['tactics'])
-                enhanced_group['platforms'].update(technique_data.get('platforms', []))
-                enhanced_group['data_sources'].update(technique_data.get('data_sources', []))
-        print(f"{GREEN}[+] Mapped {technique_count} techniques{ENDC}")
+        rels = self.relationships
+        closure = self.group_closure.get(group_id, {})
+        direct = self.group_techniques.get(group_id, [])
+        direct_refs = {rels.target_ref(row) for row in direct}
+        indirect = [(technique_ref, paths[0][1]) for technique_ref, paths in closure.items() if technique_ref not in direct_refs]
+        software, campaigns = {}, {}
+        for paths in closure.values():
+            for via, row in paths:
+                for stix_id in via:
+                    (campaigns if stix_id in self.campaigns else software).setdefault(stix_id, None)
+        for technique_ref, row in [(rels.target_ref(row), row) for row in direct] + indirect:
+            technique_data = self.techniques[technique_ref]
+            last_seen = self._get_technique_last_seen(technique_ref)
+            technique_entry = {
+                'attack_id': technique_data['attack_id'],
+                'name': technique_data['name'],
+                'description': technique_data.clean_description,
+                'tactics': technique_data['tactics'],
+                'platforms': technique_data.get('platforms', []),
+                'data_sources': technique_data.get('data_sources', []),
+                'detection': technique_data.clean_detection,
+                'is_subtechnique': technique_data.get('is_subtechnique', False),
+                'domains': technique_data.domains,
+                'relationship_description': rels.clean_description(row),
+                'relationship_created': rels.created_iso(row),
+                'last_seen': last_seen,
+                'sources': [self._provenance(via) for via, path_row in closure.get(technique_ref, [((), row)])],
+                'mitigations': [self._object_label(rels.source_ref(m))
+                                for m in self.technique_mitigations.get(technique_ref, [])],
+                'data_components': sorted({self.data_components[rels.source_ref(d)]['name']
+                                           for d in self.technique_components.get(technique_ref, [])})
+            }
+            enhanced_group['techniques'].append(technique_entry)
+            enhanced_group['tactics'].update(technique_data['tactics'])
+            enhanced_group['platforms'].update(technique_data.get('platforms', []))
+            enhanced_group['data_sources'].update(technique_data.get('data_sources', []))
         enhanced_group['tactics'] = sorted(list(enhanced_group['tactics']))
         enhanced_group['platforms'] = sorted(list(enhanced_group['platforms']))
         enhanced_group['data_sources'] = sorted(list(enhanced_group['data_sources']))
+        enhanced_group['software'] = [dict(self._object_label(stix_id), type=self.software[stix_id].kind) for stix_id in software]
+        enhanced_group['campaigns'] = [self._object_label(stix_id) for stix_id in campaigns]
         return enhanced_group
 
     def _display_enhanced_group_analysis(self, mapped_group):
@@ -228,6 +2290,11 @@ class MITREAnalyzer:
         print(f"  Tactics Covered: {GREEN}{len(mapped_group['tactics'])}{ENDC}")
         print(f"  Platforms Targeted: {GREEN}{len(mapped_group['platforms'])}{ENDC}")
         print(f"  Data Sources: {GREEN}{len(mapped_group.get('data_sources', []))}{ENDC}")
+        if mapped_group.get('software') or mapped_group.get('campaigns'):
+            indirect = sum(1 for t in mapped_group['techniques'] if all(source['type'] != 'direct' for source in t['sources']))
+            print(f"  Software Used: {GREEN}{len(mapped_group['software'])}{ENDC}")
+            print(f"  Campaigns: {GREEN}{len(mapped_group['campaigns'])}{ENDC}")
+            print(f"  Techniques via Software/Campaigns Only: {GREEN}{indirect}{ENDC}")
         print(f"\n{YELLOW}Tactics Used:{ENDC}")
         for tactic in mapped_group['tactics']:
             tactic_techniques = [t for t in mapped_group['techniques'] if tactic in t.get('tactics', [])]
@@ -236,21 +2303,30 @@ class MITREAnalyzer:
         for platform in mapped_group['platforms']:
             print(f"  {GREEN}{platform}{ENDC}")
 
-    def _generate_navigator_layer(self, mapped_group):
+    @profiled('navigator layer')
+    def _generate_navigator_layer(self, mapped_group, domain=None):
         description = mapped_group.get('description', '')
         if len(description) > 200:
             description = description[:200] + "..."
+        techniques = mapped_group['techniques']
+        platforms = mapped_group['platforms']
+        label, title = "Enterprise", "Techniques"
+        if domain is not None:
+            techniques = [technique for technique in techniques if domain in technique.get('domains', ())]
+            platforms = sorted({platform for technique in techniques for platform in technique.get('platforms', [])})
+            label = self._domain_label(domain)
+            title = f"{label} Techniques"
         layer = {
-            "name": f"{mapped_group['name']} ({mapped_group.get('attack_id', 'Unknown')}) - Techniques",
+            "name": f"{mapped_group['name']} ({mapped_group.get('attack_id', 'Unknown')}) - {title}",
             "versions": {
                 "attack": "14",
                 "navigator": "4.9.1",
                 "layer": "4.5"
             },
-            "domain": "enterprise-attack",
+            "domain": domain or "enterprise-attack",
             "description": f"Techniques used by {mapped_group['name']} based on MITRE ATT&CK data. {description}",
             "filters": {
-                "platforms": mapped_group['platforms'] if mapped_group['platforms'] else ["Windows", "Linux", "macOS"]
+                "platforms": platforms if platforms else ["Windows", "Linux", "macOS"]
             },
             "sorting": 0,
             "layout": {
@@ -280,16 +2356,16 @@ class MITREAnalyzer:
             "metadata": [
                 {"name": "Group", "value": f"{mapped_group['name']} ({mapped_group.get('attack_id', 'Unknown')})"},
                 {"name": "Aliases", "value": ", ".join(mapped_group.get('aliases', [])) if mapped_group.get('aliases') else "None"},
-                {"name": "Total Techniques", "value": str(len(mapped_group['techniques']))},
+                {"name": "Total Techniques", "value": str(len(techniques))},
                 {"name": "Generated", "value": datetime.now().strftime("%Y-%m-%d %H:%M:%S")},
-                {"name": "Data Source", "value": "MITRE ATT&CK Enterprise"}
+                {"name": "Data Source", "value": f"MITRE ATT&CK {label}"}
             ],
             "links": [{
                 "label": "MITRE ATT&CK Group Page",
                 "url": f"https://attack.mitre.org/groups/{mapped_group.get('attack_id', '')}/"
             }]
         }
-        for technique in mapped_group['techniques']:
+        for technique in techniques:
             primary_tactic = technique['tactics'][0] if technique['tactics'] else "execution"
             comment = technique.get('relationship_description', '')
             if len(comment) > 200:
@@ -307,7 +2383,8 @@ class MITREAnalyzer:
                     {"name": "Platforms", "value": ", ".join(technique.get('platforms', [])) if technique.get('platforms') else "Not specified"},
                     {"name": "Sub-technique", "value": "Yes" if technique.get('is_subtechnique') else "No"},
                     {"name": "Last Seen", "value": technique.get('last_seen', 'Unknown')}
-                ],
+                ] + [{"name": "Via", "value": " > ".join(via['name'] for via in source['via'])}
+                     for source in technique.get('sources', []) if source['via']],
                 "links": [{
                     "label": "MITRE ATT&CK Technique Page",
                     "url": f"https://attack.mitre.org/techniques/{technique['attack_id'].replace('.', '/')}/"
@@ -318,33 +2395,248 @@ class MITREAnalyzer:
             layer["techniques"].append(technique_entry)
         return layer
 
+    @staticmethod
+    def _domain_label(domain):
+        return next((DOMAIN_LABELS[d] for d, name in DOMAIN_NAMES.items() if name == domain), domain)
+
+    @staticmethod
+    def _layer_domains(techniques):
+        domains = sorted({d for technique in techniques for d in technique.get('domains', ())},
+                         key=lambda d: (d != 'enterprise-attack', d)) or ['enterprise-attack']
+        short_names = {name: short for short, name in DOMAIN_NAMES.items()}
+        return [('' if i == 0 else f"_{short_names.get(domain, domain)}", domain) for i, domain in enumerate(domains)]
+
+    def _domain_layers(self, mapped_group):
+        domains = self._layer_domains(mapped_group['techniques'])
+        if len(domains) == 1 and domains[0][1] == 'enterprise-attack':
+            return [('', self._generate_navigator_layer(mapped_group))]
+        return [(suffix, self._generate_navigator_layer(mapped_group, domain)) for suffix, domain in domains]
+
+    @staticmethod
+    def _write_layer_file(layer_data, filename, compact=False):
+        PROFILER.count('navigator layers written')
+        separators = (',', ':') if compact else (',', ': ')
+        _atomic_write(filename, lambda f: json.dump(layer_data, f, indent=None if compact else 2, ensure_ascii=False,
+                                                    separators=separators), mode='w')
+        return filename
+
     def _save_navigator_layer(self, layer_data, filename):
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(layer_data, f, indent=2, ensure_ascii=False, separators=(',', ': '))
+            self._write_layer_file(layer_data, filename)
             print(f"{GREEN}[+] Navigator layer saved to: {filename}{ENDC}")
+            return True
         except Exception as e:
             print(f"{RED}[-] Error saving file: {e}{ENDC}")
+            return False
+
+    def _aggregate_layer(self, name, description, technique_scores, legend, domain='enterprise-attack', parameters=None):
+        technique_scores = {technique_id: entry for technique_id, entry in technique_scores.items()
+                            if domain in self.techniques[technique_id].get('domains', ())}
+        label = self._domain_label(domain)
+        if domain != 'enterprise-attack':
+            name = f"{name} - {label}"
+        max_score = max((score for score, comment in technique_scores.values()), default=1)
+        platforms = sorted({p for technique_id in technique_scores for p in self.techniques[technique_id].get('platforms', [])})
+        layer = {
+            "name": name,
+            "versions": {
+                "attack": "14",
+                "navigator": "4.9.1",
+                "layer": "4.5"
+            },
+            "domain": domain,
+            "description": description,
+            "filters": {
+                "platforms": platforms if platforms else ["Windows", "Linux", "macOS"]
+            },
+            "sorting": 3,
+            "layout": {
+                "layout": "side",
+                "aggregateFunction": "max",
+                "showID": True,
+                "showName": True,
+                "showAggregateScores": True,
+                "countUnscored": False,
+                "expandedSubtechniques": "annotated"
+            },
+            "hideDisabled": False,
+            "techniques": [],
+            "gradient": {
+                "colors": ["#ffe766", "#fd8d3c", "#e31a1c"],
+                "minValue": 0,
+                "maxValue": max_score
+            },
+            "legendItems": [{"label": legend, "color": "#fd8d3c"}],
+            "showTacticRowBackground": False,
+            "tacticRowBackground": "#dddddd",
+            "selectTechniquesAcrossTactics": True,
+            "selectSubtechniquesWithParent": False,
+            "metadata": [
+                {"name": "Total Techniques", "value": str(len(technique_scores))},
+                {"name": "Generated", "value": datetime.now().strftime("%Y-%m-%d %H:%M:%S")},
+                {"name": "Data Source", "value": f"MITRE ATT&CK {label}"}
+            ] + [{"name": key, "value": value} for key, value in (parameters or {}).items()]
+        }
+        for technique_id, (score, comment) in sorted(technique_scores.items(), key=lambda item: self.techniques[item[0]].get('attack_id') or ''):
+            technique = self.techniques[technique_id]
+            technique_entry = {
+                "techniqueID": technique['attack_id'],
+                "tactic": technique['tactics'][0] if technique['tactics'] else "execution",
+                "score": score,
+                "comment": comment,
+                "enabled": True,
+                "metadata": [
+                    {"name": "Technique", "value": technique['name']},
+                    {"name": "Tactics", "value": ", ".join(technique['tactics']) if technique['tactics'] else "Not specified"}
+                ]
+            }
+            if not technique.get('is_subtechnique'):
+                technique_entry["showSubtechniques"] = True
+            layer["techniques"].append(technique_entry)
+        return layer
+
+    def _group_technique_sets(self, group_ids):
+        return {group_id: set(self.group_closure.get(group_id, {})) for group_id in group_ids}
+
+    def _aggregate_domains(self, group_ids):
+        technique_ids = set().union(*self._group_technique_sets(group_ids).values())
+        return self._layer_domains(self.techniques[technique_id] for technique_id in technique_ids)
+
+    def _group_parameters(self, kind, group_ids):
+        return {"Aggregate": kind, "Groups": ", ".join(self.groups[group_id].get('attack_id') or group_id for group_id in group_ids)}
+
+    def _frequency_layer(self, group_ids, domain='enterprise-attack'):
+        counts = {}
+        for techniques in self._group_technique_sets(group_ids).values():
+            for technique_id in techniques:
+                counts[technique_id] = counts.get(technique_id, 0) + 1
+        scores = {technique_id: (count, f"Used by {count} of {len(group_ids)} groups") for technique_id, count in counts.items()}
+        return self._aggregate_layer("Technique Frequency Across Groups",
+                                     f"Number of groups using each technique across {len(group_ids)} groups.",
+                                     scores, "Groups using technique", domain, self._group_parameters('frequency', group_ids))
+
+    def _combined_layer(self, group_ids, mode, domain='enterprise-attack'):
+        technique_sets = {group_id: {technique_id for technique_id in techniques if domain in self.techniques[technique_id].get('domains', ())}
+                          for group_id, techniques in self._group_technique_sets(group_ids).items()}
+        names = {group_id: self.groups[group_id]['name'] for group_id in group_ids}
+        users = {}
+        for group_id, techniques in technique_sets.items():
+            for technique_id in techniques:
+                users.setdefault(technique_id, []).append(names[group_id])
+        if mode == 'intersection':
+            users = {technique_id: groups for technique_id, groups in users.items() if len(groups) == len(group_ids)}
+        scores = {technique_id: (len(groups), f"Used by {', '.join(groups)}") for technique_id, groups in users.items()}
+        label = ', '.join(names[group_id] for group_id in group_ids)
+        title = "Union" if mode == 'union' else "Intersection"
+        return self._aggregate_layer(f"{title} of {label}"[:120],
+                                     f"{title} of techniques used by {label}. Score is the number of selected groups using the technique.",
+                                     scores, f"{title} of selected groups", domain, self._group_parameters(mode, group_ids))
+
+    @profiled('layers')
+    def generate_layers(self, group_inputs=None, output_dir='layers', compact=False, workers=4,
+                        group_layers=True, frequency=False, union=False, intersection=False):
+        started = time.perf_counter()
+        if group_inputs:
+            group_ids = []
+            for group_input in group_inputs:
+                group_data = self._find_group_enhanced(group_input)
+                if group_data and group_data['id'] not in group_ids:
+                    group_ids.append(group_data['id'])
+        else:
+            group_ids = list(self.groups)
+        if not group_ids:
+            print(f"{RED}[-] No groups selected for layer generation{ENDC}")
+            return []
+        os.makedirs(output_dir, exist_ok=True)
+        layers = []
+        if group_layers:
+            for group_id in group_ids:
+                group_data = self.groups[group_id]
+                mapped_group = self._map_group_techniques_enhanced(group_data, verbose=False)
+                name = self._safe_filename(f"{group_data.get('attack_id') or ''}_{group_data['name']}".strip('_'))
+                for suffix, layer in self._domain_layers(mapped_group):
+                    layers.append((layer, f"{name}{suffix}_navigator_layer.json"))
+        for suffix, domain in self._aggregate_domains(group_ids) if frequency or union or intersection else ():
+            if frequency:
+                layers.append((self._frequency_layer(group_ids, domain), f"technique_frequency{suffix}_navigator_layer.json"))
+            if union and len(group_ids) > 1:
+                layers.append((self._combined_layer(group_ids, 'union', domain), f"group_union{suffix}_navigator_layer.json"))
+            if intersection and len(group_ids) > 1:
+                layers.append((self._combined_layer(group_ids, 'intersection', domain), f"group_intersection{suffix}_navigator_layer.json"))
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            written = list(pool.map(lambda item: self._write_layer_file(item[0], os.path.join(output_dir, item[1]), compact), layers))
+        print(f"{GREEN}[+] Wrote {len(written)} Navigator layers to {output_dir} in {time.perf_counter() - started:.2f}s{ENDC}")
+        return written
 
     def _suggest_similar_groups(self, group_input):
         suggestions = []
-        group_input_lower = group_input.lower()
-        for group_data in self.groups.values():
-            if group_input_lower in group_data.get('name', '').lower():
-                suggestions.append(f"{group_data.get('attack_id', 'Unknown')} - {group_data['name']}")
-            for alias in group_data.get('aliases', []):
-                if group_input_lower in alias.lower():
-                    suggestions.append(f"{group_data.get('attack_id', 'Unknown')} - {group_data['name']} (alias: {alias})")
-                    break
-        return suggestions[:5]
+        for score, group_id, alias in self.group_resolver.suggest(group_input):
+            group_data = self.groups[group_id]
+            suggestion = f"{group_data.get('attack_id', 'Unknown')} - {group_data['name']}"
+            suggestions.append(f"{suggestion} (alias: {alias})" if alias else suggestion)
+        return suggestions
 
-    def _clean_text(self, text):
-        if not text:
-            return ""
-        text = html.unescape(text)
-        text = text.replace('\r\n', ' ').replace('\n', ' ').replace('\r', ' ')
-        text = ' '.join(text.split())
-        return text
+    @property
+    def technique_resolver(self):
+        if self._technique_resolver is None:
+            self._technique_resolver = TechniqueResolver(self.techniques)
+        return self._technique_resolver
+
+    def _find_technique(self, technique_input):
+        match = self.technique_resolver.resolve(technique_input)
+        if match:
+            return self.techniques[match[0]]
+        print(f"{RED}[-] Technique not found: {technique_input}{ENDC}")
+        suggestions = self.technique_resolver.suggest(technique_input)
+        if suggestions:
+            print(f"{YELLOW}[?] Did you mean one of these?{ENDC}")
+            for score, technique_id in suggestions:
+                technique = self.techniques[technique_id]
+                print(f"    {BEBEBLUE}- {technique.get('attack_id', 'Unknown')} - {technique['name']}{ENDC}")
+        return None
+
+    def resolve_techniques(self, values, suggestions=3):
+        resolver = self.technique_resolver
+        results = []
+        for value in values:
+            entry = {'input': value, 'match': None, 'match_type': None, 'parent': None, 'subtechniques': [], 'suggestions': []}
+            match = resolver.resolve(value)
+            if match:
+                technique_id, entry['match_type'] = match
+                technique = self.techniques[technique_id]
+                entry['match'] = {'attack_id': technique.get('attack_id'), 'name': technique['name']}
+                parent = resolver.parent_of.get(technique_id)
+                if parent:
+                    entry['parent'] = self.techniques[parent].get('attack_id')
+                entry['subtechniques'] = [self.techniques[t].get('attack_id') for t in resolver.subtechniques.get(technique_id, [])]
+            elif suggestions:
+                entry['suggestions'] = [{'attack_id': self.techniques[t].get('attack_id'), 'name': self.techniques[t]['name'], 'score': score}
+                                        for score, t in resolver.suggest(value, suggestions)]
+            results.append(entry)
+        return results
+
+    @property
+    def group_resolver(self):
+        if self._group_resolver is None:
+            self._group_resolver = GroupResolver(self.groups)
+        return self._group_resolver
+
+    def resolve_groups(self, names, suggestions=3):
+        results = []
+        for name in names:
+            entry = {'input': name, 'match': None, 'match_type': None, 'suggestions': []}
+            match = self.group_resolver.resolve(name)
+            if match:
+                group_data = self.groups[match[0]]
+                entry['match'] = {'mitre_id': group_data.get('attack_id'), 'name': group_data['name']}
+                entry['match_type'] = match[1]
+            elif suggestions:
+                for score, group_id, alias in self.group_resolver.suggest(name, suggestions):
+                    group_data = self.groups[group_id]
+                    entry['suggestions'].append({'mitre_id': group_data.get('attack_id'), 'name': group_data['name'],
+                                                 'alias': alias, 'score': score})
+            results.append(entry)
+        return results
 
     def analyze_technique_prevalence(self):
         print(f"\n{YELLOW}=== TECHNIQUE PREVALENCE ANALYSIS ==={ENDC}")
@@ -352,26 +2644,26 @@ class MITREAnalyzer:
         if not tactic_input:
             print(f"{RED}[-] Please enter a valid tactic name{ENDC}")
             return
-        tactic_lower = tactic_input.lower().replace(' ', '-')
+        self.tactic_prevalence(tactic_input)
+
+    @profiled('prevalence')
+    def tactic_prevalence(self, tactic_input, output_dir=None):
+        tactic_lower = self._normalize_tactic(tactic_input)
+        PROFILER.count('techniques scanned', len(self.tactic_techniques.get(tactic_lower, [])))
         technique_usage = {}
-        for rel in self.relationships:
-            if (rel['relationship_type'] == 'uses' and 
-                rel['target_ref'] in self.techniques):
-                technique = self.techniques[rel['target_ref']]
-                if tactic_lower in [t.lower().replace(' ', '-') for t in technique['tactics']]:
-                    tech_id = technique['attack_id']
-                    if tech_id not in technique_usage:
-                        technique_usage[tech_id] = {
-                            'name': technique['name'],
-                            'count': 0,
-                            'groups': set()
-                        }
-                    technique_usage[tech_id]['count'] += 1
-                    if rel['source_ref'] in self.groups:
-                        technique_usage[tech_id]['groups'].add(self.groups[rel['source_ref']]['name'])
+        for technique_ref in self.tactic_techniques.get(tactic_lower, []):
+            uses = self.technique_uses.get(technique_ref)
+            if not uses:
+                continue
+            technique = self.techniques[technique_ref]
+            technique_usage[technique['attack_id']] = {
+                'name': technique['name'],
+                'count': len(uses),
+                'groups': {self.groups[self.relationships.source_ref(row)]['name'] for row in self.technique_groups.get(technique_ref, [])}
+            }
         if not technique_usage:
             print(f"{RED}[-] No techniques found for tactic: {tactic_input}{ENDC}")
-            return
+            return None
         print(f"\n{GREEN}[+] Found {len(technique_usage)} techniques for tactic: {tactic_input}{ENDC}")
         print(f"{BEBEBLUE}" + "-" * 60 + f"{ENDC}")
         sorted_techniques = sorted(technique_usage.items(), key=lambda x: x[1]['count'], reverse=True)
@@ -382,6 +2674,247 @@ class MITREAnalyzer:
             if len(data['groups']) > 5:
                 print(f"  ... and {len(data['groups']) - 5} more groups")
             print()
+        if output_dir is None:
+            return sorted_techniques
+        output_file = os.path.join(output_dir, f"{tactic_lower}_prevalence.json")
+        results = {
+            'tactic': tactic_input,
+            'analysis_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'techniques': [{
+                'attack_id': tech_id,
+                'name': data['name'],
+                'count': data['count'],
+                'groups': sorted(data['groups'])
+            } for tech_id, data in sorted_techniques]
+        }
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"{GREEN}[+] Prevalence results saved to {output_file}{ENDC}")
+        return output_file
+
+    @property
+    def prevalence_engine(self):
+        if self._prevalence_engine is None:
+            self._prevalence_engine = PrevalenceEngine(self)
+        return self._prevalence_engine
+
+    @property
+    def similarity_engine(self):
+        if self._similarity_engine is None:
+            self._similarity_engine = SimilarityEngine(self)
+        return self._similarity_engine
+
+    @property
+    def coverage_engine(self):
+        if self._coverage_engine is None:
+            self._coverage_engine = CoverageEngine(self)
+        return self._coverage_engine
+
+    def load_covered_techniques(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            values = [line.split('#', 1)[0].strip() for line in f]
+        covered, unresolved = [], []
+        for value in values:
+            if not value:
+                continue
+            match = self.technique_resolver.resolve(value)
+            if match:
+                covered.append(match[0])
+            else:
+                unresolved.append(value)
+        return covered, unresolved
+
+    def _gap_layer(self, engine, covered_ids, covered, gaps, rollup, domain='enterprise-attack'):
+        counts = engine.group_counts[rollup]
+        total = len(engine.group_ids)
+        scores = {engine.technique_ids[t]: (counts[t], f"Not covered, used by {counts[t]} of {total} groups") for t in gaps}
+        parameters = {"Aggregate": "coverage gaps", "Rollup": "Yes" if rollup else "No",
+                      "Covered Techniques": ", ".join(sorted(self.techniques[technique_id]['attack_id'] for technique_id in set(covered_ids)))}
+        layer = self._aggregate_layer("Detection Coverage Gaps",
+                                      f"Techniques used by ATT&CK groups without detection coverage, scored by the number of groups using them. "
+                                      "Covered techniques are shown in green.", scores, "Groups using uncovered technique", domain, parameters)
+        for t in engine.members(covered):
+            technique = self.techniques[engine.technique_ids[t]]
+            if domain not in technique.get('domains', ()):
+                continue
+            layer["techniques"].append({
+                "techniqueID": technique['attack_id'],
+                "tactic": technique['tactics'][0] if technique['tactics'] else "execution",
+                "color": "#8ec843",
+                "comment": f"Covered, used by {counts[t]} of {total} groups",
+                "enabled": True
+            })
+        layer["legendItems"].append({"label": "Covered", "color": "#8ec843"})
+        return layer
+
+    @profiled('coverage')
+    def analyze_coverage(self, covered_file, output_dir='', rollup=True, top=20):
+        covered_ids, unresolved = self.load_covered_techniques(covered_file)
+        if unresolved:
+            print(f"{YELLOW}[!] Skipping {len(unresolved)} unknown techniques: {', '.join(unresolved[:10])}{ENDC}")
+        if not covered_ids:
+            print(f"{RED}[-] No known technique IDs in {covered_file}{ENDC}")
+            return None
+        started = time.perf_counter()
+        engine = self.coverage_engine
+        covered = engine.mask(covered_ids, rollup)
+        groups, in_use, gaps = engine.analyze(covered, rollup)
+        elapsed = time.perf_counter() - started
+        counts = engine.group_counts[rollup]
+        total_usage = sum(counts[t] for t in in_use)
+        gap_usage = sum(counts[t] for t in gaps)
+
+        def technique_entry(t):
+            technique = self.techniques[engine.technique_ids[t]]
+            return {'attack_id': technique.get('attack_id'), 'name': technique['name'], 'tactics': list(technique['tactics'])}
+
+        group_entries = []
+        for group_id, used, covered_count, group_gaps, weighted in groups:
+            group_data = self.groups[group_id]
+            entry = {'attack_id': group_data.get('attack_id') or 'Unknown', 'name': group_data['name']}
+            entry.update(techniques=used, covered=covered_count, uncovered=len(group_gaps),
+                         coverage_percent=round(covered_count * 100 / used, 1) if used else 100.0, weighted_gap=weighted,
+                         uncovered_techniques=sorted(self.techniques[engine.technique_ids[t]]['attack_id'] for t in group_gaps))
+            group_entries.append(entry)
+        group_entries.sort(key=lambda entry: (entry['coverage_percent'], -entry['weighted_gap'], entry['attack_id']))
+        report = {
+            'analysis_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'covered_file': covered_file,
+            'rollup': rollup,
+            'covered_techniques': len(engine.members(covered)),
+            'unresolved': unresolved,
+            'techniques_in_use': len(in_use),
+            'techniques_covered_in_use': len(in_use) - len(gaps),
+            'coverage_percent': round((len(in_use) - len(gaps)) * 100 / len(in_use), 1) if in_use else 100.0,
+            'weighted_coverage_percent': round((total_usage - gap_usage) * 100 / total_usage, 1) if total_usage else 100.0,
+            'duration_ms': round(elapsed * 1000, 2),
+            'gaps': [dict(technique_entry(t), group_count=counts[t]) for t in gaps],
+            'groups': group_entries
+        }
+        print(f"\n{GREEN}[+] Coverage across {len(groups)} groups computed in {elapsed * 1000:.2f} ms{ENDC}")
+        print(f"{YELLOW}Techniques in use covered: {report['techniques_covered_in_use']}/{report['techniques_in_use']} "
+              f"({report['coverage_percent']}%), weighted by group usage: {report['weighted_coverage_percent']}%{ENDC}")
+        print(f"{YELLOW}Top uncovered techniques:{ENDC}")
+        for gap in report['gaps'][:top]:
+            print(f"  {CYAN}{gap['attack_id']} - {gap['name']}{ENDC}  used by {gap['group_count']} groups")
+        print(f"{YELLOW}Least covered groups:{ENDC}")
+        for entry in group_entries[:top]:
+            print(f"  {CYAN}{entry['attack_id']} - {entry['name']}{ENDC}  {entry['coverage_percent']}% "
+                  f"({entry['covered']}/{entry['techniques']})")
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        report_file = os.path.join(output_dir, 'coverage_report.json')
+        _atomic_write(report_file, lambda f: json.dump(report, f, indent=2, ensure_ascii=False), mode='w')
+        print(f"{GREEN}[+] Coverage report saved to {report_file}{ENDC}")
+        layer_techniques = [self.techniques[engine.technique_ids[t]] for t in list(gaps) + list(engine.members(covered))]
+        for suffix, domain in self._layer_domains(layer_techniques):
+            layer_file = self._write_layer_file(self._gap_layer(engine, covered_ids, covered, gaps, rollup, domain),
+                                                os.path.join(output_dir, f"coverage_gaps{suffix}_navigator_layer.json"), False)
+            print(f"{GREEN}[+] Gap layer saved to {layer_file}{ENDC}")
+        return report
+
+    def _similarity_entry(self, group_id, score, shared=None):
+        group_data = self.groups[group_id]
+        entry = {'attack_id': group_data.get('attack_id') or 'Unknown', 'name': group_data['name'], 'similarity': round(score, 4)}
+        if shared is not None:
+            entry['shared_techniques'] = shared
+        return entry
+
+    @profiled('similar groups')
+    def similar_groups(self, group_input, top=10, method='jaccard', approximate=None, output_file=None):
+        group_data = self._find_group_enhanced(group_input)
+        if not group_data:
+            return None
+        engine = self.similarity_engine
+        if group_data['id'] not in engine.index:
+            print(f"{YELLOW}[!] {group_data['name']} has no mapped techniques to compare{ENDC}")
+            return None
+        i = engine.index[group_data['id']]
+        results = self.results.get_or_compute(
+            self.bundle_version, 'similar', (group_data['id'], top, method, approximate),
+            lambda: [self._similarity_entry(group_id, score, engine.shared_count(i, engine.index[group_id]))
+                     for group_id, score in engine.top_k(group_data['id'], top, method, approximate)])
+        print(f"\n{GREEN}[+] Groups most similar to {group_data['name']} ({group_data.get('attack_id', 'Unknown')}), "
+              f"{method} similarity over {engine.sizes[i]} techniques:{ENDC}")
+        print(f"{BEBEBLUE}" + "-" * 60 + f"{ENDC}")
+        for rank, entry in enumerate(results, 1):
+            print(f"{CYAN}{rank:2d}. {entry['attack_id']} - {entry['name']}{ENDC}  "
+                  f"{entry['similarity']:.3f} ({entry['shared_techniques']} shared)")
+        if output_file:
+            report = {'analysis_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'method': method,
+                      'group': self._similarity_entry(group_data['id'], 1.0, engine.sizes[i]), 'similar_groups': results}
+            _atomic_write(output_file, lambda f: json.dump(report, f, indent=2, ensure_ascii=False), mode='w')
+            print(f"{GREEN}[+] Similarity results saved to {output_file}{ENDC}")
+        return results
+
+    @profiled('group similarity')
+    def group_similarity_report(self, top=20, method='jaccard', threshold=0.5, approximate=None, output_file=None):
+        started = time.perf_counter()
+        engine = self.similarity_engine
+        pairs = engine.pairs(0.0, method, approximate)
+        clusters = engine.clusters(threshold, method, approximate, pairs)
+        elapsed = time.perf_counter() - started
+        report = {
+            'analysis_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'method': method,
+            'approximate': engine._approximate(len(engine.group_ids)) if approximate is None else approximate,
+            'groups': len(engine.group_ids),
+            'pairs_scored': len(pairs),
+            'duration_ms': round(elapsed * 1000, 1),
+            'top_pairs': [{
+                'groups': [self._similarity_entry(engine.group_ids[i], 1.0)['attack_id'],
+                           self._similarity_entry(engine.group_ids[j], 1.0)['attack_id']],
+                'names': [self.groups[engine.group_ids[i]]['name'], self.groups[engine.group_ids[j]]['name']],
+                'similarity': round(score, 4),
+                'shared_techniques': engine.shared_count(i, j)
+            } for i, j, score in pairs[:top]],
+            'cluster_threshold': threshold,
+            'clusters': [{
+                'size': len(members),
+                'mean_similarity': round(cohesion, 4),
+                'groups': [self._similarity_entry(engine.group_ids[i], 1.0)['attack_id'] for i in members],
+                'names': [self.groups[engine.group_ids[i]]['name'] for i in members]
+            } for members, cohesion in clusters]
+        }
+        print(f"\n{GREEN}[+] Scored {len(pairs)} group pairs across {len(engine.group_ids)} groups in {elapsed * 1000:.1f} ms ({method}){ENDC}")
+        print(f"{YELLOW}Most similar pairs:{ENDC}")
+        for pair in report['top_pairs']:
+            print(f"  {CYAN}{pair['names'][0]} <-> {pair['names'][1]}{ENDC}  {pair['similarity']:.3f} ({pair['shared_techniques']} shared)")
+        print(f"{YELLOW}Clusters at similarity >= {threshold}: {len(clusters)}{ENDC}")
+        for cluster in report['clusters'][:top]:
+            print(f"  {CYAN}{cluster['size']} groups (mean {cluster['mean_similarity']:.3f}):{ENDC} {', '.join(cluster['names'])}")
+        if output_file:
+            _atomic_write(output_file, lambda f: json.dump(report, f, indent=2, ensure_ascii=False), mode='w')
+            print(f"{GREEN}[+] Similarity report saved to {output_file}{ENDC}")
+        return report
+
+    def tactic_prevalence_matrix(self, top=None):
+        return self.prevalence_engine.tactic_summary(self, top)
+
+    @profiled('heatmap')
+    def export_tactic_heatmap(self, output_file, top=10):
+        engine = self.prevalence_engine
+        summary = engine.tactic_summary(self, top)
+        if output_file.lower().endswith('.csv'):
+            def write_csv(f):
+                writer = csv.writer(f)
+                writer.writerow(['Group'] + engine.tactics)
+                for group, counts in engine.group_heatmap(self).items():
+                    writer.writerow([group] + [counts[tactic] for tactic in engine.tactics])
+                writer.writerow([])
+                writer.writerow(['Tactic', 'Techniques', 'Techniques In Use', 'Usage Count', 'Distinct Groups'])
+                for tactic, data in summary.items():
+                    writer.writerow([tactic, data['technique_count'], data['techniques_in_use'], data['usage_count'], data['group_count']])
+            _atomic_write(output_file, write_csv, mode='w')
+        else:
+            results = {
+                'analysis_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'tactics': summary,
+                'group_tactic_heatmap': engine.group_heatmap(self)
+            }
+            _atomic_write(output_file, lambda f: json.dump(results, f, indent=2, ensure_ascii=False), mode='w')
+        print(f"{GREEN}[+] Tactic heatmap for {len(summary)} tactics saved to {output_file}{ENDC}")
+        return output_file
 
     def assess_tactic_usage(self):
         print(f"\n{YELLOW}=== TACTIC/TECHNIQUE USAGE ASSESSMENT & EXCEL EXPORT ==={ENDC}")
@@ -389,38 +2922,26 @@ class MITREAnalyzer:
         if not technique_input:
             print(f"{RED}[-] Please enter a valid technique name or ID{ENDC}")
             return
-        target_technique = None
-        technique_input_lower = technique_input.lower()
-        for technique in self.techniques.values():
-            if (technique_input_lower == technique['name'].lower() or
-                technique_input_lower == technique.get('attack_id', '').lower()):
-                target_technique = technique
-                break
+        self.assess_technique(technique_input, choice_prompt=True)
+
+    @profiled('technique')
+    def assess_technique(self, technique_input, scope='all', output_dir='', choice_prompt=False, include_subtechniques=False):
+        target_technique = self._find_technique(technique_input)
         if not target_technique:
-            print(f"{RED}[-] Technique not found: {technique_input}{ENDC}")
-            return
-        using_groups = []
-        for rel in self.relationships:
-            if (rel['relationship_type'] == 'uses' and 
-                rel['target_ref'] == target_technique['id'] and
-                rel['source_ref'] in self.groups):
-                group_data = self.groups[rel['source_ref']]
-                using_groups.append({
-                    'name': group_data['name'],
-                    'attack_id': group_data.get('attack_id', 'Unknown'),
-                    'aliases': group_data.get('aliases', []),
-                    'description': group_data.get('description', ''),
-                    'relationship_description': rel.get('description', ''),
-                    'created': group_data.get('created', ''),
-                    'modified': group_data.get('modified', ''),
-                    'relationship_created': rel.get('created', '')
-                })
-        choice = input(f"{VIOLET}List all groups or top 20? Enter 'all' or 'top20': {ENDC}").strip().lower()
-        if choice == 'top20':
-            using_groups.sort(key=lambda x: x.get('relationship_created', ''), reverse=True)
-            using_groups = using_groups[:20]
-        elif choice != 'all':
+            return None
+        subtechniques = self.technique_resolver.subtechniques.get(target_technique['id'], [])
+        if subtechniques:
+            print(f"{BEBEBLUE}[*] Sub-techniques: {', '.join(self.techniques[t]['attack_id'] for t in subtechniques)}{ENDC}")
+        parent = self.technique_resolver.parent_of.get(target_technique['id'])
+        if parent:
+            print(f"{BEBEBLUE}[*] Parent technique: {self.techniques[parent]['attack_id']} - {self.techniques[parent]['name']}{ENDC}")
+        using_groups = self._technique_users(target_technique, include_subtechniques)
+        choice = scope
+        if choice_prompt:
+            choice = input(f"{VIOLET}List all groups or top 20? Enter 'all' or 'top20': {ENDC}").strip().lower()
+        if choice not in ('all', 'top20'):
             print(f"{YELLOW}[!] Invalid choice, defaulting to all groups.{ENDC}")
+        using_groups = self._select_technique_users(using_groups, choice)
         print(f"\n{GREEN}[+] Technique: {target_technique['name']} ({target_technique.get('attack_id', 'Unknown')}){ENDC}")
         print(f"{YELLOW}Tactics: {', '.join(target_technique['tactics'])}{ENDC}")
         print(f"{YELLOW}Platforms: {', '.join(target_technique.get('platforms', []))}{ENDC}")
@@ -433,58 +2954,74 @@ class MITREAnalyzer:
                 print(f"  Usage: {desc}")
             print()
         try:
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = "Technique Usage Analysis"
-            ws.merge_cells('A1:G1')
-            ws['A1'] = f"Technique Analysis: {target_technique['name']} ({target_technique.get('attack_id', 'Unknown')})"
-            ws['A1'].font = Font(bold=True, size=14)
-            ws['A1'].alignment = Alignment(horizontal='center')
-            ws['A1'].fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-            ws['A2'] = f"Tactics: {', '.join(target_technique['tactics'])}"
-            ws['A3'] = f"Platforms: {', '.join(target_technique.get('platforms', []))}"
-            ws['A4'] = f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-            headers = ["APT Name", "APT Group MITRE ID", "Aliases", "APT Description", "Last Seen", "First Seen", "Usage Description"]
-            for col, header in enumerate(headers, 1):
-                cell = ws.cell(row=6, column=col, value=header)
-                cell.font = Font(bold=True)
-                cell.fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
-                cell.alignment = Alignment(horizontal='center')
-            for row_idx, group in enumerate(using_groups, 7):
-                first_seen = group.get('created', '')[:10] if group.get('created') else 'Unknown'
-                last_seen = group.get('modified', '')[:10] if group.get('modified') else 'Unknown'
-                if group.get('relationship_created'):
-                    rel_date = group['relationship_created'][:10] if group['relationship_created'] else first_seen
-                    first_seen = rel_date
-                aliases = ', '.join(group.get('aliases', [])) if group.get('aliases') else 'None'
-                description = self._clean_text(group.get('description', ''))
-                usage_desc = self._clean_text(group.get('relationship_description', ''))
-                ws.cell(row=row_idx, column=1, value=group['name'])
-                ws.cell(row=row_idx, column=2, value=group['attack_id'])
-                ws.cell(row=row_idx, column=3, value=aliases)
-                ws.cell(row=row_idx, column=4, value=description)
-                ws.cell(row=row_idx, column=5, value=last_seen)
-                ws.cell(row=row_idx, column=6, value=first_seen)
-                ws.cell(row=row_idx, column=7, value=usage_desc)
-            for col in range(1, 8):
-                column_letter = get_column_letter(col)
-                max_length = 0
-                for row in ws[column_letter]:
-                    try:
-                        if len(str(row.value)) > max_length:
-                            max_length = len(str(row.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
+            writer = TechniqueWorkbookWriter()
+            writer.add_technique(target_technique, using_groups, title="Technique Usage Analysis")
             safe_technique_name = target_technique.get('attack_id', 'unknown').replace('.', '_')
-            filename = f"technique_usage_{safe_technique_name}.xlsx"
-            wb.save(filename)
+            filename = os.path.join(output_dir, f"technique_usage_{safe_technique_name}.xlsx")
+            writer.save(filename)
             print(f"{GREEN}[+] Excel file created successfully: {filename}{ENDC}")
             print(f"{BEBEBLUE}[+] File contains {len(using_groups)} APT groups using this technique{ENDC}")
+            return filename
         except Exception as e:
             print(f"{RED}[-] Error creating Excel file: {e}{ENDC}")
             print(f"{YELLOW}[!] Make sure you have openpyxl installed: pip install openpyxl{ENDC}")
+            return None
+
+    def _technique_users(self, target_technique, include_subtechniques=False):
+        return self.results.get_or_compute(self.bundle_version, 'technique', (target_technique['id'], include_subtechniques),
+                                           lambda: self._build_technique_users(target_technique, include_subtechniques))
+
+    @profiled('technique users')
+    def _build_technique_users(self, target_technique, include_subtechniques):
+        technique_refs = [target_technique['id']]
+        if include_subtechniques:
+            technique_refs += self.technique_resolver.subtechniques.get(target_technique['id'], [])
+        using_groups = []
+        rels = self.relationships
+        for technique_ref in technique_refs:
+            prefix = '' if technique_ref == target_technique['id'] else f"[{self.techniques[technique_ref]['attack_id']}] "
+            PROFILER.count('relationships scanned', len(self.technique_groups.get(technique_ref, [])))
+            for row in self.technique_groups.get(technique_ref, []):
+                group_data = self.groups[rels.source_ref(row)]
+                using_groups.append({
+                    'name': group_data['name'],
+                    'attack_id': group_data.get('attack_id', 'Unknown'),
+                    'aliases': group_data.get('aliases', []),
+                    'description': group_data.clean_description,
+                    'relationship_description': (prefix + rels.clean_description(row)).rstrip(),
+                    'created': group_data.get('created', ''),
+                    'modified': group_data.get('modified', ''),
+                    'relationship_created': rels.created_iso(row)
+                })
+        return using_groups
+
+    @staticmethod
+    def _select_technique_users(using_groups, scope):
+        if scope == 'top20':
+            return sorted(using_groups, key=lambda x: x.get('relationship_created', ''), reverse=True)[:20]
+        return using_groups
+
+    @profiled('technique workbook')
+    def export_technique_workbook(self, technique_inputs, filename, scope='all', include_subtechniques=False):
+        if technique_inputs:
+            techniques = []
+            for technique_input in technique_inputs:
+                technique = self._find_technique(technique_input)
+                if technique:
+                    techniques.append(technique)
+        else:
+            techniques = sorted(self.techniques.values(), key=lambda t: t.get('attack_id') or '')
+        if not techniques:
+            print(f"{RED}[-] No techniques to export{ENDC}")
+            return None
+        started = time.perf_counter()
+        writer = TechniqueWorkbookWriter(summary=True)
+        for technique in techniques:
+            using_groups = self._technique_users(technique, include_subtechniques)
+            writer.add_technique(technique, self._select_technique_users(using_groups, scope))
+        writer.save(filename)
+        print(f"{GREEN}[+] Exported {len(techniques)} techniques ({writer.cells_written} cells) to {filename} in {time.perf_counter() - started:.2f}s{ENDC}")
+        return filename
 
     def list_top_apt_groups_by_country(self):
         print(f"\n{YELLOW}=== TOP 20 ACTIVE APT GROUPS BY COUNTRY ==={ENDC}")
@@ -494,55 +3031,18 @@ class MITREAnalyzer:
         if not country_name:
             print(f"{RED}[-] Please enter a valid country name{ENDC}")
             return
-        self._save_country_target(country_name)
+        self.analyze_country(country_name)
+
+    @profiled('country')
+    def analyze_country(self, country_name, output_dir='', record_query=True):
+        if record_query:
+            self._save_country_target(country_name)
         print(f"\n{BEBEBLUE}[*] Analyzing APT groups targeting {country_name}...{ENDC}")
-        country_lower = country_name.lower()
-        current_date = datetime.utcnow()
-        one_year_ago = current_date - timedelta(days=365)
-        targeting_groups = []
-        for group_id, group_data in self.groups.items():
-            group_score = 0
-            technique_count = 0
-            recent_activity = False
-            description = group_data.get('description', '').lower()
-            if country_lower in description:
-                group_score += 10
-            for alias in group_data.get('aliases', []):
-                if country_lower in alias.lower():
-                    group_score += 5
-                    break
-            for rel in self.relationships:
-                if (rel['source_ref'] == group_id and 
-                    rel['relationship_type'] == 'uses' and
-                    rel['target_ref'] in self.techniques):
-                    technique_count += 1
-                    try:
-                        rel_date = datetime.fromisoformat(rel['created'].replace('Z', '+00:00')).replace(tzinfo=None)
-                        if rel_date >= one_year_ago:
-                            recent_activity = True
-                            group_score += 2
-                    except:
-                        pass
-            if technique_count > 0:
-                group_score += min(technique_count, 50)
-            if recent_activity:
-                group_score += 20
-            targeting_score = self._calculate_country_targeting_score(group_data, country_lower)
-            group_score += targeting_score
-            if group_score > 0:
-                targeting_groups.append({
-                    'group_data': group_data,
-                    'score': group_score,
-                    'technique_count': technique_count,
-                    'recent_activity': recent_activity,
-                    'last_seen': self._get_group_last_activity(group_id)
-                })
-        targeting_groups.sort(key=lambda x: x['score'], reverse=True)
-        top_20_groups = targeting_groups[:20]
+        total_groups, top_20_groups = self.rank_groups_by_country(country_name)
         if not top_20_groups:
             print(f"{RED}[-] No APT groups found targeting {country_name}{ENDC}")
-            return
-        print(f"\n{GREEN}[+] Found {len(targeting_groups)} APT groups with potential targeting of {country_name}{ENDC}")
+            return None
+        print(f"\n{GREEN}[+] Found {total_groups} APT groups with potential targeting of {country_name}{ENDC}")
         print(f"{YELLOW}[+] Displaying top 20 most active groups:{ENDC}")
         print(f"{BEBEBLUE}" + "="*80 + f"{ENDC}")
         for i, group_info in enumerate(top_20_groups, 1):
@@ -559,24 +3059,118 @@ class MITREAnalyzer:
                 if len(group['aliases']) > 3:
                     aliases += f" (+{len(group['aliases']) - 3} more)"
                 print(f"    {BEBEBLUE}Aliases: {aliases}{ENDC}")
-            description = group.get('description', '')
-            if country_lower in description.lower():
-                words = description.split()
-                relevant_snippet = []
-                for j, word in enumerate(words):
-                    if country_lower in word.lower():
-                        start = max(0, j-5)
-                        end = min(len(words), j+6)
-                        relevant_snippet = words[start:end]
-                        break
-                if relevant_snippet:
-                    snippet_text = ' '.join(relevant_snippet)
-                    if len(snippet_text) > 100:
-                        snippet_text = snippet_text[:100] + "..."
-                    print(f"    {GREEN}Targeting: {snippet_text}{ENDC}")
+            if group_info['snippet']:
+                print(f"    {GREEN}Targeting: {group_info['snippet']}{ENDC}")
             print()
-        self._save_country_analysis_results(country_name, top_20_groups)
-        print(f"{GREEN}[+] Analysis complete! Results saved to {country_name.lower().replace(' ', '_')}_apt_analysis.json{ENDC}")
+        filename = os.path.join(output_dir, f"{country_name.lower().replace(' ', '_')}_apt_analysis.json")
+        if not self._save_country_analysis_results(country_name, top_20_groups, filename):
+            return None
+        print(f"{GREEN}[+] Analysis complete! Results saved to {filename}{ENDC}")
+        return filename
+
+    @property
+    def text_index(self):
+        if self._text_index is None:
+            self._text_index = TextIndex(self)
+        return self._text_index
+
+    @staticmethod
+    def _expand_targeting_terms(terms):
+        expanded = []
+        for term in terms:
+            key = ' '.join(term.lower().split())
+            for candidate in [term] + COUNTRY_KEYWORDS.get(key, []) + SECTOR_KEYWORDS.get(key, []):
+                if candidate not in expanded:
+                    expanded.append(candidate)
+        return expanded
+
+    def _targeting_results(self, terms, limit):
+        index = self.text_index
+        rels = self.relationships
+        groups = {}
+        techniques = {}
+        for doc, matches in index.search(terms).items():
+            kind, ref = index.docs[doc]
+            if kind == 'technique':
+                techniques[ref] = (doc, matches)
+                continue
+            group_id = rels.source_ref(ref) if kind == 'relationship' else ref
+            if group_id not in self.groups:
+                continue
+            entry = groups.setdefault(group_id, {'score': 0, 'terms': set(), 'snippet': None, 'relationship_snippet': None})
+            entry['terms'].update(term for position, length, term in matches)
+            if kind == 'group':
+                entry['score'] += 10 * len({term for position, length, term in matches})
+                entry['snippet'] = index.snippet(doc, *matches[0][:2])
+            elif kind == 'alias':
+                entry['score'] += 5
+            else:
+                entry['score'] += 2
+                if entry['relationship_snippet'] is None:
+                    entry['relationship_snippet'] = index.snippet(doc, *matches[0][:2])
+        ranked_groups = sorted(groups.items(), key=lambda item: (-item[1]['score'], self.groups[item[0]]['name']))[:limit]
+        ranked_techniques = sorted(techniques.items(), key=lambda item: (-len(item[1][1]), self.techniques[item[0]].get('attack_id') or ''))[:limit]
+        return {
+            'groups_matched': len(groups),
+            'techniques_matched': len(techniques),
+            'groups': [{
+                'attack_id': self.groups[group_id].get('attack_id') or 'Unknown',
+                'name': self.groups[group_id]['name'],
+                'score': entry['score'],
+                'terms': sorted(entry['terms']),
+                'snippet': entry['snippet'] or entry['relationship_snippet']
+            } for group_id, entry in ranked_groups],
+            'techniques': [{
+                'attack_id': self.techniques[technique_id].get('attack_id'),
+                'name': self.techniques[technique_id]['name'],
+                'matches': len(matches),
+                'snippet': index.snippet(doc, *matches[0][:2])
+            } for technique_id, (doc, matches) in ranked_techniques]
+        }
+
+    @profiled('targeting search')
+    def targeting_search(self, terms, limit=20, expand=True, output_file=None):
+        terms = self._expand_targeting_terms(terms) if expand else list(terms)
+        self.text_index
+        started = time.perf_counter()
+        results = self.results.get_or_compute(self.bundle_version, 'targeting', (tuple(terms), limit),
+                                              lambda: self._targeting_results(terms, limit))
+        elapsed = time.perf_counter() - started
+        print(f"\n{GREEN}[+] {results['groups_matched']} groups and {results['techniques_matched']} techniques match "
+              f"{', '.join(terms)} ({elapsed * 1000:.1f} ms){ENDC}")
+        print(f"{BEBEBLUE}" + "-" * 60 + f"{ENDC}")
+        for i, group in enumerate(results['groups'], 1):
+            print(f"{CYAN}{i:2d}. {group['attack_id']:8s} - {group['name']}{ENDC}  {YELLOW}Score: {group['score']}{ENDC}")
+            if group['snippet']:
+                print(f"    {GREEN}Targeting: {group['snippet']}{ENDC}")
+        if results['techniques']:
+            print(f"{YELLOW}Techniques mentioning these terms:{ENDC}")
+            for technique in results['techniques'][:10]:
+                print(f"  {CYAN}{technique['attack_id']} - {technique['name']}{ENDC} ({technique['matches']} matches)")
+        if output_file:
+            report = dict(results, terms=terms, analysis_date=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            _atomic_write(output_file, lambda f: json.dump(report, f, indent=2, ensure_ascii=False), mode='w')
+            print(f"{GREEN}[+] Targeting results saved to {output_file}{ENDC}")
+        return results
+
+    @property
+    def country_engine(self):
+        if self._country_engine is None:
+            self._country_engine = CountryTargetingEngine(self)
+        return self._country_engine
+
+    @profiled('country ranking')
+    def rank_groups_by_country(self, country_name, limit=20, window_days=365):
+        now = datetime.utcnow()
+        since = _to_epoch(now - timedelta(days=window_days))
+        country_lower = country_name.lower().strip()
+        def rank():
+            total_groups, results = self.country_engine.rank(country_lower, since, limit)
+            return total_groups, [{key: value for key, value in result.items() if key != 'group_data'}
+                                  for result in results], [result['group_data']['id'] for result in results]
+        total_groups, results, group_ids = self.results.get_or_compute(
+            self.bundle_version, 'country', (' '.join(country_lower.split()), limit, window_days, now.strftime('%Y-%m-%d')), rank)
+        return total_groups, [dict(result, group_data=self.groups[group_id]) for result, group_id in zip(results, group_ids)]
 
     def _save_country_target(self, country_name):
         try:
@@ -597,128 +3191,186 @@ class MITREAnalyzer:
         except Exception as e:
             print(f"{YELLOW}[!] Warning: Could not save country target: {e}{ENDC}")
 
-    def _calculate_country_targeting_score(self, group_data, country_lower):
-        score = 0
-        country_keywords = {
-            'united states': ['us', 'usa', 'american', 'washington'],
-            'china': ['chinese', 'beijing', 'prc'],
-            'russia': ['russian', 'moscow', 'kremlin'],
-            'iran': ['iranian', 'tehran', 'persian'],
-            'north korea': ['dprk', 'pyongyang', 'korean'],
-            'south korea': ['rok', 'seoul', 'korean'],
-            'israel': ['israeli', 'tel aviv', 'jerusalem'],
-            'india': ['indian', 'delhi', 'mumbai'],
-            'japan': ['japanese', 'tokyo'],
-            'germany': ['german', 'berlin'],
-            'france': ['french', 'paris'],
-            'united kingdom': ['uk', 'british', 'london', 'england'],
-            'ukraine': ['ukrainian', 'kiev', 'kyiv'],
-            'taiwan': ['taiwanese', 'taipei']
-        }
-        description = group_data.get('description', '').lower()
-        if country_lower in description:
-            score += 15
-        if country_lower in country_keywords:
-            for keyword in country_keywords[country_lower]:
-                if keyword in description:
-                    score += 8
-                    break
-        gov_keywords = ['government', 'military', 'defense', 'ministry', 'embassy', 'diplomatic']
-        for keyword in gov_keywords:
-            if keyword in description:
-                score += 5
-                break
-        return score
-
     def _get_group_last_activity(self, group_id):
-        latest_date = None
-        for rel in self.relationships:
-            if rel['source_ref'] == group_id:
-                try:
-                    rel_date = datetime.fromisoformat(rel['created'].replace('Z', '+00:00')).replace(tzinfo=None)
-                    if latest_date is None or rel_date > latest_date:
-                        latest_date = rel_date
-                except:
-                    pass
-        if latest_date:
-            return latest_date.strftime('%Y-%m-%d')
-        else:
-            group_data = self.groups.get(group_id, {})
-            modified = group_data.get('modified', '')
-            if modified:
-                try:
-                    mod_date = datetime.fromisoformat(modified.replace('Z', '+00:00')).replace(tzinfo=None)
-                    return mod_date.strftime('%Y-%m-%d')
-                except:
-                    pass
-        return 'Unknown'
+        latest_date = self.group_last_seen.get(group_id)
+        if latest_date is None:
+            latest_date = _parse_epoch(self.groups.get(group_id, {}).get('modified', ''))
+        return _format_epoch(latest_date)
+
+    @staticmethod
+    def _country_result_entries(top_groups):
+        entries = []
+        for i, group_info in enumerate(top_groups, 1):
+            group = group_info['group_data']
+            entries.append({
+                'rank': i,
+                'mitre_id': group.get('attack_id', 'Unknown'),
+                'name': group['name'],
+                'aliases': group.get('aliases', []),
+                'score': group_info['score'],
+                'technique_count': group_info['technique_count'],
+                'recent_activity': group_info['recent_activity'],
+                'last_seen': group_info['last_seen'],
+                'description': group.get('description', '')[:500] + "..." if len(group.get('description', '')) > 500 else group.get('description', '')
+            })
+        return entries
 
-    def _save_country_analysis_results(self, country_name, top_groups):
+    def _save_country_analysis_results(self, country_name, top_groups, filename):
         try:
-            filename = f"{country_name.lower().replace(' ', '_')}_apt_analysis.json"
             results = {
                 'country': country_name,
                 'analysis_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                 'total_groups_analyzed': len(self.groups),
-                'top_20_groups': []
+                'top_20_groups': self._country_result_entries(top_groups)
             }
-            for i, group_info in enumerate(top_groups, 1):
-                group = group_info['group_data']
-                results['top_20_groups'].append({
-                    'rank': i,
-                    'mitre_id': group.get('attack_id', 'Unknown'),
-                    'name': group['name'],
-                    'aliases': group.get('aliases', []),
-                    'score': group_info['score'],
-                    'technique_count': group_info['technique_count'],
-                    'recent_activity': group_info['recent_activity'],
-                    'last_seen': group_info['last_seen'],
-                    'description': group.get('description', '')[:500] + "..." if len(group.get('description', '')) > 500 else group.get('description', '')
-                })
             with open(filename, 'w', encoding='utf-8') as f:
                 json.dump(results, f, indent=2, ensure_ascii=False)
+            return True
         except Exception as e:
             print(f"{YELLOW}[!] Warning: Could not save analysis results: {e}{ENDC}")
+            return False
 
     def _get_technique_last_seen(self, technique_id):
-        latest_date = None
-        for rel in self.relationships:
-            if rel['target_ref'] == technique_id:
-                try:
-                    rel_date = datetime.fromisoformat(rel['created'].replace('Z', '+00:00')).replace(tzinfo=None)
-                    if latest_date is None or rel_date > latest_date:
-                        latest_date = rel_date
-                except:
-                    pass
-        return latest_date.strftime('%Y-%m-%d') if latest_date else 'Unknown'
+        return _format_epoch(self.technique_last_seen.get(technique_id))
     
     def _group_used_tactic_recently(self, group_id, tactic_short_name, cutoff_date, current_date):
-        for rel in self.relationships:
-            if (rel['source_ref'] == group_id and 
-                rel['target_ref'] in self.techniques):
-                tech = self.techniques[rel['target_ref']]
-                if tactic_short_name in [t.lower().replace(' ', '-') for t in tech['tactics']]:
-                    try:
-                        rel_date = datetime.fromisoformat(rel['created'].replace('Z', '+00:00')).replace(tzinfo=None)
-                        if cutoff_date <= rel_date <= current_date:
-                            return True
-                    except:
-                        pass
-        return False
+        return self.timeline.count('group tactic', (group_id, tactic_short_name), _to_epoch(cutoff_date), _to_epoch(current_date)) > 0
     
     def _group_used_technique_recently(self, group_id, technique, cutoff_date, current_date):
-        for rel in self.relationships:
-            if (rel['source_ref'] == group_id and 
-                rel['target_ref'] in self.techniques and
-                self.techniques[rel['target_ref']]['id'] == technique['id']):
-                try:
-                    rel_date = datetime.fromisoformat(rel['created'].replace('Z', '+00:00')).replace(tzinfo=None)
-                    if cutoff_date <= rel_date <= current_date:
-                        return True
-                except:
-                    pass
-        return False
-    
+        return self.timeline.count('group technique', (group_id, technique['id']), _to_epoch(cutoff_date), _to_epoch(current_date)) > 0
+
+    @property
+    def timeline(self):
+        if self._timeline is None:
+            self._timeline = TimelineIndex(self)
+        return self._timeline
+
+    def _resolve_activity_subject(self, text):
+        tactic = self._normalize_tactic(text.strip())
+        if tactic in self.tactic_techniques:
+            return 'tactic', tactic
+        technique_id = self.technique_resolver.by_id.get(_normalize_technique_id(text))
+        if technique_id:
+            return 'technique', technique_id
+        match = self.group_resolver.resolve(text)
+        if match:
+            return 'group', match[0]
+        match = self.technique_resolver.resolve(text)
+        if match:
+            return 'technique', match[0]
+        return None
+
+    def _activity_label(self, kind, key):
+        if kind == 'tactic':
+            return key
+        record = self.groups[key] if kind == 'group' else self.techniques[key]
+        return f"{record.get('attack_id') or 'Unknown'} - {record['name']}"
+
+    def _activity_entries(self, rows, entity):
+        rels = self.relationships
+        entries = {}
+        for row in rows:
+            ref = rels.source_ref(row) if entity == 'group' else rels.target_ref(row)
+            created = rels.created[row]
+            entry = entries.get(ref)
+            if entry is None:
+                entries[ref] = [1, created, created]
+            else:
+                entry[0] += 1
+                entry[2] = created
+        records = self.groups if entity == 'group' else self.techniques
+        return [{
+            'attack_id': records[ref].get('attack_id') or 'Unknown',
+            'name': records[ref]['name'],
+            'uses': count,
+            'first_in_window': _format_epoch(first),
+            'last_in_window': _format_epoch(last)
+        } for ref, (count, first, last) in sorted(entries.items(), key=lambda item: (-item[1][0], -item[1][2], item[0]))]
+
+    @profiled('activity')
+    def query_activity(self, kind=None, value=None, since=None, until=None, days=365, limit=None, output_file=None):
+        until = until or datetime.utcnow()
+        since = since or until - timedelta(days=days)
+        start, end = _to_epoch(since), _to_epoch(until)
+        timeline = self.timeline
+        if value is not None and kind is None:
+            subject = self._resolve_activity_subject(value)
+            if subject is None:
+                print(f"{RED}[-] No tactic, group or technique matches: {value}{ENDC}")
+                return None
+            kind, key = subject
+        elif kind == 'tactic':
+            key = self._normalize_tactic(value)
+            if key not in self.tactic_techniques:
+                print(f"{RED}[-] Tactic not found: {value}{ENDC}")
+                return None
+        elif kind == 'group':
+            group_data = self._find_group_enhanced(value)
+            if not group_data:
+                return None
+            key = group_data['id']
+        elif kind == 'technique':
+            technique = self._find_technique(value)
+            if not technique:
+                return None
+            key = technique['id']
+        else:
+            key = None
+        window = f"{since.strftime('%Y-%m-%d')} to {until.strftime('%Y-%m-%d')}"
+        report = {'analysis_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'since': since.strftime('%Y-%m-%d'),
+                  'until': until.strftime('%Y-%m-%d')}
+        if key is None:
+            new_techniques = timeline.first_seen('technique', start, end)
+            new_pairs = timeline.first_seen('group technique', start, end)
+            report['new_techniques'] = [dict(self._activity_entries(timeline.rows('technique', technique_id, first, first), 'technique')[0],
+                                             first_attributed=_format_epoch(first)) for first, technique_id in reversed(new_techniques)][:limit]
+            report['new_attributions'] = [{
+                'group': self._activity_label('group', group_id),
+                'technique': self._activity_label('technique', technique_id),
+                'first_attributed': _format_epoch(first)
+            } for first, (group_id, technique_id) in reversed(new_pairs)][:limit]
+            print(f"\n{GREEN}[+] {len(new_techniques)} techniques first attributed and {len(new_pairs)} new group/technique "
+                  f"attributions from {window}{ENDC}")
+            for entry in report['new_techniques'][:20]:
+                print(f"  {CYAN}{entry['attack_id']} - {entry['name']}{ENDC}  first attributed {entry['first_attributed']}")
+        else:
+            entity = 'technique' if kind == 'group' else 'group'
+            rows = timeline.rows(kind, key, start, end)
+            entries = self._activity_entries(rows, entity)
+            total = len(entries)
+            entries = entries[:limit]
+            report.update(subject_type=kind, subject=self._activity_label(kind, key), uses_in_window=len(rows),
+                          **{f"{entity.replace('technique', 'techniques').replace('group', 'groups')}": entries})
+            heading = {'tactic': f"Groups using {key} techniques", 'technique': f"Groups using {self._activity_label(kind, key)}",
+                       'group': f"Techniques used by {self._activity_label(kind, key)}"}[kind]
+            print(f"\n{GREEN}[+] {heading} from {window}: {total} ({len(rows)} uses){ENDC}")
+            print(f"{BEBEBLUE}" + "-" * 60 + f"{ENDC}")
+            for entry in entries[:20]:
+                print(f"  {CYAN}{entry['attack_id']} - {entry['name']}{ENDC}  {entry['uses']} uses, "
+                      f"last {entry['last_in_window']}")
+        if output_file:
+            _atomic_write(output_file, lambda f: json.dump(report, f, indent=2, ensure_ascii=False), mode='w')
+            print(f"{GREEN}[+] Activity results saved to {output_file}{ENDC}")
+        return report
+
+    def analyze_activity(self):
+        print(f"\n{YELLOW}=== ACTIVITY TIMELINE ==={ENDC}")
+        print(f"{GREEN}Enter a tactic, group or technique, or leave blank for newly attributed techniques{ENDC}")
+        subject = input(f"{VIOLET}Tactic, group or technique: {ENDC}").strip()
+        days = input(f"{VIOLET}Days to look back (default 365): {ENDC}").strip()
+        self.query_activity(value=subject or None, days=int(days) if days else 365)
+
+    def run_query(self, query_type, value, output_dir='', scope='all', include_subtechniques=False):
+        if query_type == 'map-group':
+            return self.map_group(value, output_dir)
+        if query_type == 'prevalence':
+            return self.tactic_prevalence(value, output_dir)
+        if query_type == 'technique':
+            return self.assess_technique(value, scope, output_dir, include_subtechniques=include_subtechniques)
+        if query_type == 'country':
+            return self.analyze_country(value, output_dir, record_query=False)
+        raise ValueError(f"Unknown query type: {query_type}")
+
     def run(self):
         self.load_mitre_data()
         print(f"\n{BEBEBLUE}" + "="*60 + f"{ENDC}")
@@ -731,9 +3383,10 @@ class MITREAnalyzer:
             print(f"{GREEN}2. Analyze Tactic Prevalence (e.g., 'Persistence'){ENDC}")
             print(f"{GREEN}3. Assess Technique Usage & Export to Excel {ENDC}")
             print(f"{GREEN}4. List Top 20 APT Groups by Country Target{ENDC}")
+            print(f"{GREEN}5. Query Activity Timeline (by tactic, group, or technique){ENDC}")
             print(f"{BEBEBLUE}" + "-" * 60 + f"{ENDC}")
             try:
-                choice = int(input(f"{VIOLET}Select option (1-4): {ENDC}"))
+                choice = int(input(f"{VIOLET}Select option (1-5): {ENDC}"))
                 if choice == 1:
                     self.map_apt_group()
                 elif choice == 2:
@@ -742,8 +3395,10 @@ class MITREAnalyzer:
                     self.assess_tactic_usage()
                 elif choice == 4:
                     self.list_top_apt_groups_by_country()
+                elif choice == 5:
+                    self.analyze_activity()
                 else:
-                    print(f"{RED}[-] Please enter 1, 2, 3, or 4{ENDC}")
+                    print(f"{RED}[-] Please enter 1, 2, 3, 4, or 5{ENDC}")
                     continue
                 if input(f"\n{BEBEBLUE}[?] Continue analysis? (y/n): {ENDC}").lower() != 'y':
                     break
@@ -757,7 +3412,741 @@ class MITREAnalyzer:
                 print(f"{RED}[-] Error: {e}{ENDC}")
                 continue
 
+_BATCH_ANALYZER = None
+
+def _init_batch_worker(options):
+    global _BATCH_ANALYZER
+    if _BATCH_ANALYZER is None:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            _BATCH_ANALYZER = MITREAnalyzer(**options)
+            _BATCH_ANALYZER.load_mitre_data()
+
+def _run_batch_query(job):
+    index, query, output_dir = job
+    record = {'index': index, 'type': query['type'], 'query': query['query'], 'outputs': []}
+    query_dir = os.path.join(output_dir, f"{index:04d}_{query['type']}")
+    started = time.perf_counter()
+    try:
+        os.makedirs(query_dir, exist_ok=True)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            output = _BATCH_ANALYZER.run_query(query['type'], query['query'], query_dir, query.get('scope') or 'all',
+                                               query.get('include_subtechniques', False))
+        if output:
+            record['status'] = 'ok'
+            record['outputs'].append(os.path.relpath(output, output_dir))
+        else:
+            record['status'] = 'not_found'
+    except Exception as e:
+        record['status'] = 'error'
+        record['error'] = str(e)
+    record['duration_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return record
+
+BATCH_FLAG_VALUES = {'': False, '0': False, 'false': False, 'no': False, 'n': False,
+                     '1': True, 'true': True, 'yes': True, 'y': True}
+
+def load_batch_queries(path):
+    queries = []
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    for line_no, row in enumerate(rows, 1):
+        query_type = (row.get('type') or '').strip().lower()
+        value = (row.get('query') or '').strip()
+        if query_type not in QUERY_TYPES or not value:
+            raise ValueError(f"{path}: entry {line_no} needs a 'type' in {', '.join(QUERY_TYPES)} and a 'query'")
+        include_subtechniques = row.get('include_subtechniques')
+        if not isinstance(include_subtechniques, bool):
+            include_subtechniques = BATCH_FLAG_VALUES.get(str(include_subtechniques or '').strip().lower())
+            if include_subtechniques is None:
+                raise ValueError(f"{path}: entry {line_no} has an 'include_subtechniques' value that is not true or false")
+        queries.append({'type': query_type, 'query': value, 'scope': (row.get('scope') or 'all').strip().lower(),
+                        'include_subtechniques': include_subtechniques})
+    return queries
+
+def run_batch(analyzer, queries_file, output_dir, workers):
+    global _BATCH_ANALYZER
+    queries = load_batch_queries(queries_file)
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"{BEBEBLUE}[*] Running {len(queries)} queries with {workers} worker(s){ENDC}")
+    started = time.perf_counter()
+    jobs = [(index, query, output_dir) for index, query in enumerate(queries, 1)]
+    _BATCH_ANALYZER = analyzer
+    if any(query['type'] == 'country' for query in queries):
+        analyzer.country_engine
+    if workers <= 1 or len(jobs) <= 1:
+        results = [_run_batch_query(job) for job in jobs]
+    else:
+        if 'fork' in multiprocessing.get_all_start_methods():
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker, initargs=(analyzer.options,))
+        with pool:
+            results = list(pool.map(_run_batch_query, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    manifest = {
+        'generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'queries_file': queries_file,
+        'workers': workers,
+        'total': len(results),
+        'succeeded': sum(1 for r in results if r['status'] == 'ok'),
+        'failed': sum(1 for r in results if r['status'] != 'ok'),
+        'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+        'queries': results
+    }
+    manifest_path = os.path.join(output_dir, 'manifest.json')
+    _atomic_write(manifest_path, lambda f: json.dump(manifest, f, indent=2, ensure_ascii=False), mode='w')
+    print(f"{GREEN}[+] Batch complete: {manifest['succeeded']}/{manifest['total']} succeeded in {manifest['duration_ms'] / 1000:.2f}s{ENDC}")
+    print(f"{BEBEBLUE}[+] Manifest saved to {manifest_path}{ENDC}")
+    return manifest
+
+def run_diff(analyzer, old_bundle=None, new_bundle=None, output_dir=None, report_file=None):
+    if len(analyzer.domains) > 1:
+        print(f"{RED}[!] diff compares one domain at a time, pass a single --domains value{ENDC}")
+        return None
+    if old_bundle:
+        domain, path = _bundle_entries(old_bundle)[0]
+        analyzer.bundle_path = old_bundle if path != old_bundle else f"{analyzer.domains[0]}={old_bundle}"
+    offline = analyzer.cache.offline
+    if not new_bundle:
+        analyzer.cache.offline = True
+    try:
+        analyzer.load_mitre_data()
+    finally:
+        analyzer.cache.offline = offline
+    old_signatures = bundle_signatures(analyzer.loaded_bundle_path)
+    if not new_bundle:
+        analyzer.cache.ttl = 0
+        new_bundle = analyzer.cache.fetch(DOMAIN_URLS[analyzer.domains[0]])
+    report = analyzer.update_bundle(new_bundle, old_signatures, output_dir)
+    if report_file:
+        _atomic_write(report_file, lambda f: json.dump(report, f, indent=2, ensure_ascii=False), mode='w')
+        print(f"{GREEN}[+] Diff report saved to {report_file}{ENDC}")
+    return report
+
+SYNTHETIC_BASE = {'groups': 150, 'techniques': 600, 'uses': 4000, 'mitigations': 40, 'mitigates': 1200}
+SYNTHETIC_TACTICS = ['reconnaissance', 'resource-development', 'initial-access', 'execution', 'persistence',
+                     'privilege-escalation', 'defense-evasion', 'credential-access', 'discovery', 'lateral-movement',
+                     'collection', 'command-and-control', 'exfiltration', 'impact']
+BENCH_THRESHOLD = 0.2
+
+def generate_synthetic_bundle(path, scale=10, seed=1):
+    rng = random.Random(seed)
+    counts = {kind: max(1, int(count * scale)) for kind, count in SYNTHETIC_BASE.items()}
+    countries = list(COUNTRY_KEYWORDS) + ['the energy sector', 'European governments']
+    words = ("adversaries may abuse legitimate system features to execute payloads establish persistence evade "
+             "defenses and move laterally through the network using stolen credentials and custom malware").split()
+    stamp = lambda: f"20{rng.randint(15, 25)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00.000Z"
+    text = lambda n: ' '.join(rng.choice(words) for _ in range(n)).capitalize() + '.'
+    stix_id = lambda kind, n: f"{kind}--{n:08x}-0000-4000-8000-{rng.getrandbits(48):012x}"
+    techniques, groups = [], []
+    def objects():
+        for i, tactic in enumerate(SYNTHETIC_TACTICS):
+            yield {'type': 'x-mitre-tactic', 'id': stix_id('x-mitre-tactic', i), 'name': tactic.replace('-', ' ').title(),
+                   'description': text(20), 'x_mitre_shortname': tactic,
+                   'external_references': [{'source_name': 'mitre-attack', 'external_id': f"TA{i + 1:04d}"}]}
+        for i in range(counts['techniques']):
+            sub = i % 3
+            attack_id = f"T{1000 + i // 3}" + (f".{sub:03d}" if sub else '')
+            techniques.append(stix_id('attack-pattern', i))
+            yield {'type': 'attack-pattern', 'id': techniques[-1], 'name': f"Synthetic Technique {attack_id}",
+                   'description': text(rng.randint(40, 160)) + ' <code>cmd.exe</code> &amp; more', 'created': stamp(), 'modified': stamp(),
+                   'kill_chain_phases': [{'kill_chain_name': 'mitre-attack', 'phase_name': phase}
+                                         for phase in rng.sample(SYNTHETIC_TACTICS, rng.randint(1, 2))],
+                   'x_mitre_platforms': rng.sample(['Windows', 'Linux', 'macOS', 'Network', 'Containers'], rng.randint(1, 3)),
+                   'x_mitre_data_sources': ['Process: Process Creation', 'Command: Command Execution'][:rng.randint(1, 2)],
+                   'x_mitre_detection': text(rng.randint(10, 60)), 'x_mitre_is_subtechnique': bool(sub),
+                   'external_references': [{'source_name': 'mitre-attack', 'external_id': attack_id}]}
+        for i in range(counts['groups']):
+            groups.append(stix_id('intrusion-set', i))
+            yield {'type': 'intrusion-set', 'id': groups[-1], 'name': f"Synthetic Group {i}",
+                   'description': f"Synthetic Group {i} has targeted {rng.choice(countries)} and {rng.choice(countries)}. "
+                                  f"{text(rng.randint(20, 80))} It focuses on {rng.choice(GOV_KEYWORDS)} organizations.",
+                   'aliases': [f"Synthetic Group {i}", f"SG{i}", f"Actor {i:05d}"], 'created': stamp(), 'modified': stamp(),
+                   'external_references': [{'source_name': 'mitre-attack', 'external_id': f"G{i:05d}"}]}
+        mitigations = [stix_id('course-of-action', i) for i in range(counts['mitigations'])]
+        for i, mitigation in enumerate(mitigations):
+            yield {'type': 'course-of-action', 'id': mitigation, 'name': f"Synthetic Mitigation {i}", 'description': text(30),
+                   'external_references': [{'source_name': 'mitre-attack', 'external_id': f"M{1000 + i}"}]}
+        for i in range(counts['uses']):
+            yield {'type': 'relationship', 'id': stix_id('relationship', i), 'relationship_type': 'uses',
+                   'source_ref': rng.choice(groups), 'target_ref': rng.choice(techniques),
+                   'description': f"[Synthetic Group](https://attack.mitre.org/groups/) has used this technique. {text(rng.randint(8, 30))}",
+                   'created': stamp(), 'modified': stamp()}
+        for i in range(counts['mitigates']):
+            yield {'type': 'relationship', 'id': stix_id('relationship', counts['uses'] + i), 'relationship_type': 'mitigates',
+                   'source_ref': rng.choice(mitigations), 'target_ref': rng.choice(techniques),
+                   'description': text(15), 'created': stamp(), 'modified': stamp()}
+    def write_bundle(f):
+        f.write('{"type": "bundle", "id": "bundle--synthetic", "spec_version": "2.1", "objects": [\n')
+        for i, obj in enumerate(objects()):
+            f.write((',\n' if i else '') + json.dumps(obj))
+        f.write('\n]}\n')
+    _atomic_write(path, write_bundle, mode='w')
+    return counts
+
+def _bench_latency(calls):
+    timings = []
+    for call in calls:
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    if not timings:
+        return {}
+    return {'mean_ms': round(sum(timings) / len(timings), 3), 'p50_ms': round(timings[len(timings) // 2], 3),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3)}
+
+def benchmark_bundle(bundle_path, cache_dir, queries=50, seed=1):
+    rng = random.Random(seed)
+    metrics = {'bundle_mb': round(os.path.getsize(bundle_path) / (1 << 20), 2)}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        analyzer = MITREAnalyzer(bundle_path=bundle_path, cache_dir=cache_dir, use_snapshot=False, result_cache_size=0)
+        started = time.perf_counter()
+        analyzer.load_mitre_data()
+        metrics['load_parse_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        started = time.perf_counter()
+        analyzer.snapshots.save(analyzer.bundle_version, analyzer._model_state())
+        metrics['snapshot_save_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        warm = MITREAnalyzer(bundle_path=bundle_path, cache_dir=cache_dir, result_cache_size=0)
+        started = time.perf_counter()
+        warm.load_mitre_data()
+        metrics['load_snapshot_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        del warm
+        tracemalloc.start()
+        traced = MITREAnalyzer(bundle_path=bundle_path, cache_dir=cache_dir, use_snapshot=False, result_cache_size=0)
+        traced.load_mitre_data()
+        metrics['load_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / (1 << 20), 2)
+        tracemalloc.stop()
+        del traced
+        groups = rng.sample(list(analyzer.groups.values()), min(queries, len(analyzer.groups)))
+        techniques = rng.sample(list(analyzer.techniques.values()), min(queries, len(analyzer.techniques)))
+        tactics = sorted(analyzer.tactic_techniques)
+        countries = [rng.choice(list(COUNTRY_KEYWORDS)) for _ in range(min(queries, 20))]
+        started = time.perf_counter()
+        analyzer.country_engine
+        metrics['country_index_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        for name, calls in (
+                ('map_group', [lambda g=g: analyzer._map_group_techniques_enhanced(g, verbose=False) for g in groups]),
+                ('technique', [lambda t=t: analyzer._select_technique_users(analyzer._technique_users(t), 'top20') for t in techniques]),
+                ('prevalence', [lambda t=t: analyzer.tactic_prevalence(t) for t in tactics]),
+                ('country', [lambda c=c: analyzer.rank_groups_by_country(c) for c in countries]),
+                ('targeting', [lambda k=k: analyzer._targeting_results(analyzer._expand_targeting_terms([k]), 20) for k in SECTOR_KEYWORDS])):
+            for stat, value in _bench_latency(calls).items():
+                metrics[f"{name}_{stat}"] = value
+        engine = analyzer.similarity_engine
+        if len(engine.group_ids) <= SIMILARITY_EXACT_LIMIT:
+            started = time.perf_counter()
+            engine.pairs(0.5, approximate=False)
+            metrics['similarity_all_pairs_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        started = time.perf_counter()
+        engine.pairs(0.5, approximate=True)
+        metrics['similarity_lsh_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = TechniqueWorkbookWriter(summary=True)
+            started = time.perf_counter()
+            for technique in techniques:
+                writer.add_technique(technique, analyzer._technique_users(technique))
+            writer.save(os.path.join(tmp, 'bench.xlsx'))
+            elapsed = time.perf_counter() - started
+            metrics['excel_cells_per_s'] = round(writer.cells_written / elapsed) if elapsed else 0
+            started = time.perf_counter()
+            written = analyzer.generate_layers([g['attack_id'] or g['name'] for g in groups], tmp, workers=4)
+            elapsed = time.perf_counter() - started
+            metrics['navigator_layers_per_s'] = round(len(written) / elapsed, 1) if elapsed else 0
+    metrics.update(groups=len(analyzer.groups), techniques=len(analyzer.techniques), relationships=len(analyzer.relationships))
+    return metrics
+
+def compare_benchmarks(results, baseline, threshold=BENCH_THRESHOLD):
+    regressions = []
+    for label, metrics in results.items():
+        for name, value in metrics.items():
+            previous = baseline.get(label, {}).get(name)
+            if not previous or not isinstance(value, (int, float)) or name in ('groups', 'techniques', 'relationships', 'bundle_mb'):
+                continue
+            change = (value - previous) / previous
+            if name.endswith('_per_s'):
+                change = -change
+            if change > threshold:
+                regressions.append({'bundle': label, 'metric': name, 'baseline': previous, 'current': value,
+                                    'change': round(change, 3)})
+    return regressions
+
+def run_bench(analyzer, scales=(), queries=50, output_file=None, baseline_file=None, threshold=BENCH_THRESHOLD,
+              skip_real=False):
+    cache_dir = analyzer.options['cache_dir'] or DEFAULT_CACHE_DIR
+    bench_dir = os.path.join(cache_dir, f"v{CACHE_FORMAT_VERSION}", 'bench')
+    bundles = []
+    if not skip_real:
+        bundles.append(('real', analyzer._resolve_bundle_path()))
+    for scale in scales:
+        path = os.path.join(bench_dir, f"synthetic-x{scale:g}.json")
+        if not os.path.exists(path):
+            print(f"{BEBEBLUE}[*] Generating synthetic bundle at {scale:g}x scale...{ENDC}")
+            generate_synthetic_bundle(path, scale)
+        bundles.append((f"synthetic-x{scale:g}", path))
+    if not bundles:
+        print(f"{RED}[-] Nothing to benchmark, pass --synthetic SCALE when skipping the real bundle{ENDC}")
+    results = {}
+    for label, path in bundles:
+        print(f"{BEBEBLUE}[*] Benchmarking {label} ({path})...{ENDC}")
+        results[label] = benchmark_bundle(path, bench_dir, queries)
+        metrics = results[label]
+        print(f"{GREEN}[+] {label}: {metrics['relationships']} relationships, parse {metrics['load_parse_ms']} ms, "
+              f"snapshot {metrics['load_snapshot_ms']} ms, peak {metrics['load_peak_mb']} MB{ENDC}")
+        print(f"    {CYAN}map-group p50 {metrics.get('map_group_p50_ms')} ms | technique p50 {metrics.get('technique_p50_ms')} ms | "
+              f"prevalence p50 {metrics.get('prevalence_p50_ms')} ms | country p50 {metrics.get('country_p50_ms')} ms{ENDC}")
+        print(f"    {CYAN}Excel {metrics['excel_cells_per_s']} cells/s | Navigator {metrics['navigator_layers_per_s']} layers/s{ENDC}")
+    report = {
+        'generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': sys.version.split()[0],
+        'numpy': np is not None,
+        'results': results
+    }
+    if baseline_file:
+        with open(baseline_file, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get('results', {})
+        report['regressions'] = compare_benchmarks(results, baseline, threshold)
+        for regression in report['regressions']:
+            print(f"{RED}[-] Regression in {regression['bundle']} {regression['metric']}: {regression['baseline']} -> "
+                  f"{regression['current']} ({regression['change']:.0%} worse){ENDC}")
+        if not report['regressions']:
+            print(f"{GREEN}[+] No regressions beyond {threshold:.0%} against {baseline_file}{ENDC}")
+    if output_file:
+        _atomic_write(output_file, lambda f: json.dump(report, f, indent=2), mode='w')
+        print(f"{GREEN}[+] Benchmark results saved to {output_file}{ENDC}")
+    return report
+
+class QueryError(Exception):
+    def __init__(self, status, message, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+class QueryService:
+    def __init__(self, analyzer, cache_size=512, reload_interval=300):
+        self.analyzer = analyzer
+        self.cache_size = cache_size
+        self.reload_interval = reload_interval
+        self.responses = OrderedDict()
+        self.lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        self.stats = {'requests': 0, 'cache_hits': 0, 'reloads': 0, 'started': time.time()}
+        self.routes = {
+            'groups': self.group_mapping,
+            'layers': self.group_layer,
+            'techniques': self.technique_usage,
+            'tactics': self.tactic_prevalence,
+            'countries': self.country_ranking,
+            'similar': self.similar_groups,
+            'targeting': self.targeting
+        }
+
+    def respond(self, path, params):
+        parts = [unquote(part) for part in path.strip('/').split('/') if part]
+        if parts == ['health']:
+            return 200, json.dumps(self.health()).encode('utf-8'), False
+        if len(parts) != 2 or parts[0] not in self.routes:
+            raise QueryError(404, f"Unknown endpoint: {path}", endpoints=sorted(self.routes) + ['health'])
+        analyzer = self.analyzer
+        key = (analyzer.bundle_version, parts[0], parts[1].lower(), tuple(sorted((k, tuple(v)) for k, v in params.items())))
+        with self.lock:
+            self.stats['requests'] += 1
+            body = self.responses.get(key)
+            if body is not None:
+                self.responses.move_to_end(key)
+                self.stats['cache_hits'] += 1
+                return 200, body, True
+        body = json.dumps(self.routes[parts[0]](analyzer, parts[1], params), ensure_ascii=False).encode('utf-8')
+        with self.lock:
+            self.responses[key] = body
+            while len(self.responses) > self.cache_size:
+                self.responses.popitem(last=False)
+        return 200, body, False
+
+    def health(self):
+        analyzer = self.analyzer
+        with self.lock:
+            return dict(self.stats, status='ok', bundle_version=analyzer.bundle_version, groups=len(analyzer.groups),
+                        techniques=len(analyzer.techniques), relationships=len(analyzer.relationships),
+                        cached_responses=len(self.responses), result_cache=analyzer.results.summary())
+
+    @staticmethod
+    def _param(params, name, default, convert=str):
+        try:
+            return convert(params[name][0]) if name in params else default
+        except ValueError:
+            raise QueryError(400, f"Invalid value for '{name}': {params[name][0]}") from None
+
+    @staticmethod
+    def _group(analyzer, value):
+        match = analyzer.group_resolver.resolve(value)
+        if not match:
+            suggestions = [analyzer.groups[group_id]['name'] for score, group_id, alias in analyzer.group_resolver.suggest(value)]
+            raise QueryError(404, f"Group not found: {value}", suggestions=suggestions)
+        return analyzer.groups[match[0]]
+
+    def group_mapping(self, analyzer, value, params):
+        return analyzer._map_group_techniques_enhanced(self._group(analyzer, value), verbose=False)
+
+    def group_layer(self, analyzer, value, params):
+        layers = analyzer._domain_layers(self.group_mapping(analyzer, value, params))
+        domain = self._param(params, 'domain', None)
+        if domain is None:
+            return layers[0][1]
+        domain = DOMAIN_NAMES.get(domain, domain)
+        for suffix, layer in layers:
+            if layer['domain'] == domain:
+                return layer
+        raise QueryError(404, f"No {domain} techniques for group: {value}", domains=[layer['domain'] for suffix, layer in layers])
+
+    def technique_usage(self, analyzer, value, params):
+        match = analyzer.technique_resolver.resolve(value)
+        if not match:
+            suggestions = [f"{analyzer.techniques[t]['attack_id']} - {analyzer.techniques[t]['name']}" for score, t in analyzer.technique_resolver.suggest(value)]
+            raise QueryError(404, f"Technique not found: {value}", suggestions=suggestions)
+        technique = analyzer.techniques[match[0]]
+        scope = self._param(params, 'scope', 'all')
+        if scope not in ('all', 'top20'):
+            raise QueryError(400, f"Invalid value for 'scope': {scope}")
+        include_subtechniques = self._param(params, 'subtechniques', '0') in ('1', 'true', 'yes')
+        using_groups = analyzer._select_technique_users(analyzer._technique_users(technique, include_subtechniques), scope)
+        result = {field: technique[field] for field in ('attack_id', 'name', 'tactics', 'platforms', 'is_subtechnique')}
+        result['subtechniques'] = [analyzer.techniques[t]['attack_id'] for t in analyzer.technique_resolver.subtechniques.get(technique['id'], [])]
+        result['groups'] = using_groups
+        return result
+
+    def tactic_prevalence(self, analyzer, value, params):
+        top = self._param(params, 'top', None, int)
+        tactic = analyzer._normalize_tactic(value)
+        summary = analyzer.tactic_prevalence_matrix(top).get(tactic)
+        if summary is None:
+            raise QueryError(404, f"Tactic not found: {value}", tactics=sorted(analyzer.tactic_techniques))
+        return dict(summary, tactic=tactic)
+
+    def country_ranking(self, analyzer, value, params):
+        limit = self._param(params, 'limit', 20, int)
+        window_days = self._param(params, 'window_days', 365, int)
+        total_groups, top_groups = analyzer.rank_groups_by_country(value, limit, window_days)
+        return {'country': value, 'total_groups': total_groups, 'groups': analyzer._country_result_entries(top_groups)}
+
+    def targeting(self, analyzer, value, params):
+        limit = self._param(params, 'limit', 20, int)
+        terms = [term.strip() for term in value.split(',') if term.strip()]
+        if self._param(params, 'expand', '1') in ('1', 'true', 'yes'):
+            terms = analyzer._expand_targeting_terms(terms)
+        results = analyzer.results.get_or_compute(analyzer.bundle_version, 'targeting', (tuple(terms), limit),
+                                                  lambda: analyzer._targeting_results(terms, limit))
+        return dict(results, terms=terms)
+
+    def similar_groups(self, analyzer, value, params):
+        group = self._group(analyzer, value)
+        top = self._param(params, 'top', 10, int)
+        method = self._param(params, 'method', 'jaccard')
+        if method not in SIMILARITY_METHODS:
+            raise QueryError(400, f"Invalid value for 'method': {method}", methods=list(SIMILARITY_METHODS))
+        approximate = self._param(params, 'approximate', None)
+        if approximate is not None:
+            approximate = approximate in ('1', 'true', 'yes')
+        engine = analyzer.similarity_engine
+        i = engine.index.get(group['id'])
+        similar = [] if i is None else [analyzer._similarity_entry(group_id, score, engine.shared_count(i, engine.index[group_id]))
+                                        for group_id, score in engine.top_k(group['id'], top, method, approximate)]
+        return {'group': analyzer._similarity_entry(group['id'], 1.0), 'method': method, 'similar_groups': similar}
+
+    def reload_if_changed(self):
+        with self.reload_lock:
+            current = self.analyzer
+            if current._bundle_version(current._resolve_bundle_paths()) == current.bundle_version:
+                return False
+            analyzer = MITREAnalyzer(**current.options)
+            analyzer.load_mitre_data()
+            with self.lock:
+                self.analyzer = analyzer
+                self.responses.clear()
+                self.stats['reloads'] += 1
+            print(f"{GREEN}[+] Reloaded model for bundle {analyzer.bundle_version[:12]}{ENDC}")
+            return True
+
+    def watch(self, stop):
+        while not stop.wait(self.reload_interval):
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                print(f"{YELLOW}[!] Warning: Reload failed, keeping the current model: {e}{ENDC}")
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    server_version = "ThreatMappingPro/1.0"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        try:
+            status, body, cached = self.server.service.respond(url.path, parse_qs(url.query))
+        except QueryError as e:
+            status, cached = e.status, False
+            body = json.dumps(dict(e.details, error=str(e))).encode('utf-8')
+        except Exception as e:
+            status, cached = 500, False
+            body = json.dumps({'error': str(e)}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Cache', 'hit' if cached else 'miss')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+def serve(analyzer, host='127.0.0.1', port=8080, cache_size=512, reload_interval=300, quiet=False):
+    service = QueryService(analyzer, cache_size, reload_interval)
+    server = ThreadingHTTPServer((host, port), QueryRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.quiet = quiet
+    stop = threading.Event()
+    if reload_interval > 0:
+        threading.Thread(target=service.watch, args=(stop,), daemon=True).start()
+    print(f"{GREEN}[+] Serving ATT&CK queries on http://{host}:{server.server_address[1]}/ (Ctrl+C to stop){ENDC}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{YELLOW}[!] Shutting down server{ENDC}")
+    finally:
+        stop.set()
+        server.server_close()
+    return service
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}', use YYYY-MM-DD") from None
+
+def parse_domains(value):
+    domains = []
+    for domain in value.lower().split(','):
+        domain = domain.strip()
+        if domain not in DOMAIN_URLS:
+            raise argparse.ArgumentTypeError(f"unknown domain '{domain}', choose from {', '.join(DOMAIN_URLS)}")
+        if domain not in domains:
+            domains.append(domain)
+    return domains
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Threat Mapping Pro - MITRE ATT&CK analyzer")
+    parser.add_argument('--bundle', metavar='[DOMAIN=]PATH', action='append',
+                        help="Load ATT&CK data from a local STIX bundle file, repeat with DOMAIN= prefixes for several domains")
+    parser.add_argument('--domains', type=parse_domains,
+                        help="Comma-separated ATT&CK domains to load: enterprise, mobile, ics "
+                             "(default: the domains given with --bundle, else enterprise)")
+    parser.add_argument('--offline', action='store_true', help="Never touch the network, use the cached bundle")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help=f"Bundle cache directory (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument('--cache-ttl', type=int, default=DEFAULT_CACHE_TTL, help="Seconds before the cached bundle is revalidated (default: 86400)")
+    parser.add_argument('--no-snapshot', action='store_true', help="Always parse the bundle instead of loading the preprocessed model snapshot")
+    parser.add_argument('--result-cache-size', type=int, default=RESULT_CACHE_ENTRIES, help=f"Query results kept in memory (default: {RESULT_CACHE_ENTRIES})")
+    parser.add_argument('--persist-results', action='store_true', help="Also keep query results on disk in the cache directory")
+    parser.add_argument('--profile', action='store_true', help="Print a per-phase timing and counter breakdown when finished")
+    parser.add_argument('--profile-output', metavar='FILE', help="Also dump the profile: cProfile stats for .prof/.pstats, otherwise a JSON trace")
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('--output-dir', default='', help="Directory for generated files (default: current directory)")
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND', help="Run a single analysis without the interactive menu")
+    command = commands.add_parser('map-group', parents=[output], help="Map an APT group and save its Navigator layer")
+    command.add_argument('group', help="Group name, MITRE ID, or alias")
+    command = commands.add_parser('layers', help="Generate Navigator layers for many groups plus aggregate layers")
+    command.add_argument('groups', nargs='*', help="Groups to include (default: every group)")
+    command.add_argument('--output-dir', default='layers', help="Directory for layer files (default: layers)")
+    command.add_argument('--compact', action='store_true', help="Write compact JSON without indentation")
+    command.add_argument('--workers', type=int, default=4, help="Parallel file writers (default: 4)")
+    command.add_argument('--no-group-layers', action='store_true', help="Only write the aggregate layers")
+    command.add_argument('--frequency', action='store_true', help="Add a technique frequency heat layer")
+    command.add_argument('--union', action='store_true', help="Add a union layer of the selected groups")
+    command.add_argument('--intersection', action='store_true', help="Add an intersection layer of the selected groups")
+    command = commands.add_parser('prevalence', parents=[output], help="Rank techniques within a tactic")
+    command.add_argument('tactic', help="Tactic name, e.g. 'Persistence'")
+    command = commands.add_parser('heatmap', help="Export technique prevalence for every tactic at once")
+    command.add_argument('--output', default='tactic_heatmap.json', help="Output file, .json or .csv (default: tactic_heatmap.json)")
+    command.add_argument('--top', type=int, default=10, help="Techniques listed per tactic in JSON output (default: 10)")
+    command = commands.add_parser('technique', parents=[output], help="Assess technique usage and export to Excel")
+    command.add_argument('technique', help="Technique name or ID, e.g. T1547.001")
+    command.add_argument('--scope', choices=['all', 'top20'], default='all', help="Export all groups or the 20 most recent")
+    command.add_argument('--include-subtechniques', action='store_true', help="Also list groups using the technique's sub-techniques")
+    command = commands.add_parser('technique-workbook', help="Export many techniques to one workbook, one sheet each")
+    command.add_argument('techniques', nargs='*', help="Technique IDs or names (default: every technique)")
+    command.add_argument('--output', default='technique_usage_all.xlsx', help="Workbook path (default: technique_usage_all.xlsx)")
+    command.add_argument('--scope', choices=['all', 'top20'], default='all', help="Export all groups or the 20 most recent per technique")
+    command.add_argument('--include-subtechniques', action='store_true', help="Also list groups using each technique's sub-techniques")
+    command = commands.add_parser('country', parents=[output], help="Rank APT groups targeting a country")
+    command.add_argument('country', help="Country name, e.g. 'United States'")
+    command = commands.add_parser('activity', help="Query technique use by time window from the timeline index")
+    subject = command.add_mutually_exclusive_group()
+    subject.add_argument('--tactic', help="Groups that used this tactic's techniques in the window")
+    subject.add_argument('--group', help="Techniques this group used in the window")
+    subject.add_argument('--technique', help="Groups that used this technique in the window")
+    command.add_argument('--since', type=parse_date, help="Window start, YYYY-MM-DD (default: --days before --until)")
+    command.add_argument('--until', type=parse_date, help="Window end, YYYY-MM-DD (default: now)")
+    command.add_argument('--days', type=int, default=365, help="Window length when --since is not given (default: 365)")
+    command.add_argument('--limit', type=int, help="Maximum entries to return")
+    command.add_argument('--output', help="Write the results as JSON")
+    command = commands.add_parser('targeting', help="Search descriptions for countries, sectors or any terms")
+    command.add_argument('terms', nargs='+', help="Words or phrases, 'health*' matches a prefix; known countries and sectors expand to related terms")
+    command.add_argument('--limit', type=int, default=20, help="Groups and techniques listed (default: 20)")
+    command.add_argument('--no-expand', action='store_true', help="Search only the given terms")
+    command.add_argument('--output', help="Write the results as JSON")
+    command = commands.add_parser('similar', help="Find groups with similar technique sets, or score and cluster every pair")
+    command.add_argument('group', nargs='?', help="Group to compare against the others (default: report on all pairs)")
+    command.add_argument('--top', type=int, default=10, help="Similar groups or pairs to list (default: 10)")
+    command.add_argument('--method', choices=SIMILARITY_METHODS, default='jaccard',
+                         help="jaccard, or weighted to favour rarely used techniques (default: jaccard)")
+    command.add_argument('--threshold', type=float, default=0.5, help="Similarity that links groups into a cluster (default: 0.5)")
+    approximate = command.add_mutually_exclusive_group()
+    approximate.add_argument('--approximate', action='store_true', default=None, help="Use MinHash/LSH candidates instead of exact scoring")
+    approximate.add_argument('--exact', dest='approximate', action='store_false', help="Always score every pair exactly")
+    command.add_argument('--output', help="Write the results as JSON")
+    command = commands.add_parser('coverage', parents=[output], help="Compare a file of covered technique IDs against every group")
+    command.add_argument('covered', help="Text file with one covered technique ID or name per line, '#' starts a comment")
+    command.add_argument('--no-rollup', action='store_true', help="Compare sub-techniques exactly instead of rolling them up to their parents")
+    command.add_argument('--top', type=int, default=20, help="Gaps and groups listed on screen (default: 20)")
+    command.add_argument('--fail-under', type=float, metavar='PERCENT', help="Exit non-zero when weighted coverage is below this percentage")
+    command = commands.add_parser('resolve-groups', help="Resolve a file of actor names (one per line) to ATT&CK groups")
+    command.add_argument('names', help="Text file with one group name, alias or ID per line")
+    command.add_argument('--output', help="Write JSON results to this file instead of stdout")
+    command = commands.add_parser('resolve-techniques', help="Resolve a file of technique IDs or names (one per line)")
+    command.add_argument('techniques', help="Text file with one technique ID or name per line")
+    command.add_argument('--output', help="Write JSON results to this file instead of stdout")
+    command = commands.add_parser('diff', help="Compare two ATT&CK releases and update outputs incrementally")
+    command.add_argument('--old', metavar='PATH', help="Previous release bundle (default: --bundle or the cached bundle)")
+    command.add_argument('--new', metavar='PATH', help="New release bundle (default: download the latest release)")
+    command.add_argument('--output-dir', help="Regenerate the layers and country analyses in this directory that the changes affect")
+    command.add_argument('--report', metavar='FILE', help="Write the full list of changes as JSON")
+    command = commands.add_parser('serve', help="Serve queries over HTTP/JSON from one resident model")
+    command.add_argument('--host', default='127.0.0.1', help="Address to bind (default: 127.0.0.1)")
+    command.add_argument('--port', type=int, default=8080, help="Port to listen on (default: 8080)")
+    command.add_argument('--cache-size', type=int, default=512, help="Cached responses kept in memory (default: 512)")
+    command.add_argument('--reload-interval', type=int, default=300, help="Seconds between checks for a new bundle, 0 disables (default: 300)")
+    command.add_argument('--quiet', action='store_true', help="Do not log each request")
+    command = commands.add_parser('bench', help="Benchmark loading, queries and exports on real and synthetic bundles")
+    command.add_argument('--synthetic', type=float, nargs='*', default=[], metavar='SCALE', help="Also benchmark synthetic bundles at these scales, e.g. 10 100")
+    command.add_argument('--synthetic-only', action='store_true', help="Skip the real bundle")
+    command.add_argument('--queries', type=int, default=50, help="Sampled inputs per query type (default: 50)")
+    command.add_argument('--output', default='bench_results.json', help="JSON results file (default: bench_results.json)")
+    command.add_argument('--baseline', help="Earlier results file to compare against")
+    command.add_argument('--threshold', type=float, default=BENCH_THRESHOLD, help="Relative slowdown reported as a regression (default: 0.2)")
+    command = commands.add_parser('batch', help="Run many queries from a JSONL or CSV file")
+    command.add_argument('queries', help="JSONL or CSV file with 'type', 'query' and optional 'scope' and 'include_subtechniques' fields")
+    command.add_argument('--output-dir', default='batch_output', help="Directory for per-query outputs and manifest.json")
+    command.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+    bundle_domains = list(dict.fromkeys(domain for domain, path in _bundle_entries(args.bundle)))
+    if args.domains is None:
+        args.domains = bundle_domains or ['enterprise']
+    elif bundle_domains and set(bundle_domains) != set(args.domains):
+        parser.error(f"--bundle gives {', '.join(bundle_domains)} data but --domains is {', '.join(args.domains)}")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    analyzer = MITREAnalyzer(bundle_path=args.bundle, offline=args.offline, cache_dir=args.cache_dir,
+                             cache_ttl=args.cache_ttl, use_snapshot=not args.no_snapshot,
+                             result_cache_size=args.result_cache_size, persist_results=args.persist_results,
+                             domains=args.domains)
+    if not (args.profile or args.profile_output):
+        return run_command(analyzer, args)
+    PROFILER.enable()
+    profile = None
+    if args.profile_output and args.profile_output.endswith(('.prof', '.pstats')):
+        profile = cProfile.Profile()
+        profile.enable()
+    try:
+        return run_command(analyzer, args)
+    finally:
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(args.profile_output)
+        for name, value in analyzer.results.stats.items():
+            if value:
+                PROFILER.count(f"result cache {name.replace('_', ' ')}", value)
+        PROFILER.report()
+        PROFILER.enabled = False
+        if args.profile_output:
+            if profile is None:
+                PROFILER.dump(args.profile_output)
+            print(f"{GREEN}[+] Profile saved to {args.profile_output}{ENDC}")
+
+def run_command(analyzer, args):
+    if args.command is None:
+        display_banner()
+        analyzer.run()
+        return 0
+    if args.command == 'bench':
+        report = run_bench(analyzer, args.synthetic, args.queries, args.output, args.baseline, args.threshold, args.synthetic_only)
+        return 1 if report.get('regressions') else 0
+    if args.command == 'diff':
+        return 0 if run_diff(analyzer, args.old, args.new, args.output_dir, args.report) is not None else 1
+    analyzer.load_mitre_data()
+    if args.command in ('resolve-groups', 'resolve-techniques'):
+        with open(args.names if args.command == 'resolve-groups' else args.techniques, 'r', encoding='utf-8') as f:
+            values = [line.strip() for line in f if line.strip()]
+        if args.command == 'resolve-groups':
+            results = analyzer.resolve_groups(values)
+        else:
+            results = analyzer.resolve_techniques(values)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+            print(f"{GREEN}[+] Resolved {sum(1 for r in results if r['match'])}/{len(results)} entries, saved to {args.output}{ENDC}")
+        else:
+            print(json.dumps(results, indent=2, ensure_ascii=False))
+        return 0
+    if args.command == 'technique-workbook':
+        output = analyzer.export_technique_workbook(args.techniques, args.output, args.scope, args.include_subtechniques)
+        return 0 if output else 1
+    if args.command == 'layers':
+        written = analyzer.generate_layers(args.groups, args.output_dir, args.compact, args.workers,
+                                           not args.no_group_layers, args.frequency, args.union, args.intersection)
+        return 0 if written else 1
+    if args.command == 'heatmap':
+        analyzer.export_tactic_heatmap(args.output, args.top)
+        return 0
+    if args.command == 'coverage':
+        report = analyzer.analyze_coverage(args.covered, args.output_dir, not args.no_rollup, args.top)
+        if report is None:
+            return 1
+        if args.fail_under is not None and report['weighted_coverage_percent'] < args.fail_under:
+            print(f"{RED}[!] Weighted coverage {report['weighted_coverage_percent']}% is below {args.fail_under}%{ENDC}")
+            return 1
+        return 0
+    if args.command == 'activity':
+        kind = 'tactic' if args.tactic else 'group' if args.group else 'technique' if args.technique else None
+        report = analyzer.query_activity(kind, args.tactic or args.group or args.technique, args.since, args.until,
+                                         args.days, args.limit, args.output)
+        return 0 if report is not None else 1
+    if args.command == 'targeting':
+        results = analyzer.targeting_search(args.terms, args.limit, not args.no_expand, args.output)
+        return 0 if results['groups_matched'] or results['techniques_matched'] else 1
+    if args.command == 'similar':
+        if args.group:
+            return 0 if analyzer.similar_groups(args.group, args.top, args.method, args.approximate, args.output) is not None else 1
+        analyzer.group_similarity_report(args.top, args.method, args.threshold, args.approximate, args.output)
+        return 0
+    if args.command == 'serve':
+        serve(analyzer, args.host, args.port, args.cache_size, args.reload_interval, args.quiet)
+        return 0
+    if args.command == 'batch':
+        try:
+            manifest = run_batch(analyzer, args.queries, args.output_dir, args.workers)
+        except ValueError as e:
+            print(f"{RED}[-] {e}{ENDC}")
+            return 1
+        return 0 if manifest['failed'] == 0 else 1
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    value = {'map-group': 'group', 'prevalence': 'tactic', 'technique': 'technique', 'country': 'country'}[args.command]
+    output = analyzer.run_query(args.command, getattr(args, value), args.output_dir, getattr(args, 'scope', 'all'),
+                                getattr(args, 'include_subtechniques', False))
+    return 0 if output else 1
+
 if __name__ == "__main__":
-    display_banner()
-    analyzer = MITREAnalyzer()
-    analyzer.run()
+    sys.exit(main())